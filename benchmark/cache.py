@@ -0,0 +1,88 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Response cache benchmark
+
+    A RESTHandler server and clients talk over a MemoryNetwork (see
+    benchmark.rest_echo). The rest handler function returns a list of 100
+    small dicts, which is encoded as JSON for each response, or once, with
+    a Cache.
+
+    items           - no cache
+    items, cached   - with a Cache (the handler is called once)
+    gzip            - no cache, gzipped (the Compression's own cache of
+                      compressed content applies)
+    gzip, cached    - with a Cache, gzipped
+
+    run with:
+
+        python -m benchmark.cache [count]
+'''
+import sys
+
+from benchmark.rest_echo import Client, ClientContext
+from benchmark.util import rate
+from spindrift.compress import Compression
+from spindrift.memory import MemoryNetwork
+from spindrift.rest.cache import Cache
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 10001
+ITEMS = [dict(id=n, name='item %d' % n, price=n * 1.25, is_active=True)
+         for n in range(100)]
+
+
+def items(request):
+    return ITEMS
+
+
+def setup(cache=None, compression=None):
+    mapper = RESTMapper()
+    mapper.add('/items$', dict(get=RESTMethod(items, cache=cache)))
+    network = MemoryNetwork()
+    network.add_server(PORT, RESTHandler, context=RESTContext(
+        mapper, compression))
+    return network
+
+
+class GzipContext(ClientContext):
+
+    @property
+    def request(self):  # http_send adds to the headers, so a new dict
+        return ('GET', 'localhost', '/items', {'Accept-Encoding': 'gzip'}, '')
+
+    @request.setter
+    def request(self, value):
+        pass
+
+
+def run(network, is_gzip=False):
+    def _run(count):
+        context = (GzipContext if is_gzip else ClientContext)(
+            count, 'GET', '/items', '')
+        c = network.add_connection('localhost', PORT, Client, context)
+        while c.is_open:
+            network.service()
+    return _run
+
+
+def main(count=10000):
+    for name, compression in (
+            ('items', None),
+            ('gzip', Compression())):
+        is_gzip = compression is not None
+        network = setup(compression=compression)
+        rate(name, run(network, is_gzip), count)
+        network.close()
+
+        network = setup(Cache(ttl=60), compression)
+        rate(name + ', cached', run(network, is_gzip), count)
+        network.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,83 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+JSON codec benchmark
+
+    Encode and decode a typical DAO payload: a list of [rows] rows, as a
+    select returns them, with int, str, datetime, Decimal and None values.
+
+    json.dumps  - what RESTHandler did before spindrift.codec: json.dumps
+                  (which can't encode datetime or Decimal without a default
+                  function), then .encode
+    [codec]     - spindrift.codec.dumpb/loads with each available codec
+
+    run with:
+
+        python -m benchmark.codec [count] [rows]
+'''
+import datetime
+import decimal
+import json
+import sys
+
+import spindrift.codec as codec
+from benchmark.util import rate
+
+
+def payload(rows):
+    now = datetime.datetime(2020, 6, 1, 12, 30, 15, 250000)
+    return [
+        dict(
+            id=n,
+            name='customer %d' % n,
+            email='customer%d@example.com' % n,
+            balance=decimal.Decimal('%d.%02d' % (n * 7, n % 100)),
+            created=now + datetime.timedelta(minutes=n),
+            last_order=None if n % 3 else now.date(),
+            is_active=n % 2 == 0,
+        )
+        for n in range(rows)
+    ]
+
+
+def stdlib_dumps(value):
+    return json.dumps(value, default=codec.default).encode('utf-8')
+
+
+def run_encode(dumpb, value):
+    def _run(count):
+        for _ in range(count):
+            dumpb(value)
+    return _run
+
+
+def run_decode(loads, data):
+    def _run(count):
+        for _ in range(count):
+            loads(data)
+    return _run
+
+
+def main(count=2000, rows=100):
+    value = payload(rows)
+    data = stdlib_dumps(value)
+    print('payload: %d rows, %d bytes' % (rows, len(data)))
+    rate('encode json.dumps', run_encode(stdlib_dumps, value), count,
+         'doc/s')
+    for name in codec.CODECS:
+        codec.use(name)
+        rate('encode %s' % name, run_encode(codec.dumpb, value), count,
+             'doc/s')
+    rate('decode json.loads', run_decode(json.loads, data.decode()), count,
+         'doc/s')
+    for name in codec.CODECS:
+        codec.use(name)
+        rate('decode %s' % name, run_decode(codec.loads, data), count,
+             'doc/s')
+    codec.use()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,118 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Argument coercion benchmark
+
+    The per-request conversion of a route's args (regex groups) and
+    content, for a route with two ARGs and three CONTENTs (two required,
+    one optional and absent), and for the coerce and content_to_args
+    decorators with the same specification.
+
+    loop      - the implementation before generated functions (a loop over
+                the specification on every call)
+    generated - spindrift's generated functions
+
+    run with:
+
+        python -m benchmark.coerce [count]
+'''
+from itertools import zip_longest
+import sys
+
+from benchmark.util import rate
+from spindrift.rest.decorator import coerce, content_to_args
+from spindrift.rest.mapper import (
+    InvalidContent, MissingRequiredContent, RESTArg, RESTMethod)
+
+
+ARG_DATA = ('123', 'abc')
+CONTENT_DATA = {'name': 'fred', 'age': '42'}
+
+
+def loop_coerce(method, arg_data, content_data):
+    ''' RESTMethod.coerce, before generated functions '''
+    args = []
+    kwargs = {}
+    for coercer, arg in zip_longest(method.args, arg_data):
+        if coercer:
+            arg = coercer.type(arg)
+        args.append(arg)
+    for coercer in method.content:
+        try:
+            value = content_data[coercer.name]
+        except KeyError:
+            if coercer.is_required:
+                raise MissingRequiredContent(coercer.name)
+        else:
+            if coercer.type:
+                try:
+                    value = coercer.type(value)
+                except ValueError as e:
+                    raise InvalidContent(coercer.name, str(e))
+            kwargs[coercer.name] = value
+    return args, kwargs
+
+
+def loop_decorators(fields, types):
+    ''' content_to_args(*fields)(coerce(*types)(handler)), as a loop '''
+    def inner(request, *args):
+        args = [t(v) for t, v in zip(types, args)]
+        for field in fields:
+            if len(field) == 3:
+                fname, ftype, fdflt = field
+                value = request.json.get(fname, fdflt)
+            else:
+                fname, ftype = field
+                value = request.json[fname]
+            if ftype:
+                value = ftype(value)
+            args.append(value)
+        return handler(request, *args)
+    return inner
+
+
+class Request(object):
+    json = CONTENT_DATA
+
+
+def handler(request, *args, **kwargs):
+    pass
+
+
+def run_method(fn):
+    def _run(count):
+        for _ in range(count):
+            fn(ARG_DATA, CONTENT_DATA)
+    return _run
+
+
+def run_handler(fn):
+    request = Request()
+
+    def _run(count):
+        for _ in range(count):
+            fn(request, *ARG_DATA)
+    return _run
+
+
+def main(count=200000):
+    method = RESTMethod(
+        handler, [RESTArg(int), RESTArg(str)],
+        [RESTArg(str, 'name'), RESTArg(int, 'age'),
+         RESTArg(int, 'limit', is_required=False)])
+    rate('RESTMethod.coerce, loop',
+         run_method(lambda a, c: loop_coerce(method, a, c)), count)
+    rate('RESTMethod.coerce, generated', run_method(method.coercer()), count)
+
+    fields = (('name', str), ('age', int), ('limit', int, 10))
+    types = (int, str)
+    rate('decorators, loop', run_handler(loop_decorators(fields, types)),
+         count)
+    rate('decorators, generated', run_handler(
+        content_to_args(*fields)(coerce(*types)(handler))), count)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
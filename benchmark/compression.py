@@ -0,0 +1,89 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+response compression benchmark
+
+    A RESTHandler server returns a 20KB json document to an HTTPHandler
+    client over a MemoryNetwork, with compression off, on without the cache
+    and on with the cache. The request rate and the bytes received by the
+    client, per response, are reported for each.
+
+    run with:
+
+        python -m benchmark.compression [count]
+'''
+import sys
+
+from benchmark.util import rate
+from spindrift.compress import Compression
+from spindrift.http import HTTPHandler
+from spindrift.memory import MemoryNetwork
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 10001
+DOCUMENT = [dict(id=n, name='item %d' % n, tags=['a', 'b', 'c'])
+            for n in range(400)]
+
+
+def document(request):
+    return DOCUMENT
+
+
+class Client(HTTPHandler):
+
+    def on_ready(self):
+        self._next()
+
+    def _next(self):
+        if self.context.count == 0:
+            self.context.rx_count += self.rx_count
+            self.close()
+            return
+        self.context.count -= 1
+        self.http_send(resource='/document',
+                       headers={'Accept-Encoding': 'gzip'})
+
+    def on_http_data(self):
+        self._next()
+
+
+class ClientContext(object):
+
+    def __init__(self, count):
+        self.count = count
+        self.rx_count = 0
+
+
+def run(network, stats):
+    def _run(count):
+        context = ClientContext(count)
+        c = network.add_connection('localhost', PORT, Client, context)
+        while c.is_open:
+            network.service()
+        stats[:] = [context.rx_count, count]
+    return _run
+
+
+def main(count=2000):
+    mapper = RESTMapper()
+    mapper.add('/document$', dict(
+        get=RESTMethod('benchmark.compression.document')))
+    for name, compression in (
+            ('compression off', None),
+            ('compression on, no cache', Compression(cache_size=0)),
+            ('compression on, cache', Compression())):
+        network = MemoryNetwork()
+        network.add_server(PORT, RESTHandler,
+                           context=RESTContext(mapper, compression))
+        stats = []
+        rate(name, run(network, stats), count)
+        print('%36s %12.0f bytes/response' % ('', stats[0] / stats[1]))
+        network.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,55 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+outbound connection pool benchmark
+
+    Sequential connect() calls to a local HTTPHandler server over real
+    sockets, with and without the connection pool, so the numbers include
+    tcp setup and teardown.
+
+    run with:
+
+        python -m benchmark.connect_pool [count]
+'''
+import sys
+
+from benchmark.util import rate
+from spindrift.connect import connect, run as connect_run
+from spindrift.http import HTTPHandler
+from spindrift.network import Network
+from spindrift.timer import Timer
+
+
+PORT = 10002
+
+
+class Server(HTTPHandler):
+
+    def on_http_data(self):
+        self.http_send_server('pong')
+
+
+def run(network, timer, pool):
+    def _run(count):
+        for _ in range(count):
+            c = connect(network, timer, lambda rc, result: None,
+                        'http://127.0.0.1:%d/ping' % PORT, is_json=False,
+                        pool=pool)
+            connect_run(network, timer, c)
+    return _run
+
+
+def main(count=2000):
+    network = Network()
+    timer = Timer()
+    network.add_server(PORT, Server)
+    rate('connect, no pool', run(network, timer, None), count)
+    rate('connect, pool', run(network, timer, True), count)
+    print('pool hit rate %.3f' % network.connect_pool.hit_rate)
+    network.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
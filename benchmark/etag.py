@@ -0,0 +1,145 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+ETag benchmark
+
+    A RESTHandler server and clients talk over a MemoryNetwork (see
+    benchmark.rest_echo). The rest handler function returns a list of 100
+    small dicts (about 5.9KB as JSON). After the rate, the bytes received
+    by the client for each response are shown, with the bandwidth saved
+    and the rate, compared to items.
+
+    items               - no ETag
+    items, etag         - etag=True, with no If-None-Match (the cost of the
+                          digest)
+    304, digest         - etag=True, with a matching If-None-Match (the
+                          content is made, and encoded, but not sent)
+    304, version        - request.not_modified, with a matching
+                          If-None-Match (the content isn't made)
+
+    Every request matches (a 100% hit ratio), and the content is cheap to
+    make, so the gain in rate is mostly the work of encoding and sending
+    content: 304, digest is about the same rate as items (0.95-1.2x; the
+    content is still encoded, and hashed), and 304, version about 1.5x
+    (1.5-1.8x in most runs, with count=10000 or 30000; it varies from run
+    to run). The gain is larger when the content is expensive to make (a
+    database read, for instance) or large, and smaller with fewer matching
+    requests.
+
+    run with:
+
+        python -m benchmark.etag [count]
+'''
+import sys
+
+from benchmark.rest_echo import Client, ClientContext
+from benchmark.util import rate
+from spindrift.memory import MemoryNetwork
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 10001
+ITEMS = [dict(id=n, name='item %d' % n, price=n * 1.25, is_active=True)
+         for n in range(100)]
+
+
+def items(request):
+    return ITEMS
+
+
+def versioned(request):
+    if request.not_modified(1):
+        return
+    return ITEMS
+
+
+class CountingClient(Client):
+
+    def on_init(self):
+        self.context.received = 0
+
+    def on_data(self, data):
+        self.context.received += len(data)
+        super(CountingClient, self).on_data(data)
+
+
+class Context(ClientContext):
+
+    def __init__(self, count, resource, if_none_match=None):
+        super(Context, self).__init__(count, 'GET', resource, '')
+        self.resource = resource
+        self.if_none_match = if_none_match
+        self.count_all = count  # count is decremented by Client
+
+    @property
+    def request(self):  # http_send adds to the headers, so a new dict
+        headers = None
+        if self.if_none_match:
+            headers = {'If-None-Match': self.if_none_match}
+        return ('GET', 'localhost', self.resource, headers, '')
+
+    @request.setter
+    def request(self, value):
+        pass
+
+
+def setup():
+    mapper = RESTMapper()
+    mapper.add('/items$', dict(get=RESTMethod(items)))
+    mapper.add('/etag$', dict(get=RESTMethod(items, etag=True)))
+    mapper.add('/versioned$', dict(get=RESTMethod(versioned)))
+    network = MemoryNetwork()
+    network.add_server(PORT, RESTHandler, context=RESTContext(mapper))
+    return network
+
+
+def etag(network, resource):
+    ''' the ETag of resource's response '''
+    tag = []
+
+    class _client(Client):
+        def on_http_data(self):
+            tag.append(self.http_headers['etag'])
+            self.close()
+
+    c = network.add_connection('localhost', PORT, _client,
+                               Context(1, resource))
+    while c.is_open:
+        network.service()
+    return tag[0]
+
+
+def run(network, resource, if_none_match, size):
+    def _run(count):
+        context = Context(count, resource, if_none_match)
+        c = network.add_connection('localhost', PORT, CountingClient,
+                                   context)
+        while c.is_open:
+            network.service()
+        size[:] = [context.received // context.count_all]
+    return _run
+
+
+def main(count=10000):
+    network = setup()
+    full = full_rate = None
+    for name, resource, if_none_match in (
+            ('items', '/items', None),
+            ('items, etag', '/etag', None),
+            ('304, digest', '/etag', etag(network, '/etag')),
+            ('304, version', '/versioned', '"1"')):
+        size = []
+        result = rate(name, run(network, resource, if_none_match, size),
+                      count)
+        full = full or size[0]
+        full_rate = full_rate or result
+        print('%-36s %12d bytes/response (%.1f%% saved, %.2fx rate)' % (
+            '', size[0], 100 - 100.0 * size[0] / full, result / full_rate))
+    network.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,136 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+HTTP/2 multiplexing benchmark
+
+    Batches of concurrent GET requests to a RESTHandler server over a
+    MemoryNetwork: with HTTP/1, each request in a batch has its own
+    connection; with HTTP/2, one connection carries the whole batch as
+    separate streams.
+
+    run with:
+
+        python -m benchmark.http2 [count] [concurrency]
+'''
+import sys
+
+import spindrift.http2 as http2
+from benchmark.util import rate
+from spindrift.hpack import Decoder, Encoder
+from spindrift.http import HTTPHandler
+from spindrift.memory import MemoryNetwork
+from spindrift.network import Handler
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 10003
+
+
+def ping(request):
+    return 'pong'
+
+
+class Server(RESTHandler):
+
+    def on_init(self):
+        self.http_h2c = True
+
+
+class Client1(HTTPHandler):
+
+    def on_ready(self):
+        self.http_send(resource='/ping')
+
+    def on_http_data(self):
+        self.context.append(self.http_content)
+        self.close()
+
+
+class Client2(Handler):
+    ''' sends a batch of requests, as streams, and counts the responses '''
+
+    def on_init(self):
+        self.data = bytearray()
+        self.decoder = Decoder()
+        self.done = 0
+        self.is_preface = True
+
+    def batch(self, count):
+        self.done = 0
+        block = Encoder().encode((
+            (':method', 'GET'), (':scheme', 'http'), (':path', '/ping'),
+            (':authority', 'localhost')))
+        frames = [http2.PREFACE + http2.frame(http2.SETTINGS, 0, 0)] \
+            if self.is_preface else []
+        self.is_preface = False
+        start = self.context.next_id
+        self.context.next_id += 2 * count
+        for stream_id in range(start, start + 2 * count, 2):
+            frames.append(http2.frame(
+                http2.HEADERS, http2.END_HEADERS | http2.END_STREAM,
+                stream_id, block))
+        self.send(b''.join(frames))
+
+    def on_data(self, data):
+        self.data += data
+        offset = 0
+        while True:
+            result = http2.parse_frame(self.data, offset)
+            if result is None:
+                break
+            frame_type, flags, stream_id, payload, offset = result
+            if frame_type == http2.HEADERS:
+                self.decoder.decode(payload)
+            if stream_id and flags & http2.END_STREAM:
+                self.done += 1
+        del self.data[:offset]
+
+
+class Context2(object):
+
+    def __init__(self):
+        self.next_id = 1
+
+
+def run_http1(network, concurrency):
+    def _run(count):
+        for _ in range(count // concurrency):
+            results = []
+            clients = [
+                network.add_connection('localhost', PORT, Client1, results)
+                for _ in range(concurrency)]
+            while len(results) < concurrency:
+                network.service()
+            while any(c.is_open for c in clients):
+                network.service()
+    return _run
+
+
+def run_http2(network, concurrency):
+    def _run(count):
+        c = network.add_connection('localhost', PORT, Client2, Context2())
+        for _ in range(count // concurrency):
+            c.batch(concurrency)
+            while c.done < concurrency:
+                network.service()
+        c.close()
+        network.service()
+    return _run
+
+
+def main(count=10000, concurrency=50):
+    mapper = RESTMapper()
+    mapper.add('/ping$', dict(get=RESTMethod('benchmark.http2.ping')))
+    network = MemoryNetwork()
+    network.add_server(PORT, Server, context=RESTContext(mapper))
+    rate('http/1.1, connection per request', run_http1(network, concurrency),
+         count)
+    rate('http/2, one connection', run_http2(network, concurrency), count)
+    network.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,94 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+HTTP request parser benchmark
+
+    Feeds complete requests to an inbound HTTPHandler's on_data, measuring
+    parse cost alone (no network, no response).
+
+        small        - request line and a few headers
+        header-heavy - 60 headers
+        large-body   - 1MB Content-Length body arriving in 16KB reads
+        chunked-body - 1MB chunked body arriving in 16KB reads
+
+    run with:
+
+        python -m benchmark.http_parser [count]
+'''
+import sys
+
+from benchmark.util import rate
+from spindrift.http import HTTPHandler
+from spindrift.network import Network
+
+
+class Parser(HTTPHandler):
+
+    def on_init(self):
+        self.count = 0
+
+    def quiesce(self):
+        pass  # keep parsing back-to-back requests
+
+    def on_http_data(self):
+        self.count += 1
+
+
+def request(headers=(), content=b''):
+    lines = [
+        b'POST /test/resource?a=1&b=2 HTTP/1.1',
+        b'Host: localhost',
+        b'Content-Length: %d' % len(content),
+    ]
+    lines.extend(headers)
+    return b'\r\n'.join(lines) + b'\r\n\r\n' + content
+
+
+def chunked(content, size):
+    lines = [
+        b'POST /test/resource HTTP/1.1',
+        b'Host: localhost',
+        b'Transfer-Encoding: chunked',
+    ]
+    body = b''.join(
+        b'%x\r\n%s\r\n' % (len(content[i:i + size]), content[i:i + size])
+        for i in range(0, len(content), size)
+    )
+    return b'\r\n'.join(lines) + b'\r\n\r\n' + body + b'0\r\n\r\n'
+
+
+def reads(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def run(data):
+    def _run(count):
+        handler = Parser(None, Network())
+        on_data = handler.on_data
+        for _ in range(count):
+            for chunk in data:
+                on_data(chunk)
+        assert handler.count == count
+    return _run
+
+
+def main(count=20000):
+    small = [request((b'Accept: */*', b'User-Agent: benchmark'))]
+    heavy = [request(tuple(
+        b'X-Header-%d: value-%d; with=some; extra=stuff' % (n, n)
+        for n in range(60)
+    ))]
+    body = b'x' * 1024 * 1024
+    large = reads(request(content=body), 16 * 1024)
+    chunks = reads(chunked(body, 4096), 16 * 1024)
+
+    rate('small', run(small), count)
+    rate('header-heavy', run(heavy), count // 10)
+    rate('large-body', run(large), max(count // 1000, 10))
+    rate('chunked-body', run(chunks), max(count // 1000, 10))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,89 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Concurrency limit benchmark
+
+    A RESTHandler server and clients talk over a MemoryNetwork (see
+    benchmark.rest_echo).
+
+    ping            - a request, with no limiter
+    ping, limited   - the same request, through a Limiter (the cost of
+                      acquire and release)
+    503, handler    - a rejection sent by a rest handler function, with
+                      request.respond(503) (each on a new connection,
+                      since a rejection closes it)
+    503, limiter    - a rejection by a full Limiter: the prebuilt 503, with
+                      Retry-After, without calling the rest handler function
+
+    run with:
+
+        python -m benchmark.limit [count]
+'''
+import sys
+
+from benchmark.rest_echo import Client, ClientContext
+from benchmark.util import rate
+from spindrift.memory import MemoryNetwork
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.limit import Limiter
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 10001
+
+
+def ping(request):
+    return 'pong'
+
+
+def busy(request):
+    request.respond(503, headers={'Retry-After': '1'})
+
+
+def setup(limiter=None):
+    mapper = RESTMapper()
+    mapper.add('/ping$', dict(get=RESTMethod(ping)))
+    mapper.add('/busy$', dict(get=RESTMethod(busy)))
+    network = MemoryNetwork()
+    network.add_server(PORT, RESTHandler, context=RESTContext(
+        mapper, limiter=limiter))
+    return network
+
+
+def run(network, resource):
+    def _run(count):
+        context = ClientContext(count, 'GET', resource, '')
+        c = network.add_connection('localhost', PORT, Client, context)
+        while c.is_open:
+            network.service()
+    return _run
+
+
+def run_reject(network, resource):
+    def _run(count):
+        for _ in range(count):
+            context = ClientContext(1, 'GET', resource, '')
+            c = network.add_connection('localhost', PORT, Client, context)
+            while c.is_open:
+                network.service()
+    return _run
+
+
+def main(count=10000):
+    network = setup()
+    rate('ping', run(network, '/ping'), count)
+    rate('503, handler', run_reject(network, '/busy'), count)
+    network.close()
+
+    limiter = Limiter(limit=1000, max_limit=1000)
+    network = setup(limiter)
+    rate('ping, limited', run(network, '/ping'), count)
+    limiter.limit = 0  # full
+    rate('503, limiter', run_reject(network, '/ping'), count)
+    network.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,101 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+RESTRequest benchmark
+
+    The cost of the request object that every rest handler function gets:
+    creating one, and reading the http document attributes a typical
+    handler uses (http_headers, http_content, http_method, http_resource
+    and id, five times each).
+
+    getattr - the implementation before slots: attributes forwarded to the
+              handler by __getattr__, and assignment through __setattr__
+    slots   - spindrift's RESTRequest
+
+    run with:
+
+        python -m benchmark.request [count]
+'''
+import sys
+
+from benchmark.util import rate
+from spindrift.http import HTTPHeaders
+from spindrift.rest.request import RESTRequest, _HTTP_ATTRIBUTES
+
+
+class GetattrRequest(object):
+    ''' RESTRequest.__init__, __getattr__ and __setattr__, before slots '''
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.is_delayed = False
+        self.response = None
+        self.is_done = False
+        self.on_chunk = None
+        self.on_end = None
+        self._cleanup = []
+        self._headers = getattr(handler, '_rest_headers', b'')
+        self._slot = getattr(handler, 'http_slot', None)
+        if self._slot is not None:
+            for name in _HTTP_ATTRIBUTES:
+                super(GetattrRequest, self).__setattr__(
+                    name, getattr(handler, name))
+
+    def __getattr__(self, name):
+        if name in ('id',) + _HTTP_ATTRIBUTES:
+            return getattr(self.handler, name)
+        super(GetattrRequest, self).__getattribute__(name)
+
+    def __setattr__(self, name, value):
+        if name == 'cleanup':
+            self._cleanup.append(value)
+        else:
+            super(GetattrRequest, self).__setattr__(name, value)
+
+
+class Handler(object):
+    id = 1
+    http_slot = None
+    _rest_headers = b''
+    http_content = b'{"name": "fred"}'
+    http_method = 'GET'
+    http_resource = '/customer/123'
+
+    def __init__(self):
+        self.http_headers = HTTPHeaders()
+
+
+def run_create(cls):
+    handler = Handler()
+
+    def _run(count):
+        for _ in range(count):
+            cls(handler)
+    return _run
+
+
+def run_access(cls):
+    request = cls(Handler())
+
+    def _run(count):
+        for _ in range(count):
+            for _ in range(5):
+                request.http_headers
+                request.http_content
+                request.http_method
+                request.http_resource
+                request.id
+    return _run
+
+
+def main(count=500000):
+    for name, cls in (('getattr', GetattrRequest), ('slots', RESTRequest)):
+        rate('create, %s' % name, run_create(cls), count)
+    for name, cls in (('getattr', GetattrRequest), ('slots', RESTRequest)):
+        rate('25 attributes, %s' % name, run_access(cls), count // 10)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,87 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+REST echo benchmark
+
+    A RESTHandler server and an HTTPHandler client talk over a MemoryNetwork,
+    so the numbers measure the python cost of the http and rest layers
+    (parse, route, coerce, respond) without any kernel noise.
+
+    run with:
+
+        python -m benchmark.rest_echo [count]
+'''
+import sys
+
+from benchmark.util import rate
+from spindrift.http import HTTPHandler
+from spindrift.memory import MemoryNetwork
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 10000
+
+
+def echo(request):
+    return request.json
+
+
+def ping(request):
+    return 'pong'
+
+
+class Client(HTTPHandler):
+
+    def on_ready(self):
+        self._next()
+
+    def _next(self):
+        if self.context.count == 0:
+            self.close()
+            return
+        self.context.count -= 1
+        self.http_send(*self.context.request)
+
+    def on_http_data(self):
+        self._next()
+
+
+class ClientContext(object):
+
+    def __init__(self, count, method, resource, content):
+        self.count = count
+        self.request = (method, 'localhost', resource, None, content)
+
+
+def setup():
+    mapper = RESTMapper()
+    mapper.add('/ping$', dict(get=RESTMethod('benchmark.rest_echo.ping')))
+    mapper.add('/echo$', dict(post=RESTMethod('benchmark.rest_echo.echo')))
+    network = MemoryNetwork()
+    network.add_server(PORT, RESTHandler, context=RESTContext(mapper))
+    return network
+
+
+def run(network, method, resource, content=''):
+    def _run(count):
+        context = ClientContext(count, method, resource, content)
+        c = network.add_connection('localhost', PORT, Client, context)
+        while c.is_open:
+            network.service()
+    return _run
+
+
+def main(count=10000):
+    network = setup()
+    rate('rest ping', run(network, 'GET', '/ping'), count)
+    rate('rest echo (json)', run(
+        network, 'POST', '/echo', '{"a": 1, "b": [1, 2, 3], "c": "text"}'
+    ), count)
+    network.close()
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,90 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+RESTMapper.match benchmark
+
+    A table of [routes] mappings, like those of a large micro file: for
+    each of routes/3 resources, a collection (/res7$), an item
+    (/res7/(\\d+)$) and an item's property (/res7/(\\d+)/(\\w+)$). Lookups
+    are spread across the table; misses don't match any mapping.
+
+    linear   - each mapping's regex is tried, in order (match without
+               compile)
+    compiled - the route table built by RESTMapper.compile
+    cached   - the route table, with a cache of recent matches
+
+    run with:
+
+        python -m benchmark.router [count] [routes]
+'''
+import sys
+
+from benchmark.util import rate
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+def handler(request, *args):
+    pass
+
+
+def build(routes, cache_size=0):
+    mapper = RESTMapper(cache_size)
+    method = dict(get=RESTMethod(handler), put=RESTMethod(handler))
+    for n in range(routes // 3):
+        mapper.add('/res%d$' % n, method)
+        mapper.add('/res%d/(\\d+)$' % n, method)
+        mapper.add('/res%d/(\\d+)/(\\w+)$' % n, method)
+    return mapper
+
+
+def linear(mapper, resource, method):
+    ''' the match method before route tables '''
+    for mapping in mapper._mapping:
+        m = mapping.pattern.match(resource)
+        if m:
+            rest_method = mapping.method.get(method.lower())
+            if rest_method:
+                return rest_method, m.groups()
+    return None
+
+
+def resources(routes):
+    count = routes // 3
+    hits = []
+    for n in range(0, count, max(count // 10, 1)):
+        hits.extend(('/res%d' % n, '/res%d/123' % n, '/res%d/123/name' % n))
+    misses = ['/nope', '/res%d' % count, '/res1/abc', '/res1/1/2/3']
+    return hits, misses
+
+
+def run(match, mapper, paths):
+    def _run(count):
+        for _ in range(count // len(paths)):
+            for path in paths:
+                match(path, 'GET')
+    return _run
+
+
+def main(count=100000, routes=150):
+    mapper = build(routes)
+    mapper.compile()
+    cached = build(routes, 1000)
+    cached.compile()
+    hits, misses = resources(routes)
+
+    def scan(resource, method):
+        return linear(mapper, resource, method)
+
+    for name, paths in (('hit', hits), ('miss', misses)):
+        rate('%d routes, %s, linear' % (routes, name),
+             run(scan, mapper, paths), count)
+        rate('%d routes, %s, compiled' % (routes, name),
+             run(mapper.match, mapper, paths), count)
+        rate('%d routes, %s, cached' % (routes, name),
+             run(cached.match, cached, paths), count)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
@@ -0,0 +1,21 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+'''
+import time
+
+
+def rate(name, fn, count, unit='req/s'):
+    ''' time fn(count) and print the rate
+
+        fn is called once with a small count to warm up, and then with
+        count; fn must perform count operations.
+    '''
+    fn(max(count // 100, 1))
+    start = time.perf_counter()
+    fn(count)
+    elapsed = time.perf_counter() - start
+    print('%-36s %12.0f %s  (%d in %.3fs)' % (
+        name, count / elapsed, unit, count, elapsed))
+    return count / elapsed
@@ -0,0 +1,60 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+WebSocket broadcast benchmark
+
+    A message sent to many websockets, either with send_message on each
+    websocket (the frame is encoded once per connection) or with broadcast
+    (the frame is encoded once).
+
+    run with:
+
+        python -m benchmark.websocket [count] [connections]
+'''
+import sys
+
+import spindrift.websocket as websocket
+from benchmark.util import rate
+
+
+MESSAGE = '{"price": 101.25, "symbol": "ABC", "volume": 1200}' * 4
+
+
+class Handler(object):
+    ''' stands in for an HTTPHandler; discards what is sent '''
+
+    id = 0
+    _is_sending = False
+    is_closed = False
+
+    def send(self, data):
+        pass
+
+
+def run_send_message(websockets):
+    def _run(count):
+        for _ in range(count):
+            for ws in websockets:
+                ws.send_message(MESSAGE)
+    return _run
+
+
+def run_broadcast(websockets):
+    def _run(count):
+        for _ in range(count):
+            websocket.broadcast(websockets, MESSAGE)
+    return _run
+
+
+def main(count=10000, connections=100):
+    websockets = [websocket.WebSocket(Handler()) for _ in range(connections)]
+    rate('send_message to %d websockets' % connections,
+         run_send_message(websockets), count)
+    rate('broadcast to %d websockets' % connections,
+         run_broadcast(websockets), count)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:3]])
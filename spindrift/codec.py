@@ -0,0 +1,173 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+JSON encoding and decoding
+
+    The functions dumps (to str), dumpb (to utf-8 bytes) and loads use the
+    current codec, which is the fastest one available (orjson, ujson, then
+    the standard library's json), unless another is selected with use.
+    Each codec produces compact, utf-8 (not ascii-escaped) output.
+
+    Values which json can't represent natively are converted by the
+    functions in TYPES (see add_type), which include datetime, date, time,
+    timedelta, Decimal and set.
+'''
+import datetime
+import decimal
+import json
+
+import logging
+log = logging.getLogger(__name__)
+
+
+def _timedelta(value):
+    ''' HH:MM:SS[.ffffff], like a mysql TIME (which can exceed 24 hours) '''
+    seconds = value.days * 86400 + value.seconds
+    sign = '-' if seconds < 0 else ''
+    hours, seconds = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(seconds, 60)
+    result = '%s%02d:%02d:%02d' % (sign, hours, minutes, seconds)
+    if value.microseconds:
+        result += '.%06d' % value.microseconds
+    return result
+
+
+TYPES = {  # type: function returning a json-compatible value
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    datetime.time: datetime.time.isoformat,
+    datetime.timedelta: _timedelta,
+    decimal.Decimal: str,  # str, so that no precision is lost
+    set: list,
+    frozenset: list,
+}
+
+
+def add_type(type, function):
+    ''' convert instances of type (or a subclass) to json with function
+
+        orjson encodes datetime, date and time values itself.
+    '''
+    TYPES[type] = function
+    _lookup.clear()
+
+
+_lookup = {}  # type (including subclasses): function from TYPES
+
+
+def default(value):
+    ''' convert a value that isn't natively json, or raise TypeError '''
+    cls = type(value)
+    try:
+        function = _lookup[cls]
+    except KeyError:
+        function = next(
+            (TYPES[c] for c in cls.__mro__ if c in TYPES), None)
+        _lookup[cls] = function
+    if function is None:
+        raise TypeError(
+            'Object of type %s is not JSON serializable' % cls.__name__)
+    return function(value)
+
+
+class Codec(object):
+
+    def __init__(self, name, dumps, loads, dumpb=None):
+        """A json implementation.
+
+           Required Arguments:
+               name - name used to select the codec (see use)
+               dumps - callable, value to str
+               loads - callable, str or bytes to value
+
+           Optional Arguments:
+               dumpb - callable, value to utf-8 bytes (default=dumps,
+                       encoded)
+        """
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+        if dumpb is None:
+            def dumpb(value):
+                return dumps(value).encode('utf-8')
+        self.dumpb = dumpb
+
+
+CODECS = {}  # name: Codec, in order of preference
+
+
+def register(codec):
+    CODECS[codec.name] = codec
+
+
+def _orjson():
+    import orjson
+    options = orjson.OPT_NON_STR_KEYS
+
+    def dumpb(value):
+        return orjson.dumps(value, default=default, option=options)
+
+    def dumps(value):
+        return dumpb(value).decode('utf-8')
+    return Codec('orjson', dumps, orjson.loads, dumpb)
+
+
+def _ujson():
+    import ujson
+
+    def dumps(value):
+        return ujson.dumps(value, default=default, ensure_ascii=False,
+                           escape_forward_slashes=False)
+    return Codec('ujson', dumps, ujson.loads)
+
+
+def _json():
+    encoder = json.JSONEncoder(
+        default=default, ensure_ascii=False, separators=(',', ':'))
+    return Codec('json', encoder.encode, json.loads)
+
+
+for _factory in (_orjson, _ujson, _json):
+    try:
+        register(_factory())
+    except ImportError:
+        pass
+
+
+_codec = None
+
+
+def use(name=None):
+    ''' select the codec used by dumps, dumpb and loads
+
+        name is the name of a registered codec, or None for the first one
+        registered (the fastest available); returns the Codec.
+    '''
+    global _codec
+    if name:
+        try:
+            _codec = CODECS[name]
+        except KeyError:
+            raise ValueError(
+                "json codec '%s' is not available (one of: %s)" % (
+                    name, ', '.join(CODECS)))
+    else:
+        _codec = next(iter(CODECS.values()))
+    return _codec
+
+
+def dumps(value):
+    return _codec.dumps(value)
+
+
+def dumpb(value):
+    return _codec.dumpb(value)
+
+
+def loads(data):
+    return _codec.loads(data)
+
+
+use()
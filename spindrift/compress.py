@@ -0,0 +1,126 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+'''
+import collections
+import hashlib
+import zlib
+
+import logging
+log = logging.getLogger(__name__)
+
+
+DEFAULT_TYPES = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+
+class Compression(object):
+    ''' Response compression settings for an HTTPHandler
+
+        An HTTPHandler with an http_compression attribute gzips a response
+        if the request's Accept-Encoding allows it, the Content-Type is in
+        types, and the content is at least min_size bytes. RESTHandler
+        takes this from the context's compression attribute.
+
+        Optional Arguments:
+            level - zlib compression level, 1 (fast) to 9 (small)
+                    (default=6)
+            min_size - smallest content, in bytes, worth compressing
+                       (default=1024)
+            types - Content-Type prefixes that are compressed
+                    (default=DEFAULT_TYPES)
+            cache_size - maximum total size, in bytes, of the cache of
+                         compressed content (default=1MB; 0 for no cache)
+
+        Notes:
+
+            1. Compressed content is cached by a digest of the content, so
+               a response that is sent repeatedly (a configuration document
+               or a static page, for instance) is only compressed once.
+               Content larger than a quarter of cache_size is not cached.
+
+            2. A streaming response (HTTPWriter) is compressed a write at a
+               time with a zlib compressobj; the min_size doesn't apply.
+    '''
+
+    def __init__(self, level=6, min_size=1024, types=DEFAULT_TYPES,
+                 cache_size=1024 * 1024):
+        self.level = level
+        self.min_size = min_size
+        self.types = tuple(types)
+        self.cache_size = cache_size
+        self.hit = 0
+        self.miss = 0
+        self._cache = collections.OrderedDict()
+        self._cache_bytes = 0
+
+    def is_compressible(self, content_type):
+        ''' True if content_type is in the types allow list '''
+        return content_type is not None and \
+            content_type.lower().startswith(self.types)
+
+    def compress(self, content):
+        ''' gzip content, using the cache if possible '''
+        cache_size = self.cache_size
+        if not cache_size or len(content) > cache_size // 4:
+            return gzip(content, self.level)
+
+        key = hashlib.blake2b(content, digest_size=16).digest()
+        cache = self._cache
+        try:
+            result = cache[key]
+        except KeyError:
+            self.miss += 1
+        else:
+            self.hit += 1
+            cache.move_to_end(key)
+            return result
+
+        result = gzip(content, self.level)
+        cache[key] = result
+        self._cache_bytes += len(result)
+        while self._cache_bytes > cache_size:
+            _, old = cache.popitem(last=False)
+            self._cache_bytes -= len(old)
+        return result
+
+    def compressobj(self):
+        ''' return a zlib compressobj producing gzip output '''
+        return zlib.compressobj(self.level, zlib.DEFLATED,
+                                16 + zlib.MAX_WBITS)
+
+
+def gzip(content, level=6):
+    ''' gzip content, without gzip.compress's file object overhead '''
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(content) + compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    ''' True if the Accept-Encoding header value allows gzip '''
+    if not accept_encoding:
+        return False
+    star = False
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip()
+        if coding not in ('gzip', 'x-gzip', '*'):
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0
+        if coding == '*':
+            star = q > 0
+        else:
+            return q > 0
+    return star
@@ -3,13 +3,15 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
-import json
 from socket import gethostbyname
 import time
 import urllib.parse as urllib
 
+import spindrift.codec as codec
+import spindrift.deadline as deadlines
 from spindrift.http import HTTPHandler
 from spindrift.network import Network
+from spindrift.pool import get_pool
 from spindrift.timer import Timer
 
 
@@ -20,7 +22,8 @@ log = logging.getLogger(__name__)
 def connect(network, timer, callback, url, query=None, method='GET', body=None,
             headers=None, is_json=True, is_form=False, timeout=5.0,
             wrapper=None, evaluate=None, handler=None, debug=False,
-            trace=False, **kwargs):
+            trace=False, max_content_length=None, pool=True, deadline=None,
+            **kwargs):
     """ Make an async rest connection, executing callback on completion
 
         Parameters:
@@ -51,6 +54,15 @@ def connect(network, timer, callback, url, query=None, method='GET', body=None,
                        (see ConnectHandler.evaluate)
             debug    - log debug messages on start/open/close
             trace    - log debug sent and recv'd http data
+            max_content_length - maximum length of the response content,
+                       after any decompression (default=None, no limit)
+            pool     - spindrift.pool.ConnectionPool used to reuse
+                       connections, or True for the network's pool
+                       (default=True; None for a connection per request)
+            deadline - spindrift.deadline value, which shortens timeout; if
+                       it has passed, callback is invoked with (1, 'timeout')
+                       and no connection is made (None is returned)
+                       (default=None)
             kwargs   - additional keyword args that might be useful in a
                        ConnectHandler subclass
 
@@ -58,16 +70,22 @@ def connect(network, timer, callback, url, query=None, method='GET', body=None,
 
             1. If body is a dict and method is GET, then the contents of dict
                are added to the query string and body is cleared.
+
+            2. If a pooled connection is reused, the returned handler is the
+               one used for an earlier request; the host name is only
+               resolved when a new connection is opened.
     """
     if query is not None:
         if isinstance(query, dict):
             query = urllib.urlencode(query)
         url = '{}?{}'.format(url, query)
     p = URLParser(url)
-    return connect_parsed(network, timer, callback, url, p.host, p.address,
+    return connect_parsed(network, timer, callback, url, p.host, None,
                           p.port, p.path, p.query, p.is_ssl, method, headers,
                           body, is_json, is_form, timeout, wrapper, handler,
-                          evaluate, debug, trace, **kwargs)
+                          evaluate, debug, trace,
+                          max_content_length=max_content_length, pool=pool,
+                          deadline=deadline, **kwargs)
 
 
 def connect_sync(*args, **kwargs):
@@ -88,6 +106,7 @@ def connect_sync(*args, **kwargs):
 
     network = Network()
     timer = Timer()
+    kwargs['pool'] = None  # the network is discarded
     c = connect(network, timer, cb, *args, **kwargs)
     run(network, timer, c)
 
@@ -97,19 +116,39 @@ def connect_sync(*args, **kwargs):
 def connect_parsed(network, timer, callback, url, host, address, port, path,
                    query, is_ssl, method, headers, body, is_json, is_form,
                    timeout, wrapper, handler, evaluate, debug, trace,
+                   max_content_length=None, pool=True, deadline=None,
                    **kwargs):
+    if deadline is not None:
+        if deadlines.is_expired(deadline):
+            log.warning('deadline passed before connect: %s', url)
+            callback(1, deadlines.TIMEOUT)
+            return None
+        timeout = deadlines.timeout(deadline, timeout)
     c = ConnectContext(callback, timer, url, method, path, query, host,
                        headers, body, is_json, is_form, timeout, wrapper,
-                       evaluate, debug, trace, kwargs)
-    return network.add_connection(address, port, handler or ConnectHandler, c,
-                                  is_ssl=is_ssl)
+                       evaluate, debug, trace, kwargs, max_content_length)
+    handler = handler or ConnectHandler
+    if pool:
+        if pool is True:
+            pool = get_pool(network, timer)
+        key = ('https' if is_ssl else 'http', host, port)
+        h = pool.checkout(key, handler)
+        if h is not None:
+            h._pool_reuse(c)
+            return h
+        if pool.add(key):
+            c.pool = pool
+            c.pool_key = key
+    if address is None:
+        address = gethostbyname(host)
+    return network.add_connection(address, port, handler, c, is_ssl=is_ssl)
 
 
 class ConnectContext(object):
 
     def __init__(self, callback, timer, url, method, path, query, host,
                  headers, body, is_json, is_form, timeout, wrapper, evaluate,
-                 is_debug, is_trace, kwargs):
+                 is_debug, is_trace, kwargs, max_content_length=None):
         self.callback = callback
         self.timer = timer
         self.url = url
@@ -127,16 +166,42 @@ class ConnectContext(object):
         self.is_debug = is_debug
         self.is_trace = is_trace
         self.kwargs = kwargs
+        self.max_content_length = max_content_length
+        self.pool = None  # spindrift.pool.ConnectionPool, if pooled
+        self.pool_key = None
 
 
 class ConnectHandler(HTTPHandler):
     """ Manage http request and response as defined by context
+
+        If the context has a pool (see spindrift.pool), the connection is
+        kept open after the response and is reused for a later request to
+        the same host; on_init and on_ready are called for each request.
     """
 
+    def _on_init(self):
+        super(ConnectHandler, self)._on_init()
+        self._pool = getattr(self.context, 'pool', None)
+        self._pool_key = getattr(self.context, 'pool_key', None)
+        self._is_idle = False
+
+    def _pool_reuse(self, context):
+        self.context = context
+        self._is_idle = False
+        self.on_init()
+        self.on_ready()
+
+    def _on_close(self):
+        super(ConnectHandler, self)._on_close()
+        if self._pool is not None:
+            self._pool.discard(self._pool_key, self)
+
     def on_init(self):
         self.is_done = False
         self.is_success = False
         self.is_timeout = False
+        self.is_keep_alive = False  # response allows connection reuse
+        self.http_max_content_length = self.context.max_content_length
         self.setup()
         self.check_kwargs()
         self.timer = self.context.timer.add(
@@ -179,11 +244,11 @@ class ConnectHandler(HTTPHandler):
         if context.content_type != 'form' and \
                 isinstance(context.body, (dict, list, tuple, float, bool, int)):
             try:
-                json.dumps(context.body)
+                context.body = codec.dumpb(context.body)
             except Exception:
                 context.body = str(context.body)
             else:
-                context.content_type = 'json'
+                context.content_type = 'application/json'
 
         if context.body is None:
             context.body = ''
@@ -195,8 +260,13 @@ class ConnectHandler(HTTPHandler):
         if not self.is_success:
             rc = 1
         self.timer.cancel()
-        self.context.callback(rc, result)
-        self.close('transaction complete')
+        if self._pool is not None and self.is_keep_alive and self.is_open:
+            self._is_idle = True
+            self._pool.checkin(self._pool_key, self)
+            self.context.callback(rc, result)
+        else:
+            self.context.callback(rc, result)
+            self.close('transaction complete')
 
     def on_open(self):
         if self.context.is_debug:
@@ -243,11 +313,15 @@ class ConnectHandler(HTTPHandler):
             headers=context.headers,
             content=context.body,
             content_type=context.content_type,
-            close=True,
+            close=self._pool is None,
         )
 
     def on_data(self, data):
 
+        if self._is_idle:
+            self.close('unexpected data on idle connection')
+            return
+
         if self.context.is_trace:
             log.debug('recv: %s', data)
 
@@ -284,6 +358,13 @@ class ConnectHandler(HTTPHandler):
         if self.context.is_trace:
             log.debug('full-recv: %s', self.http_message)
 
+        connection = set(t.strip() for t in self.http_headers.get(
+            'connection', '').lower().split(','))
+        if self.http_version == 'HTTP/1.0':  # persistent only if asked
+            self.is_keep_alive = 'keep-alive' in connection
+        else:
+            self.is_keep_alive = 'close' not in connection
+
         try:
             evaluate = self.context.evaluate or self.__class__.evaluate
             result = evaluate(self)
@@ -292,7 +373,7 @@ class ConnectHandler(HTTPHandler):
 
         if self.context.is_json and result is not None and len(result):
             try:
-                result = json.loads(result)
+                result = codec.loads(result)
             except Exception as e:
                 return self.done(str(e), 1)
 
@@ -341,7 +422,14 @@ class URLParser(object):
         else:
             self.host = u.netloc
             self.port = 443 if self.is_ssl else 80
-        self.address = gethostbyname(self.host)
+        self._address = None
         self.resource = u.path + ('?%s' % u.query if u.query else '')
         self.path = u.path
         self.query = u.query
+
+    @property
+    def address(self):
+        ''' the ip address of host (resolved on first reference) '''
+        if self._address is None:
+            self._address = gethostbyname(self.host)
+        return self._address
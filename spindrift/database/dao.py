@@ -2,6 +2,7 @@
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
+import spindrift.codec as codec
 from spindrift.database.field import FieldCache
 from spindrift.database.query import Query
 
@@ -28,10 +29,7 @@ class DAO():
         self._cache_field_values()
 
     def __repr__(self):
-        flds = {nam: getattr(self, nam) for nam in self._fields.all_fields}
-        flds.update({nam: val
-                    for nam, val in self.__dict__.get('_tables', {}).items()})
-        return '<{}>:{}'.format(self.__class__.__name__, flds)
+        return '<{}>:{}'.format(self.__class__.__name__, _as_dict(self))
 
     def __getattr__(self, name):
         joined = self.__dict__.get('_tables', {})
@@ -356,6 +354,16 @@ class DAO():
         return f
 
 
+def _as_dict(dao):
+    ''' fields and joined tables (see spindrift.codec) '''
+    result = {nam: getattr(dao, nam) for nam in dao._fields.all_fields}
+    result.update(dao.__dict__.get('_tables', {}))
+    return result
+
+
+codec.add_type(DAO, _as_dict)
+
+
 def gather(items, attribute):
     """Gather children DAOs into a list under a shared parent.
 
@@ -0,0 +1,63 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Request deadlines
+
+    A deadline is the time.monotonic value after which the result of some
+    work is of no use (the client has given up, or a gateway in front of
+    the server has timed out). It travels with a request (request.deadline)
+    to the work done on its behalf, which is skipped, or stopped, once the
+    deadline passes. None means no deadline.
+
+    Work stopped by a deadline fails with the error result TIMEOUT, which
+    is the result of a spindrift.connect timeout.
+'''
+import time
+
+import logging
+log = logging.getLogger(__name__)
+
+
+TIMEOUT = 'timeout'
+
+
+def after(seconds):
+    ''' the deadline seconds from now '''
+    return time.monotonic() + seconds
+
+
+def remaining(deadline):
+    ''' seconds until deadline (negative once it has passed), or None '''
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def is_expired(deadline):
+    return deadline is not None and deadline <= time.monotonic()
+
+
+def earliest(*deadlines):
+    ''' the first of deadlines which are not None, or None '''
+    deadlines = [d for d in deadlines if d is not None]
+    return min(deadlines) if deadlines else None
+
+
+def timeout(deadline, seconds):
+    ''' seconds, shortened to the time remaining before deadline '''
+    if deadline is None:
+        return seconds
+    return max(min(seconds, remaining(deadline)), 0)
+
+
+def from_header(value):
+    ''' the deadline from a header value in (decimal) seconds, or None '''
+    if value is None:
+        return None
+    try:
+        return after(float(value))
+    except ValueError:
+        log.warning('invalid request timeout: %s', value)
+        return None
@@ -0,0 +1,375 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+HPACK header compression for HTTP/2 (RFC 7541)
+'''
+import bisect
+
+import logging
+log = logging.getLogger(__name__)
+
+
+_HUFFMAN_LENGTHS = (  # code length of each symbol (0-255, EOS)
+    13, 23, 28, 28, 28, 28, 28, 28, 28, 24, 30, 28, 28, 30, 28, 28, 28, 28, 28,
+    28, 28, 28, 30, 28, 28, 28, 28, 28, 28, 28, 28, 28, 6, 10, 10, 12, 13, 6,
+    8, 11, 10, 10, 8, 11, 8, 6, 6, 6, 5, 5, 5, 6, 6, 6, 6, 6, 6, 6, 7, 8, 15,
+    6, 12, 10, 13, 6, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7, 7,
+    7, 7, 7, 8, 7, 8, 13, 19, 13, 14, 6, 15, 5, 6, 5, 6, 5, 6, 6, 6, 5, 7, 7,
+    6, 6, 6, 5, 6, 7, 6, 5, 5, 6, 7, 7, 7, 7, 7, 15, 11, 14, 13, 28, 20, 22,
+    20, 20, 22, 22, 22, 23, 22, 23, 23, 23, 23, 23, 24, 23, 24, 24, 22, 23, 24,
+    23, 23, 23, 23, 21, 22, 23, 22, 23, 23, 24, 22, 21, 20, 22, 22, 23, 23, 21,
+    23, 22, 22, 24, 21, 22, 23, 23, 21, 21, 22, 21, 23, 22, 23, 23, 20, 22, 22,
+    22, 23, 22, 22, 23, 26, 26, 20, 19, 22, 23, 22, 25, 26, 26, 26, 27, 27, 26,
+    24, 25, 19, 21, 26, 27, 27, 26, 27, 24, 21, 21, 26, 26, 28, 27, 27, 27, 20,
+    24, 20, 21, 22, 21, 21, 23, 22, 22, 25, 25, 24, 24, 26, 23, 26, 27, 26, 26,
+    27, 27, 27, 27, 27, 28, 27, 27, 27, 27, 27, 26, 30,
+)
+
+STATIC_TABLE = (
+    (':authority', ''),
+    (':method', 'GET'),
+    (':method', 'POST'),
+    (':path', '/'),
+    (':path', '/index.html'),
+    (':scheme', 'http'),
+    (':scheme', 'https'),
+    (':status', '200'),
+    (':status', '204'),
+    (':status', '206'),
+    (':status', '304'),
+    (':status', '400'),
+    (':status', '404'),
+    (':status', '500'),
+    ('accept-charset', ''),
+    ('accept-encoding', 'gzip, deflate'),
+    ('accept-language', ''),
+    ('accept-ranges', ''),
+    ('accept', ''),
+    ('access-control-allow-origin', ''),
+    ('age', ''),
+    ('allow', ''),
+    ('authorization', ''),
+    ('cache-control', ''),
+    ('content-disposition', ''),
+    ('content-encoding', ''),
+    ('content-language', ''),
+    ('content-length', ''),
+    ('content-location', ''),
+    ('content-range', ''),
+    ('content-type', ''),
+    ('cookie', ''),
+    ('date', ''),
+    ('etag', ''),
+    ('expect', ''),
+    ('expires', ''),
+    ('from', ''),
+    ('host', ''),
+    ('if-match', ''),
+    ('if-modified-since', ''),
+    ('if-none-match', ''),
+    ('if-range', ''),
+    ('if-unmodified-since', ''),
+    ('last-modified', ''),
+    ('link', ''),
+    ('location', ''),
+    ('max-forwards', ''),
+    ('proxy-authenticate', ''),
+    ('proxy-authorization', ''),
+    ('range', ''),
+    ('referer', ''),
+    ('refresh', ''),
+    ('retry-after', ''),
+    ('server', ''),
+    ('set-cookie', ''),
+    ('strict-transport-security', ''),
+    ('transfer-encoding', ''),
+    ('user-agent', ''),
+    ('vary', ''),
+    ('via', ''),
+    ('www-authenticate', ''),
+)
+
+
+def _huffman_tables():
+    ''' build the canonical codes and the decoding ranges from the lengths
+
+        the HPACK code is canonical: codes of each length are consecutive,
+        in symbol order, so the codes of length L, left-aligned in 30 bits,
+        form one range. a 30 bit window of input falls in exactly one range,
+        found with bisect.
+    '''
+    order = sorted(range(257), key=lambda s: (_HUFFMAN_LENGTHS[s], s))
+    codes = [0] * 257
+    limits, lengths, firsts, offsets = [], [], [], []
+    code = 0
+    length = _HUFFMAN_LENGTHS[order[0]]
+    for offset, symbol in enumerate(order):
+        if _HUFFMAN_LENGTHS[symbol] != length:
+            limits.append(code << (30 - length))
+            code <<= _HUFFMAN_LENGTHS[symbol] - length
+            length = _HUFFMAN_LENGTHS[symbol]
+        if not lengths or lengths[-1] != length:
+            lengths.append(length)
+            firsts.append(code)
+            offsets.append(offset)
+        codes[symbol] = code
+        code += 1
+    limits.append(code << (30 - length))
+    return codes, order, limits, lengths, firsts, offsets
+
+
+_HUFFMAN_CODES, _HUFFMAN_SYMBOLS, _HUFFMAN_LIMITS, _HUFFMAN_RANGE_LENGTHS, \
+    _HUFFMAN_FIRSTS, _HUFFMAN_OFFSETS = _huffman_tables()
+_STATIC_INDEX = {}  # (name, value) -> index
+_STATIC_NAME_INDEX = {}  # name -> lowest index
+for _index, (_name, _value) in enumerate(STATIC_TABLE, start=1):
+    _STATIC_INDEX.setdefault((_name, _value), _index)
+    _STATIC_NAME_INDEX.setdefault(_name, _index)
+
+
+class HPACKError(Exception):
+    pass
+
+
+def huffman_encode(data):
+    ''' huffman encode bytes '''
+    acc = 0
+    nbits = 0
+    for byte in data:
+        length = _HUFFMAN_LENGTHS[byte]
+        acc = (acc << length) | _HUFFMAN_CODES[byte]
+        nbits += length
+    pad = -nbits % 8
+    acc = (acc << pad) | ((1 << pad) - 1)  # pad with the start of EOS
+    return acc.to_bytes((nbits + pad) // 8, 'big')
+
+
+def huffman_decode(data):
+    ''' decode huffman encoded bytes '''
+    limits = _HUFFMAN_LIMITS
+    lengths = _HUFFMAN_RANGE_LENGTHS
+    firsts = _HUFFMAN_FIRSTS
+    offsets = _HUFFMAN_OFFSETS
+    symbols = _HUFFMAN_SYMBOLS
+    result = bytearray()
+    acc = 0
+    nbits = 0
+    for byte in data:
+        acc = (acc << 8) | byte
+        nbits += 8
+        if nbits < 30:
+            continue
+        while nbits >= 30:
+            window = (acc >> (nbits - 30)) & 0x3fffffff
+            i = bisect.bisect_right(limits, window)
+            length = lengths[i]
+            symbol = symbols[offsets[i] + (window >> (30 - length)) -
+                             firsts[i]]
+            if symbol == 256:
+                raise HPACKError('EOS in huffman string')
+            result.append(symbol)
+            nbits -= length
+        acc &= (1 << nbits) - 1
+
+    while nbits >= 5:  # the shortest code
+        pad = 30 - nbits
+        window = (acc << pad) | ((1 << pad) - 1)
+        i = bisect.bisect_right(limits, window)
+        length = lengths[i]
+        if length > nbits:
+            break
+        symbol = symbols[offsets[i] + (window >> (30 - length)) - firsts[i]]
+        if symbol == 256:
+            raise HPACKError('EOS in huffman string')
+        result.append(symbol)
+        nbits -= length
+        acc &= (1 << nbits) - 1
+    if nbits > 7 or acc != (1 << nbits) - 1:
+        raise HPACKError('invalid huffman padding')
+    return bytes(result)
+
+
+def encode_integer(value, prefix, flags=0):
+    ''' the bytes of an integer with an n-bit prefix (and flag bits) '''
+    limit = (1 << prefix) - 1
+    if value < limit:
+        return bytes((flags | value,))
+    result = bytearray((flags | limit,))
+    value -= limit
+    while value >= 128:
+        result.append((value & 127) | 128)
+        value >>= 7
+    result.append(value)
+    return bytes(result)
+
+
+def decode_integer(data, offset, prefix):
+    ''' the (value, next offset) of an integer with an n-bit prefix '''
+    limit = (1 << prefix) - 1
+    try:
+        value = data[offset] & limit
+        offset += 1
+        if value < limit:
+            return value, offset
+        shift = 0
+        while True:
+            byte = data[offset]
+            offset += 1
+            value += (byte & 127) << shift
+            if byte < 128:
+                return value, offset
+            shift += 7
+            if shift > 28:
+                raise HPACKError('integer too large')
+    except IndexError:
+        raise HPACKError('truncated integer')
+
+
+def _encode_string(data):
+    ''' the shorter of the raw and huffman encodings of bytes '''
+    encoded = huffman_encode(data)
+    if len(encoded) < len(data):
+        return encode_integer(len(encoded), 7, 128) + encoded
+    return encode_integer(len(data), 7) + data
+
+
+class Decoder(object):
+
+    def __init__(self, max_table_size=4096, max_size=65536):
+        """Decoder of the header blocks from one connection.
+
+           Optional Arguments:
+               max_table_size - the dynamic table size allowed by the
+                                decoder's side (SETTINGS_HEADER_TABLE_SIZE)
+               max_size - maximum size of a decoded header list, counted
+                          as in SETTINGS_MAX_HEADER_LIST_SIZE
+
+           Notes:
+
+               1. Names and values are decoded as latin-1 (see
+                  spindrift.http.HTTPHeaders).
+        """
+        self.max_table_size = max_table_size
+        self.max_size = max_size
+        self._table = []  # dynamic table, oldest first
+        self._table_size = 0
+        self._size = max_table_size  # size set by the encoder
+
+    def _add(self, name, value):
+        self._table.append((name, value))
+        self._table_size += len(name) + len(value) + 32
+        self._evict()
+
+    def _evict(self):
+        table = self._table
+        evict = 0
+        while self._table_size > self._size:
+            name, value = table[evict]
+            self._table_size -= len(name) + len(value) + 32
+            evict += 1
+        if evict:
+            del table[:evict]
+
+    def _entry(self, index):
+        if index <= 0:
+            raise HPACKError('invalid index 0')
+        if index <= 61:
+            return STATIC_TABLE[index - 1]
+        table = self._table
+        if index - 61 > len(table):
+            raise HPACKError('invalid index %d' % index)
+        return table[61 - index]  # newest is 62
+
+    @staticmethod
+    def _string(data, offset):
+        huffman = data[offset] & 128 if offset < len(data) else 0
+        length, offset = decode_integer(data, offset, 7)
+        end = offset + length
+        if end > len(data):
+            raise HPACKError('truncated string')
+        value = data[offset:end]
+        if huffman:
+            value = huffman_decode(value)
+        return value.decode('latin-1'), end
+
+    def decode(self, data):
+        ''' a list of (name, value) from a header block '''
+        result = []
+        size = 0
+        offset = 0
+        end = len(data)
+        while offset < end:
+            byte = data[offset]
+            if byte & 128:  # indexed
+                index, offset = decode_integer(data, offset, 7)
+                name, value = self._entry(index)
+            elif byte & 32 and not byte & 64:  # dynamic table size update
+                if result:
+                    raise HPACKError('table size update after a header')
+                size_update, offset = decode_integer(data, offset, 5)
+                if size_update > self.max_table_size:
+                    raise HPACKError('table size update too large')
+                self._size = size_update
+                self._evict()
+                continue
+            else:
+                prefix = 6 if byte & 64 else 4
+                index, offset = decode_integer(data, offset, prefix)
+                if index:
+                    name = self._entry(index)[0]
+                else:
+                    name, offset = self._string(data, offset)
+                value, offset = self._string(data, offset)
+                if byte & 64:  # incremental indexing
+                    self._add(name, value)
+            size += len(name) + len(value) + 32
+            if size > self.max_size:
+                raise HPACKError('header list too large')
+            result.append((name, value))
+        return result
+
+
+class Encoder(object):
+
+    def __init__(self, cache_size=1000):
+        """Encoder of the header blocks sent on one connection.
+
+           Headers are sent without indexing, using the static table where
+           it has the name (or the name and value), and Huffman encoding
+           where it is shorter. Since the dynamic table isn't used, the
+           peer's SETTINGS_HEADER_TABLE_SIZE doesn't matter.
+
+           Optional Arguments:
+               cache_size - number of encoded headers to remember; a
+                            server sends the same few headers over and
+                            over again
+        """
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def encode(self, headers):
+        ''' the header block for an iterable of (name, value) '''
+        cache = self._cache
+        result = []
+        for header in headers:
+            encoded = cache.get(header)
+            if encoded is None:
+                encoded = self._encode(*header)
+                if len(cache) >= self.cache_size:
+                    cache.clear()
+                cache[header] = encoded
+            result.append(encoded)
+        return b''.join(result)
+
+    @staticmethod
+    def _encode(name, value):
+        index = _STATIC_INDEX.get((name, value))
+        if index:
+            return encode_integer(index, 7, 128)
+        value = _encode_string(value.encode('latin-1'))
+        index = _STATIC_NAME_INDEX.get(name)
+        if index:
+            return encode_integer(index, 4) + value
+        return b'\x00' + _encode_string(name.encode('latin-1')) + value
@@ -3,17 +3,104 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
+import collections
+import collections.abc
+import email.message
+import email.utils
 import gzip
+import tempfile
 import time
-import json
+import re
 import urllib.parse as urlparse
+import zlib
 
+import spindrift.codec as codec
+from spindrift.compress import accepts_gzip
+from spindrift.http2 import HTTP2Connection, PREFACE
 from spindrift.network import Handler
+from spindrift.websocket import WebSocket, accept_key, is_upgrade
 
 import logging
 log = logging.getLogger(__name__)
 
 
+ERROR = {  # codes with a prebuilt response (see error_response)
+    400: 'Bad Request',
+    404: 'Not Found',
+    413: 'Request Entity Too Large',
+    503: 'Service Unavailable',
+}
+MAX_STATUS_LINE = 1000  # maximum number of cached status lines
+HEADER_END = re.compile(rb'\n\r?\n')  # blank line after the headers
+HEADER_NO_COLON = re.compile(rb'^[^:\n]*$', re.M)  # invalid header line
+CONTINUE = b'HTTP/1.1 100 Continue\r\n\r\n'
+
+_date = (0, '')
+_date_line = (None, b'')
+_status_line = {}
+_error_response = {}
+
+
+def http_date():
+    ''' the current time as an HTTP (GMT) date, formatted once a second '''
+    global _date
+    now = int(time.time())
+    if _date[0] != now:
+        _date = (now, email.utils.formatdate(now, usegmt=True))
+    return _date[1]
+
+
+def http_date_line():
+    ''' the bytes of a Date header line, including the CRLF '''
+    global _date_line
+    date = http_date()
+    if _date_line[0] is not date:
+        _date_line = (date, b'Date: %s\r\n' % date.encode('ascii'))
+    return _date_line[1]
+
+
+def status_line(code, message):
+    ''' the bytes of a response's status line, including the CRLF '''
+    key = (code, message)
+    try:
+        return _status_line[key]
+    except KeyError:
+        line = ('HTTP/1.1 %d %s\r\n' % key).encode('ascii')
+        if len(_status_line) < MAX_STATUS_LINE:
+            _status_line[key] = line
+        return line
+
+
+def header_lines(headers):
+    ''' the bytes of a dict of headers, each line ending with a CRLF '''
+    if not headers:
+        return b''
+    return ''.join(
+        ['%s: %s\r\n' % item for item in headers.items()]
+    ).encode('ascii')
+
+
+def error_response(code, headers=b''):
+    ''' a complete, empty, connection-closing response for an ERROR code
+
+        headers are additional header lines (see header_lines). The
+        response is rebuilt only when the Date header changes.
+    '''
+    date = http_date()
+    key = (code, headers)
+    cached = _error_response.get(key)
+    if cached is None or cached[0] is not date:
+        cached = (date, b''.join((
+            status_line(code, ERROR[code]),
+            b'Date: ', date.encode('ascii'),
+            b'\r\nContent-Type: text/html; charset=utf-8'
+            b'\r\nContent-Length: 0\r\nConnection: close\r\n',
+            headers, b'\r\n',
+        )))
+        _error_response[key] = cached
+    return cached[1]
+
+
 class HTTPHandler(Handler):
 
     def _on_init(self):
@@ -21,21 +108,26 @@ class HTTPHandler(Handler):
 
                available variables (on_http_data)
 
-                   http_message - entire message
-                   http_headers - dictionary of headers
+                   http_message - entire message (only the status and
+                       header lines if the content was streamed, multipart
+                       or compressed, since it isn't kept)
+                   http_headers - HTTPHeaders (case-insensitive dict)
                    http_content - content
                    t_http_data - time when http data fully arrives
 
+                   http_version - 'HTTP/1.0' or 'HTTP/1.1', from status line
+
                    client:
                        http_status_code - integer code from status line
                        http_status_message - message from status line
 
                    server:
                        http_method - method from status line
-                       http_multipart - list of HTTPPart objects
+                       http_multipart - list of HTTPPart objects (Note 1)
                        http_resource - resource from status line
                        http_query_string - unmodified query string
-                       http_query - dict of query string
+                       http_query - dict of query string (parsed on first
+                                    reference)
                        charset - encoding from Content-Type header or None
 
                        if charset:
@@ -45,33 +137,173 @@ class HTTPHandler(Handler):
                    line is available
                on_http_send(self, headers, content) - useful for debugging
                on_http_data(self) - when data is available
+               on_http_part(self, part) - when each part of a multipart
+                   message is available
                on_http_error(self, message)
+
+               Note 1: a multipart message is parsed as it arrives, not
+                       stored in http_content. A part's content is kept in
+                       memory up to http_max_part_memory bytes (default
+                       1MB); after that, it is written to a temporary file.
+
+               Note 2: content with a gzip or deflate Content-Encoding is
+                       decompressed as it arrives. http_max_content_length
+                       applies to the decompressed content, as well as to
+                       the Content-Length.
+
+               pipelining (server):
+
+                   By default, an inbound connection stops reading after a
+                   request arrives, and starts again after the response is
+                   sent. If http_pipeline is True, requests continue to be
+                   parsed and dispatched (on_http_data) while earlier ones
+                   are still waiting for a response. Responses are held, as
+                   needed, and sent in request order.
+
+                   http_pipeline - enable pipelining (default False)
+                   http_max_pipeline - maximum number of requests waiting
+                       for a response before reading stops (default 10)
+                   http_slot - response slot of the request being
+                       responded to; it is set to the slot of the request
+                       being parsed before each callback. To respond to an
+                       earlier request, set http_slot back to that
+                       request's slot before calling http_send_server
+                       (RESTRequest does this)
+
+               streaming (server or client):
+
+                   If http_stream is set to True by on_http_status or
+                   on_http_headers, the content is not accumulated in
+                   http_content; instead, it is handed over as it arrives.
+                   The flag is reset for each message, and
+                   http_max_content_length does not apply.
+
+                   on_http_body_start(self) - after on_http_headers
+                   on_http_chunk(self, chunk) - a memoryview of the next
+                       piece of content, which is released when the call
+                       returns (copy it to keep it)
+                   on_http_body_end(self) - called instead of on_http_data
+
+                   http_pause() - stop reading content (from within or
+                       outside of on_http_chunk) until http_resume() is
+                       called, for instance, when the consumer of the
+                       chunks is full
+
+               compression (server):
+
+                   If http_compression is set to a
+                   spindrift.compress.Compression, responses are gzipped
+                   when the request's Accept-Encoding allows it (see
+                   Compression for the other conditions).
+
+               streaming response (server):
+
+                   http_send_server_stream sends the status line and
+                   headers with Transfer-Encoding: chunked and returns an
+                   HTTPWriter, which sends the content in pieces.
+
+               HTTP/2 (server):
+
+                   If http_h2c is True, an inbound connection which starts
+                   with the HTTP/2 preface (h2c with prior knowledge) is
+                   handled by a spindrift.http2.HTTP2Connection. Each
+                   stream's request is dispatched, once it is complete, like
+                   a pipelined request: http_slot is the stream, and the
+                   http_send_server methods respond on it. Streams are not
+                   limited by http_max_pipeline, and their responses are
+                   sent as soon as they are ready.
+
+                   http_h2c - accept HTTP/2 (default False)
+
+               WebSocket (server):
+
+                   http_websocket accepts an Upgrade: websocket request and
+                   returns a spindrift.websocket.WebSocket, which takes over
+                   the connection.
+
+                   http_max_message_size - largest websocket message
+                       (default 1MB)
+
+               Expect: 100-continue (server):
+
+                   A client that sends Expect: 100-continue waits for an
+                   interim "100 Continue" before sending the body. Once
+                   on_http_status and on_http_headers have returned, and
+                   the Content-Length is within http_max_content_length,
+                   the interim response is sent. A response sent from
+                   on_http_status or on_http_headers (for instance, a 401
+                   after checking the Authorization header) is final: the
+                   body is not read, and the connection closes after the
+                   response is sent.
+
+                   http_continue - answer Expect: 100-continue (default
+                       True)
         """
         self.t_http_data = 0
         self._data = bytearray()
+        self._offset = 0  # parse position in _data
         self._setup()
 
         self.http_max_content_length = None
         self.http_max_line_length = 10000
         self.http_max_header_count = 100
+        self.http_max_part_memory = 1024 * 1024
+        self.http_compression = None
+        self.http_continue = True
 
         self._http_close_on_complete = False
 
+        self.http_pipeline = False
+        self.http_max_pipeline = 10
+        self.http_slot = None
+        self._http_parse_slot = None  # slot of the request being parsed
+        self._http_slots = collections.deque()
+        self._http_is_parsing = False
+        self._http_is_paused = False
+        self._http_writers = []
+        self._http_charset = (None, None)  # (content-type, charset)
+
+        self.http_h2c = False
+        self._h2 = None  # HTTP2Connection
+        self._h2c_check = True  # look for the HTTP/2 preface
+
+        self.http_max_message_size = 1024 * 1024
+        self._ws = None  # WebSocket
+
+        self._protocol = None  # HTTP2Connection or WebSocket, if not http/1
+
     @property
     def http_message(self):
-        if len(self._data) == 0:
-            return self._http_message
-        return self._http_message[:-len(self._data)]
+        if self._http_head is not None:  # the body went to a sink
+            return self._http_head
+        return self._data[self._message_start:self._offset]
+
+    @property
+    def http_query(self):
+        if self._http_query is None:  # parse on first reference
+            query = {}
+            for n, v in urlparse.parse_qs(self.http_query_string).items():
+                query[n] = v[0] if len(v) == 1 else v
+            self._http_query = query
+        return self._http_query
+
+    @http_query.setter
+    def http_query(self, value):
+        self._http_query = value
 
     @property
     def charset(self):
         h = self.http_headers.get('content-type')
-        if h:
-            charset = [c.split('=')[1].strip() for c in h.split(';')
-                       if 'charset' in c]
-            if len(charset):
-                return charset[0]
-        return None
+        cached, charset = self._http_charset
+        if h is not cached and h != cached:
+            charset = None
+            if h:
+                charsets = [c.split('=')[1].strip() for c in h.split(';')
+                            if 'charset' in c]
+                if len(charsets):
+                    charset = charsets[0]
+            self._http_charset = (h, charset)
+        return charset
 
     def on_http_send(self, headers, content):
         pass
@@ -85,74 +317,230 @@ class HTTPHandler(Handler):
     def on_http_error(self, message):
         pass
 
-    def _multipart(self):
-        cache = self._data
-        self.http_headers['content-type'], boundary = \
-            self.http_headers['content-type'].split('; boundary=')
-        # split, remove \r\n and ignore first & last; stuff into _data for _line
-        for self._data in [p[2:] for p in
-                           self.http_content.split('--' + boundary)][1:-1]:
-            headers = dict(l.split(': ', 1) for l in iter(self._line, ''))
-            if 'Content-Disposition' in headers:
-                headers['Content-Disposition'], rem = \
-                    headers['Content-Disposition'].split('; ', 1)
-                disposition = dict(part.split('=', 1) for part in
-                                   rem.split('; '))
-            self.http_multipart.append(HTTPPart(headers, disposition,
-                                                self._data))
-        self._data = cache
+    def on_http_part(self, part):
+        pass
+
+    def _on_http_part(self, part):
+        self.http_multipart.append(part)
+        self.on_http_part(part)
+
+    def _multipart_parser(self):
+        ''' return an HTTPMultipart if the content is multipart, else None '''
+        content_type = self.http_headers.get('content-type', '')
+        if not content_type.startswith('multipart/'):
+            return None
+        boundary = _header_params(content_type).get('boundary')
+        if not boundary:
+            return None
+        return HTTPMultipart(boundary.encode('ascii'),
+                             self.http_max_part_memory, self._on_http_part)
 
     def _on_http_data(self):
-        if self.http_headers.get('content-encoding') == 'gzip':
-            try:
-                self.http_content = gzip.decompress(self.http_content)
-            except Exception:
-                return self._on_http_error('Malformed gzip data')
-        if self.http_headers.get('content-type', '').startswith('multipart'):
-            try:
-                self._multipart()
-            except Exception:
+        decoder, self._http_decoder = self._http_decoder, None
+        if decoder is not None and not decoder.close():
+            return self._on_http_decoder_error(decoder)
+        if self.http_stream:
+            return self._on_http_body_end()
+        multipart = self._http_multipart
+        if multipart is None:  # not checked on arrival
+            encoding = self.http_headers.get('content-encoding')
+            if decoder is None and encoding in DECODER_WBITS:
+                content, self.http_content = self.http_content, bytearray()
+                decoder = HTTPDecoder(encoding, self._http_append,
+                                      self.http_max_content_length)
+                decoder.feed(content)
+                if not decoder.close():
+                    return self._on_http_decoder_error(decoder)
+            multipart = self._multipart_parser()
+            if multipart is not None:
+                multipart.feed(self.http_content)
+        if multipart:
+            self._http_multipart = None
+            if not multipart.close():
                 return self._on_http_error('Malformed multipart message')
         if self.charset:
             self.http_content = self.http_content.decode(self.charset)
+        self._http_dispatch(self.on_http_data)
+
+    def _on_http_body_end(self):
+        self._http_dispatch(self.on_http_body_end)
+
+    def _http_dispatch(self, callback):
         self.t_http_data = time.perf_counter()
-        if self.is_inbound:
-            self._state = self._init
-            self.quiesce()
-        self.on_http_data()
+        self._state = self._init
+        slot = self.http_slot = self._http_parse_slot
+        if slot is None:
+            if self.is_inbound:
+                self.quiesce()
+            callback()
+        else:
+            if self.http_headers.get('connection') == 'close':
+                slot.is_close = True
+            callback()
+            if self._h2 is not None:
+                pass  # streams are independent
+            elif slot.is_close or \
+                    len(self._http_slots) >= self.http_max_pipeline:
+                self.quiesce()  # stop parsing until responses catch up
 
     def on_send_complete(self):
-        if self._http_close_on_complete:
+        if self._ws is not None:
+            self._ws.on_send_complete()
+        elif self._http_writers:  # response is still being sent
+            for writer in list(self._http_writers):
+                writer._drain()
+            if self.http_pipeline:
+                self._http_pipeline_resume()
+        elif self._http_close_on_complete:
             self.close()
+        elif self._http_is_paused:
+            pass
+        elif self.http_pipeline:
+            self._http_pipeline_resume()
         elif self.is_inbound:
             self.unquiesce()
-            self.on_data(b'')
+            if not self._http_is_parsing:
+                self.on_data(b'')
+
+    def http_pause(self):
+        ''' stop reading a streamed body; see http_resume '''
+        self._http_is_paused = True
+        self.quiesce()
+
+    def http_resume(self):
+        ''' continue reading a streamed body after http_pause '''
+        if self._http_is_paused:
+            self._http_is_paused = False
+            self.unquiesce()
+            if not self._http_is_parsing:
+                self.on_data(b'')
 
     def _send(self, headers, content):
         self.on_http_send(headers, content)
         data = headers + content if content else headers
-        super(HTTPHandler, self).send(data)
+        slot = self.http_slot
+        if slot is None:
+            super(HTTPHandler, self).send(data)
+        elif self._h2 is not None:
+            self._h2.send_response(slot, headers, content)
+        else:
+            slot.data += data
+
+    def _on_close(self):
+        if self._http_end_at_close:
+            self._http_end_at_close = False
+            self._on_end_at_close()
+        if self._ws is not None:
+            self._ws._on_handler_close()
+        self._http_slots.clear()
+        writers, self._http_writers = self._http_writers, []
+        for writer in writers:
+            writer._on_end()
+
+    def _http_flush(self):
+        ''' send pipelined responses that are next in order
+
+            the first slot's data is sent even if the response isn't done,
+            which happens with a streaming response (HTTPWriter).
+        '''
+        slots = self._http_slots
+        while slots and self.is_open:
+            slot = slots[0]
+            if slot.is_done:
+                slots.popleft()
+                if slot.is_close:
+                    slots.clear()
+                    self._http_close_on_complete = True
+                    if not slot.data:
+                        self.close()
+            if slot.data:
+                data, slot.data = slot.data, bytearray()
+                super(HTTPHandler, self).send(data)
+            if not slot.is_done:
+                break
+        self._http_pipeline_resume()
+
+    def _http_write(self, slot, data):
+        ''' send data now, or, if pipelining, when the slot's turn comes '''
+        if slot is None:
+            super(HTTPHandler, self).send(data)
+        else:
+            slot.data += data
+            if self._http_slots and self._http_slots[0] is slot:
+                self._http_flush()
+
+    def _http_pipeline_resume(self):
+        ''' start reading pipelined requests again, if there is room '''
+        if self.is_quiesced and self.is_open and not self._is_sending and \
+                not self._http_is_paused and \
+                not self._http_close_on_complete and \
+                not (self._http_slots and self._http_slots[-1].is_close) and \
+                len(self._http_slots) < self.http_max_pipeline:
+            self.unquiesce()
+            if not self._http_is_parsing:
+                self.on_data(b'')
 
     def _http_send(self, status, headers, content,
                    content_type='text/html', charset='utf-8',
-                   close=False, compress=False, host=None):
+                   close=False, compress=False, host=None, static=b''):
+        ''' send an http document
 
-        if not headers:
-            headers = {}
+            status is a str, or the bytes of a status_line; static is the
+            bytes of additional header lines (see header_lines), which are
+            not inspected.
+        '''
+        headers, header_keys, content = self._http_content(
+            headers, content, content_type, charset, compress)
+
+        if 'date' not in header_keys:
+            headers['Date'] = http_date()
+
+        if 'content-length' not in header_keys and \
+                'transfer-encoding' not in header_keys:
+            headers['Content-Length'] = len(content)
+
+        if close:
+            headers['Connection'] = 'close'
+
+        if self.is_outbound and 'host' not in header_keys:
+            host = host if host else self.host if self.host else \
+                '%s:%s' % self.peer_address
+            headers['Host'] = host
 
-        header_keys = [k.lower() for k in headers.keys()]
+        if not isinstance(status, bytes):
+            status = (status + '\r\n').encode('ascii')
+        self._send(
+            b''.join((status, header_lines(headers), static, b'\r\n')),
+            content,
+        )
+
+    def _http_content(self, headers, content, content_type, charset,
+                      compress):
+        ''' encode (and compress) content; add its headers
+
+            returns (headers, lower case header names, content)
+        '''
+        if headers:
+            header_keys = {k.lower() for k in headers}
+        else:
+            headers = {}
+            header_keys = ()
 
         if 'content-type' not in header_keys:
             if content_type == 'json':
-                content = json.dumps(content)
+                content = codec.dumpb(content)
                 content_type = 'application/json'
             elif content_type == 'form':
                 content_type = 'application/x-www-form-urlencoded'
                 content = urlparse.urlencode(content)
             headers['Content-Type'] = content_type
+        else:
+            content_type = next(v for k, v in headers.items()
+                                if k.lower() == 'content-type')
 
         if charset:
-            content = content.encode(charset)
+            if isinstance(content, str):
+                content = content.encode(charset)
             headers['Content-Type'] += '; charset=%s' % charset
 
         if compress:
@@ -161,29 +549,24 @@ class HTTPHandler(Handler):
             else:
                 content = gzip.compress(content)
                 headers['Content-Encoding'] = 'gzip'
-
-        if 'date' not in header_keys:
-            headers['Date'] = time.strftime(
-                "%a, %d %b %Y %H:%M:%S %Z", time.localtime())
-
-        if 'content-length' not in header_keys:
-            headers['Content-Length'] = len(content)
-
-        if close:
-            headers['Connection'] = 'close'
-
-        if self.is_outbound and 'host' not in (k.lower() for k in headers):
-            host = host if host else self.host if self.host else \
-                '%s:%s' % self.peer_address
-            headers['Host'] = host
-
-        headers = '%s\r\n%s\r\n\r\n' % (
-            status,
-            '\r\n'.join(['%s: %s' % (k, v) for k, v in headers.items()]),
-        )
-        headers = headers.encode('ascii')
-
-        self._send(headers, content)
+        elif self.http_compression is not None and \
+                len(content) >= self.http_compression.min_size and \
+                'content-encoding' not in header_keys and \
+                self._http_negotiate(content_type, headers):
+            content = self.http_compression.compress(content)
+            headers['Content-Encoding'] = 'gzip'
+
+        return headers, header_keys, content
+
+    def _http_negotiate(self, content_type, headers):
+        ''' True if a response of content_type should be gzipped '''
+        if self.is_outbound or \
+                not self.http_compression.is_compressible(content_type):
+            return False
+        headers['Vary'] = 'Accept-Encoding'
+        slot = self.http_slot
+        request = slot.headers if slot is not None else self.http_headers
+        return accepts_gzip(request.get('accept-encoding'))
 
     def http_send(self, method='GET', host=None, resource='/', headers=None,
                   content='', content_type='text/html', charset='utf-8',
@@ -197,59 +580,352 @@ class HTTPHandler(Handler):
 
     def http_send_server(self, content='', code=200, message='OK',
                          content_type='text/html', charset='utf-8',
-                         headers=None, gzip=False, close=False):
+                         headers=None, gzip=False, close=False, static=b''):
 
-        if close or self.http_headers.get('connection') == 'close':
-            self._http_close_on_complete = True
+        slot = self.http_slot
+        if not self._http_respond(slot, close):
+            return
 
-        status = 'HTTP/1.1 %d %s' % (code, message)
+        self._http_send(status_line(code, message), headers, content,
+                        content_type, charset, close, gzip, static=static)
 
-        self._http_send(status, headers, content, content_type, charset,
-                        close, gzip)
+        if slot is not None:
+            slot.is_done = True
+            self._http_flush()
+
+    def http_send_error(self, code, headers=b''):
+        ''' send the prebuilt response for an ERROR code and close
+
+            headers are additional header lines (see header_lines), which
+            are part of the prebuilt response.
+        '''
+        slot = self.http_slot
+        if not self._http_respond(slot, True):
+            return
+
+        self._send(error_response(code, headers), b'')
+
+        if slot is not None:
+            slot.is_done = True
+            self._http_flush()
+
+    def http_server_document(self, content='', code=200, message='OK',
+                             content_type='text/html', charset='utf-8',
+                             headers=None):
+        """Build a response, to send (any number of times) later.
+
+           The arguments are as in http_send_server. The result is
+           (head, content), for http_send_document, where head is the
+           status line and header lines, without Date and Connection (which
+           are added when it is sent). The content is encoded and, if the
+           current request allows it, compressed.
+        """
+        headers, header_keys, content = self._http_content(
+            headers, content, content_type, charset, False)
+        if 'content-length' not in header_keys:
+            headers['Content-Length'] = len(content)
+        return status_line(code, message) + header_lines(headers), content
+
+    def http_send_document(self, head, content, close=False, static=b''):
+        ''' send a response built by http_server_document '''
+        slot = self.http_slot
+        if not self._http_respond(slot, close):
+            return
+
+        self._send(b''.join((
+            head, http_date_line(),
+            b'Connection: close\r\n' if close else b'',
+            static, b'\r\n',
+        )), content)
+
+        if slot is not None:
+            slot.is_done = True
+            self._http_flush()
+
+    def _http_respond(self, slot, close):
+        ''' prepare to respond to the current request; False if it has been '''
+        if self._state == self._header:  # before the body: close after
+            close = True
+        if slot is None:
+            if close or self.http_headers.get('connection') == 'close':
+                self._http_close_on_complete = True
+        elif slot.is_done:
+            log.warning('cid=%s: pipelined request already has a response',
+                        self.id)
+            return False
+        elif close:
+            slot.is_close = True
+        return True
+
+    def _http_is_answered(self):
+        ''' True if the request being parsed has a response '''
+        slot = self._http_parse_slot
+        if slot is None:
+            return self._http_close_on_complete
+        return slot.is_done
+
+    def http_send_server_stream(self, code=200, message='OK',
+                                content_type='text/html', charset='utf-8',
+                                headers=None, close=False, iterable=None,
+                                on_end=None, static=b''):
+        """Start a chunked response and return an HTTPWriter.
+
+           Optional Arguments:
+               code, message, content_type, charset, headers, close,
+               static - as in http_send_server
+               iterable - the source of the content (see
+                   HTTPWriter.write_iter)
+               on_end - callable, without arguments, called when the
+                   response is complete or the connection closes
+
+           Notes:
+
+               1. If content_type is text/event-stream, the response is a
+                  Server-Sent Events stream: send with HTTPWriter.event.
+        """
+        slot = self.http_slot
+        if slot is not None and slot.is_done:
+            log.warning('cid=%s: pipelined request already has a response',
+                        self.id)
+            return None
+        close = close or self.http_headers.get('connection') == 'close'
+
+        headers = dict(headers) if headers else {}
+        headers['Transfer-Encoding'] = 'chunked'
+        if content_type == 'text/event-stream':
+            headers['Cache-Control'] = 'no-cache'
+        compressor = None
+        if self.http_compression is not None and \
+                'content-encoding' not in (k.lower() for k in headers) and \
+                self._http_negotiate(content_type, headers):
+            compressor = self.http_compression.compressobj()
+            headers['Content-Encoding'] = 'gzip'
+
+        status = status_line(code, message)
+        writer = HTTPWriter(self, slot, content_type, charset, close, on_end,
+                            compressor)
+        self._http_writers.append(writer)
+        self._http_send(status, headers, '', content_type, charset, close,
+                        static=static)
+        if slot is not None:
+            self._http_write(slot, b'')  # send headers if it's slot's turn
+        if iterable is not None:
+            writer.write_iter(iterable)
+        return writer
+
+    def http_websocket(self, on_message=None, on_close=None, protocol=None,
+                       on_end=None):
+        """Accept a WebSocket upgrade request and return a WebSocket.
+
+           Optional Arguments:
+               on_message, on_close, on_end - see WebSocket
+               protocol - the Sec-WebSocket-Protocol to send, if the
+                          client asked for one
+
+           Notes:
+
+               1. The connection belongs to the WebSocket from now on: no
+                  more http requests are parsed.
+
+               2. If the request isn't a websocket upgrade (or arrived on
+                  an HTTP/2 stream), 426 Upgrade Required is sent, and None
+                  is returned.
+        """
+        slot = self.http_slot
+        if self._h2 is not None or not is_upgrade(self.http_headers):
+            self.http_send_server(
+                code=426, message='Upgrade Required', close=True,
+                headers={'Upgrade': 'websocket',
+                         'Sec-WebSocket-Version': '13'})
+            return None
+        if not self._http_respond(slot, False):
+            return None
+
+        headers = {
+            'Upgrade': 'websocket',
+            'Connection': 'Upgrade',
+            'Sec-WebSocket-Accept': accept_key(
+                self.http_headers['sec-websocket-key']),
+        }
+        if protocol:
+            headers['Sec-WebSocket-Protocol'] = protocol
+        websocket = WebSocket(self, on_message, on_close,
+                              self.http_max_message_size, on_end)
+        self._ws = self._protocol = websocket
+        self._state = self._nop  # no more http parsing
+        websocket._data += self._data[self._offset:]  # sent right behind
+        del self._data[self._offset:]
+
+        self._send(b''.join((status_line(101, 'Switching Protocols'),
+                             header_lines(headers), b'\r\n')), b'')
+        if slot is not None:
+            slot.is_done = True
+            self._http_flush()
+        return websocket
 
     def _setup(self):
-        self.http_headers = {}
-        self._http_message = bytearray()
+        self.http_headers = HTTPHeaders()
         self.http_content = bytearray()
         self.http_status_code = None
         self.http_status_message = None
+        self.http_version = None
         self.http_method = None
         self.http_multipart = []
         self.http_resource = None
         self.http_query_string = None
         self.http_query = {}
+        self.http_stream = False
+        self._http_sink = None  # where content goes, if not http_content
+        self._http_multipart = None  # HTTPMultipart, or False if not one
+        self._http_decoder = None
+        self._http_received = 0  # bytes given to _http_sink
+        self._http_head = None  # status and header lines, if using a sink
+        self._http_end_at_close = False  # content ends when the peer closes
+        self._http_scan = 0  # where to resume looking for the header end
         self._state = self._status
+        self._message_start = self._offset
 
     def on_http_headers(self):
         """a chance to terminate connection if headers don't check out"""
         pass
 
+    def on_http_body_start(self):
+        pass
+
+    def on_http_chunk(self, chunk):
+        pass
+
+    def on_http_body_end(self):
+        pass
+
     def on_data(self, data):
-        self._http_message.extend(data)
-        self._data.extend(data)
-        while self.is_open and not self.is_quiesced and self._state():
-            pass
+        if self._protocol is not None:
+            return self._protocol.on_data(data)
+        self._data += data
+        if self._h2c_check and self._h2c_start():
+            return
+        self._http_is_parsing = True
+        try:
+            while self.is_open and not self.is_quiesced and self._state():
+                pass
+        finally:
+            self._http_is_parsing = False
+        self._compact()
+        if self._ws is not None and not self.is_quiesced:
+            self._ws.on_data(b'')  # upgraded: data behind the request
+
+    def _h2c_start(self):
+        ''' True if the connection is (or might be) HTTP/2 '''
+        data = self._data
+        size = min(len(data), len(PREFACE))
+        if not self.http_h2c or self.is_outbound or \
+                data[:size] != PREFACE[:size]:
+            self._h2c_check = False
+            return False
+        if size < len(PREFACE):
+            return True  # wait for the rest of the preface
+        self._h2c_check = False
+        self._data = bytearray()
+        self._h2 = self._protocol = HTTP2Connection(self)
+        self._h2.on_data(data)
+        return True
+
+    def _http2_request(self, stream):
+        ''' dispatch the request on an HTTP/2 stream (see HTTP2Connection) '''
+        self._setup()
+        self.http_slot = self._http_parse_slot = stream
+        headers = self.http_headers
+        for name, value in stream.header_list:
+            headers.add(name, value)
+        stream.headers = headers
+        self.http_method = stream.method
+        self.http_resource, query = _split_target(stream.path)
+        self.http_query_string = query
+        if query:
+            self._http_query = None  # parsed on reference
+        self.on_http_status(self.http_method, self.http_resource)
+        if stream.is_done or not self.is_open:
+            return
+        self.on_http_headers()
+        if not self.is_open:
+            return
+        self._http_sink_setup()  # same handling, and limits, as HTTP/1.1
+        if self.http_stream:
+            self.on_http_body_start()
+        if self._http_sink is None:
+            self.http_content = stream.content
+        elif stream.content:
+            with memoryview(stream.content) as chunk:
+                self._http_sink(chunk)
+            decoder = self._http_decoder
+            if decoder is not None and decoder.error:
+                return self._on_http_decoder_error(decoder)
+        self._on_http_data()
+
+    def _http2_too_long(self, stream):
+        self.http_slot = self._http_parse_slot = stream
+        self._on_http_too_long('Content exceeds maximum length')
+
+    def _http2_reset(self, stream):
+        ''' a stream is reset: stop any response in progress '''
+        for writer in list(self._http_writers):
+            if writer._slot is stream:
+                self._http_writers.remove(writer)
+                writer._on_end()
+
+    def _compact(self):
+        '''
+            discard everything in front of the current message. this is done
+            once per on_data, instead of re-slicing the buffer as each line
+            or chunk is consumed. the current message is kept so that
+            http_message remains available, unless its content goes to a
+            sink (stream, multipart or decoder), in which case the content
+            handed over so far is discarded too.
+        '''
+        start = self._message_start
+        if self._http_sink is not None:
+            start = self._offset
+        if start:
+            del self._data[:start]
+            self._offset -= start
+            self._message_start = 0
 
     def _on_http_error(self, message):
-        self._http_close_on_complete = True
+        self.http_slot = self._http_parse_slot
+        if self._h2 is not None:  # only the stream fails
+            self.on_http_error(message)
+            self._h2.reset(self._http_parse_slot)
+            return False
+        self._state = self._nop  # no more parsing on this connection
+        slots = self._http_slots
+        if slots:
+            # close after the responses to earlier requests are sent
+            slots[-1].is_close = True
+            if slots[-1] is self._http_parse_slot:
+                slots[-1].is_done = True
+        else:
+            self._http_close_on_complete = True
         self.on_http_error(message)
+        if slots:
+            self._http_flush()
         return False
 
     def _line(self):
-        test = self._data.split(b'\n', 1)
-        if len(test) == 1:
-            if len(self._data) > self.http_max_line_length:
+        data = self._data
+        start = self._offset
+        end = data.find(b'\n', start)
+        if end == -1:
+            if len(data) - start > self.http_max_line_length:
                 return self._on_http_error(
                     'too much data without a line termination (a)')
             return None
-        line, self._data = test
-        if len(line):
-            if line.endswith(b'\r'):
-                line = line[:-1]
-            if len(line) > self.http_max_line_length:
-                return self._on_http_error(
-                    'too much data without a line termination (b)')
-        return line.decode('utf-8')
+        self._offset = end + 1
+        if end > start and data[end - 1] == 13:  # strip \r
+            end -= 1
+        if end - start > self.http_max_line_length:
+            return self._on_http_error(
+                'too much data without a line termination (b)')
+        return data[start:end].decode('utf-8')
 
     def _init(self):
         self._setup()
@@ -265,6 +941,7 @@ class HTTPHandler(Handler):
 
         # HTTP/1.[0|1] 200 OK
         if toks[0] in ('HTTP/1.0', 'HTTP/1.1'):
+            self.http_version = toks[0]
             if len(toks) < 3:
                 self.http_status_message = ''
             else:
@@ -284,100 +961,228 @@ class HTTPHandler(Handler):
             if toks[2] not in ('HTTP/1.0', 'HTTP/1.1'):
                 return self._on_http_error(
                     'Invalid status line: not HTTP/1.0 or HTTP/1.1')
+            self.http_version = toks[2]
             self.http_method = toks[0]
 
-            res = urlparse.urlparse(toks[1])
-            self.http_resource = res.path
+            self.http_resource, query = _split_target(toks[1])
             self.http_query = {}
             self.http_query_string = ''
-            if res.query:
-                self.http_query_string = res.query
-                for n, v in urlparse.parse_qs(res.query).items():
-                    self.http_query[n] = v[0] if len(v) == 1 else v
+            if query:
+                self.http_query_string = query
+                self._http_query = None  # parsed on reference
 
+        self._state = self._header
         if self.is_inbound:
+            if self.http_pipeline:
+                slot = self.http_slot = self._http_parse_slot = HTTPSlot()
+                slot.headers = self.http_headers
+                self._http_slots.append(slot)
             self.on_http_status(self.http_method, self.http_resource)
 
-        self._state = self._header
         return True
 
     def _header(self):
-        line = self._line()
-        if line is None:
+        '''
+            the header lines are handled as a block: the block is checked
+            (line count, line length, colons) with a few scans of the
+            buffer, and is only split into headers when http_headers is
+            accessed (see HTTPHeaders).
+        '''
+        data = self._data
+        start = self._offset  # data[start - 1] is the status line's \n
+        base = self._message_start  # _http_scan is relative to the message
+        match = HEADER_END.search(data, max(start - 1, base + self._http_scan))
+        if match is None:
+            self._http_scan = max(start - 1, len(data) - 2) - base
+            if len(data) - data.rfind(b'\n', start) - 1 > \
+                    self.http_max_line_length:
+                return self._on_http_error(
+                    'too much data without a line termination (a)')
+            if data.count(b'\n', start) > self.http_max_header_count:
+                return self._on_http_error('Too many header records defined')
             return False
 
-        if len(line) == 0:
-            return self._end_header()
-
-        else:
-            if len(self.http_headers) == self.http_max_header_count:
+        end = match.start() + 1  # end of the header lines
+        self._offset = match.end()
+        if end > start:
+            if data.count(b'\n', start, end) > self.http_max_header_count:
                 return self._on_http_error('Too many header records defined')
-            test = line.split(':', 1)
-            if len(test) != 2:
+            if end - start > self.http_max_line_length and max(
+                    len(line) for line in data[start:end].split(b'\n')) \
+                    > self.http_max_line_length + 1:  # allow for \r
+                return self._on_http_error(
+                    'too much data without a line termination (b)')
+            if HEADER_NO_COLON.search(data, start, end - 1):
                 return self._on_http_error('Invalid header: missing colon')
-            name, value = test
-            self.http_headers[name.strip().lower()] = value.strip()
-
-        return True
+            self.http_headers._raw = data[start:end]
+        return self._end_header()
 
     def _end_header(self):
 
+        self.http_slot = self._http_parse_slot
+        self.on_http_headers()
+        if not self.is_open:
+            return False
+
+        if self.is_inbound:
+            if self._http_is_answered():  # rejected before the body
+                self._state = self._nop
+                return False
+        elif self.http_status_code == 100:  # interim response
+            self._setup()
+            return True
+
+        headers = self.http_headers
+
         # this gets set if the send method is called
-        if getattr(self, '_http_method', None) == 'HEAD':
+        if getattr(self, '_http_method', None) == 'HEAD' or \
+                self.http_status_code in (204, 304):  # no content
             self._length = 0
             self._state = self._content
 
-        elif 'transfer-encoding' in self.http_headers:
-            if self.http_headers['transfer-encoding'] != 'chunked':
+        elif headers.get('transfer-encoding') is not None:
+            if headers['transfer-encoding'] != 'chunked':
                 return self._on_http_error(
                     'Unsupported Transfer-Encoding value')
             self._state = self._chunked_length
 
         else:
-            if 'content-length' in self.http_headers:
+            length = headers.get('content-length')
+            if length is not None:
                 try:
-                    self._length = int(self.http_headers['content-length'])
+                    self._length = int(length)
                 except ValueError:
                     return self._on_http_error('Invalid content length')
-                if self.http_max_content_length:
+                if self.http_max_content_length and not self.http_stream:
                     if self._length > self.http_max_content_length:
-                        self.http_send_server(
-                            code=413, message='Request Entity Too Large'
-                        )
-                        return self._on_http_error(
+                        return self._on_http_too_long(
                             'Content-Length exceeds maximum length')
                 self._state = self._content
             else:
                 if self.is_inbound:  # server can't wait for close
                     self._length = 0
                     self._state = self._content
-                    self._http_close_on_complete = True
+                    if self._http_parse_slot is None:
+                        self._http_close_on_complete = True
                 else:
-                    self._on_close = self._on_end_at_close
+                    self._http_end_at_close = True  # see _on_close
                     self._state = self._nop
 
-        self.on_http_headers()
+        if self.is_inbound and self.http_continue and \
+                headers.get('expect', '').lower() == '100-continue':
+            self._http_continue()
+
+        self._http_sink_setup()
+        if self._http_sink is not None:
+            self._http_head = bytes(
+                self._data[self._message_start:self._offset])
+            if self._state == self._nop:
+                self._state = self._stream_to_close
+
+        if self.http_stream:
+            self.on_http_body_start()
 
         return self.is_open
 
+    def _http_sink_setup(self):
+        ''' pick where content goes: stream, multipart parser or decoder '''
+        if self.http_stream:
+            self._http_sink = self.on_http_chunk
+        else:
+            self._http_multipart = self._multipart_parser() or False
+            if self._http_multipart:
+                self._http_sink = self._http_multipart.feed
+
+        encoding = self.http_headers.get('content-encoding')
+        if encoding in DECODER_WBITS:
+            self._http_decoder = HTTPDecoder(
+                encoding,
+                self._http_sink or self._http_append,
+                None if self.http_stream else self.http_max_content_length,
+            )
+            self._http_sink = self._http_decoder.feed
+
+    def _http_continue(self):
+        ''' send "100 Continue" if the client is waiting to send the body '''
+        if self._state == self._content:
+            if not self._length:
+                return
+        elif self._state != self._chunked_length:
+            return
+        if len(self._data) > self._offset:  # body is already on its way
+            return
+        self._http_write(self._http_parse_slot, CONTINUE)
+
     def _nop(self):
         return False
 
     def _on_end_at_close(self):
-        self.http_content = self._data
+        if self._http_sink is not None:
+            self._stream_to_close()
+        else:
+            self.http_content = self._data[self._offset:]
+            self._offset = len(self._data)
         self._on_http_data()
 
+    def _http_chunk(self, end):
+        ''' hand content, from the offset to end, to the sink '''
+        start = self._offset
+        self._offset = end
+        self._http_received += end - start
+        self.http_slot = self._http_parse_slot
+        with memoryview(self._data) as data, data[start:end] as chunk:
+            self._http_sink(chunk)
+        decoder = self._http_decoder
+        if decoder is not None and decoder.error:
+            return self._on_http_decoder_error(decoder)
+        return True
+
+    def _http_append(self, chunk):
+        self.http_content += chunk
+
+    def _on_http_decoder_error(self, decoder):
+        if decoder.is_too_long:
+            return self._on_http_too_long(decoder.error)
+        return self._on_http_error(decoder.error)
+
+    def _on_http_too_long(self, message):
+        self.http_slot = self._http_parse_slot
+        if self.is_inbound:
+            self.http_send_error(413)
+        return self._on_http_error(message)
+
+    def _stream_to_close(self):
+        if len(self._data) > self._offset:
+            self._http_chunk(len(self._data))
+        return False
+
+    def _stream_content(self):
+        if self._length:
+            end = min(len(self._data), self._offset + self._length)
+            if end == self._offset:
+                return False
+            self._length -= end - self._offset
+            if not self._http_chunk(end):
+                return False
+        if self._length == 0 and not self._http_is_paused:
+            self._on_http_data()
+            return True
+        return False
+
     def _content(self):
-        if len(self._data) >= self._length:
-            self.http_content = self._data[:self._length]
-            self._data = self._data[self._length:]
+        if self._http_sink is not None:
+            return self._stream_content()
+        end = self._offset + self._length
+        if len(self._data) >= end:
+            self.http_content = self._data[self._offset:end]
+            self._offset = end
             self._on_http_data()
             return True
         return False
 
     def _chunked_length(self):
         line = self._line()
-        if line is None:
+        if line is None or line is False:
             return False
         line = line.split(';', 1)[0]
         try:
@@ -388,27 +1193,38 @@ class HTTPHandler(Handler):
         if self._length == 0:
             self._state = self._footer
             return True
-        if self.http_max_content_length:
-            if (len(self._data) + self._length) > self.http_max_content_length:
-                self.http_send_server(
-                    code=413, message='Request Entity Too Large'
-                )
-                return self._on_http_error(
+        if self.http_max_content_length and not self.http_stream:
+            received = self._http_received if self._http_sink else \
+                len(self.http_content)
+            if received + self._length > self.http_max_content_length:
+                return self._on_http_too_long(
                     'Content-Length exceeds maximum length')
         self._state = self._chunked_content
         return True
 
     def _chunked_content(self):
-        if len(self._data) >= self._length:
-            self.http_content.extend(self._data[:self._length])
-            self._data = self._data[self._length:]
+        if self._http_sink is not None:
+            end = min(len(self._data), self._offset + self._length)
+            if end == self._offset:
+                return False
+            self._length -= end - self._offset
+            if not self._http_chunk(end):
+                return False
+            if self._length == 0:
+                self._state = self._chunked_content_end
+            return True
+        end = self._offset + self._length
+        if len(self._data) >= end:
+            with memoryview(self._data) as data:
+                self.http_content += data[self._offset:end]
+            self._offset = end
             self._state = self._chunked_content_end
             return True
         return False
 
     def _chunked_content_end(self):
         line = self._line()
-        if line is None:
+        if line is None or line is False:
             return False
         if line == '':
             self._state = self._chunked_length
@@ -417,7 +1233,7 @@ class HTTPHandler(Handler):
 
     def _footer(self):
         line = self._line()
-        if line is None:
+        if line is None or line is False:
             return False
 
         if len(line) == 0:
@@ -430,19 +1246,522 @@ class HTTPHandler(Handler):
         if len(self.http_headers) == self.http_max_header_count:
             return self._on_http_error('Too many header records defined')
         name, value = test
-        self.http_headers[name.strip()] = value.strip()
+        self.http_headers.add(name.strip(), value.strip())
         return True
 
 
+def _header_params(value):
+    ''' the parameters of a header value (a; b=c; d="e") as a dict '''
+    message = email.message.Message()
+    message['x'] = value
+    return dict(message.get_params(header='x', failobj=[])[1:])
+
+
+def _split_target(target):
+    ''' split a request-target into (path, query)
+
+        produces the same path and query as urllib.parse.urlparse, which is
+        only called for targets that need its full treatment (absolute urls,
+        network paths and ;params).
+    '''
+    if target.startswith('/') and not target.startswith('//') and \
+            ';' not in target:
+        path = target.split('#', 1)[0]
+        path, _, query = path.partition('?')
+        return path, query
+    res = urlparse.urlparse(target)
+    return res.path, res.query
+
+
+class HTTPHeaders(collections.abc.MutableMapping):
+    ''' The headers of an http document
+
+        A dict of header name to value, with case-insensitive lookup. The
+        parser hands over the header lines as a block of bytes, which is
+        decoded and split into headers the first time a header is accessed.
+
+        Notes:
+
+            1. If a header is repeated, the dict has the last value; get_all
+               returns all of them, in order.
+
+            2. The names of parsed headers are lower case. A header that
+               is set or added keeps the case of its name, although it is
+               looked up without regard to case.
+    '''
+
+    def __init__(self, headers=None):
+        self._raw = None  # header lines, not yet split
+        self._index = {}  # lower case name -> (name, [values])
+        if headers:
+            self.update(headers)
+
+    def _split(self):
+        index = self._index
+        raw, self._raw = self._raw, None
+        for line in raw.decode('latin-1').split('\n'):
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            entry = index.get(name)
+            if entry is None:
+                index[name] = (name, [value.strip()])
+            else:
+                entry[1].append(value.strip())
+        index.pop('', None)  # after the last \n
+        return index
+
+    def _entry(self, name):
+        index = self._index if self._raw is None else self._split()
+        entry = index.get(name)
+        if entry is None and not name.islower():
+            entry = index.get(name.lower())
+        return entry
+
+    def __getitem__(self, name):
+        entry = self._entry(name)
+        if entry is None:
+            raise KeyError(name)
+        return entry[1][-1]
+
+    def __setitem__(self, name, value):
+        self._entry(name)  # split, if necessary
+        self._index[name.lower()] = (name, [value])
+
+    def __delitem__(self, name):
+        entry = self._entry(name)
+        if entry is None:
+            raise KeyError(name)
+        del self._index[entry[0].lower()]
+
+    def __contains__(self, name):
+        return self._entry(name) is not None
+
+    def __iter__(self):
+        self._entry('')  # split, if necessary
+        return (entry[0] for entry in self._index.values())
+
+    def __len__(self):
+        self._entry('')
+        return len(self._index)
+
+    def __repr__(self):
+        return 'HTTPHeaders(%r)' % dict(self.items())
+
+    def get(self, name, default=None):
+        index = self._index if self._raw is None else self._split()
+        entry = index.get(name)
+        if entry is None:
+            if name.islower():
+                return default
+            entry = index.get(name.lower())
+            if entry is None:
+                return default
+        return entry[1][-1]
+
+    def get_all(self, name):
+        ''' every value of a (possibly repeated) header, in order '''
+        entry = self._entry(name)
+        return list(entry[1]) if entry else []
+
+    def add(self, name, value):
+        ''' add a value for name, keeping any previous values '''
+        entry = self._entry(name)
+        if entry is None:
+            self[name] = value
+        else:
+            entry[1].append(value)
+
+
+class HTTPWriter(object):
+
+    def __init__(self, handler, slot, content_type, charset, close, on_end,
+                 compressor=None):
+        """Sender of a chunked (Transfer-Encoding) response.
+
+           Returned by HTTPHandler.http_send_server_stream. Content is sent
+           with write (or event), and the response is finished with end.
+           Content can also be pulled from an iterable (write_iter), in
+           which case the writer waits for each piece to leave the send
+           buffer before asking for the next one.
+
+           If content is pushed with write, is_blocked indicates that
+           data is accumulating in the send buffer; on_drain, if set, is
+           called (with the writer) when the buffer is empty again.
+
+           If the response is compressed, each write is flushed, so that
+           the peer can decompress it right away (an event, for instance).
+        """
+        self.handler = handler
+        self.is_event_stream = content_type == 'text/event-stream'
+        self.charset = charset
+        self.on_drain = None
+        self.is_done = False
+        self._slot = slot
+        self._close = close
+        self._compressor = compressor
+        self._on_end_callback = on_end
+        self._iterator = None
+        self._is_draining = False
+
+    @property
+    def is_blocked(self):
+        if self.is_done or self.handler.is_closed:
+            return True
+        if self._slot is not None and self._slot.data:
+            return True  # waiting for an earlier pipelined response
+        if self.handler._h2 is not None and \
+                self.handler._h2.is_blocked(self._slot):
+            return True  # waiting for HTTP/2 flow control
+        return self.handler._is_sending
+
+    def write(self, data):
+        ''' send data (str or bytes) as one chunk '''
+        if self.is_done:
+            log.warning('cid=%s: write after end of stream', self.handler.id)
+            return
+        if isinstance(data, str):
+            data = data.encode(self.charset or 'utf-8')
+        if data:
+            if self._compressor:
+                data = self._compressor.compress(data) + \
+                    self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._write_chunk(data)
+
+    def _write_chunk(self, data):
+        if self.handler._h2 is not None:
+            self.handler._h2.send_data(self._slot, data)
+            return
+        self.handler._http_write(self._slot, b''.join(
+            (b'%x\r\n' % len(data), data, b'\r\n')))
+
+    def event(self, data, event=None, id=None, retry=None):
+        ''' send a Server-Sent Event; multi-line data is split into lines '''
+        lines = []
+        if event:
+            lines.append('event: %s' % event)
+        if id is not None:
+            lines.append('id: %s' % id)
+        if retry:
+            lines.append('retry: %d' % retry)
+        lines.extend('data: %s' % line for line in
+                     str(data).splitlines() or [''])
+        self.write('\n'.join(lines) + '\n\n')
+
+    def write_iter(self, iterable):
+        """Send each item from iterable, then end the response.
+
+           The next item is requested only when the previous one has been
+           sent, so a generator producing a large response never has more
+           than a little of it in memory. If the writer is for an
+           event-stream, items are sent with event, and a dict item is used
+           as event keyword arguments.
+
+           If the iterable raises an exception, the connection is closed,
+           since the status has already been sent.
+        """
+        self._iterator = iter(iterable)
+        self._drain()
+
+    def end(self):
+        ''' send the last chunk, completing the response '''
+        if self.is_done:
+            return
+        if self._compressor:
+            self._write_chunk(self._compressor.flush())
+        self.is_done = True
+        self._iterator = None
+        handler = self.handler
+        try:
+            handler._http_writers.remove(self)
+        except ValueError:
+            pass
+        if self._slot is None:
+            if self._close:
+                handler._http_close_on_complete = True
+            handler._http_write(None, b'0\r\n\r\n')
+        elif handler._h2 is not None:
+            self._slot.is_done = True
+            handler._h2.send_data(self._slot, b'', True)
+        else:
+            self._slot.is_close = self._slot.is_close or self._close
+            self._slot.data += b'0\r\n\r\n'
+            self._slot.is_done = True
+            handler._http_flush()
+        self._on_end()
+
+    def _on_end(self):
+        self.is_done = True
+        self._iterator = None
+        on_end, self._on_end_callback = self._on_end_callback, None
+        if on_end:
+            on_end()
+
+    def _drain(self):
+        ''' continue sending from the iterator, or signal on_drain '''
+        if self._is_draining:
+            return
+        self._is_draining = True
+        try:
+            while self._iterator is not None and not self.is_blocked:
+                try:
+                    item = next(self._iterator)
+                except StopIteration:
+                    self.end()
+                    return
+                except Exception:
+                    log.exception('cid=%s: error in stream iterable',
+                                  self.handler.id)
+                    self._iterator = None
+                    self.handler.close('stream error')
+                    return
+                if self.is_event_stream:
+                    if isinstance(item, dict):
+                        self.event(**item)
+                    else:
+                        self.event(item)
+                else:
+                    self.write(item)
+            if self._iterator is None and self.on_drain and \
+                    not self.is_blocked:
+                self.on_drain(self)
+        finally:
+            self._is_draining = False
+
+
+class HTTPSlot(object):
+
+    def __init__(self):
+        """Place-holder for the response to one pipelined request.
+
+           Responses are buffered in data until every earlier request's
+           response has been sent.
+        """
+        self.data = bytearray()
+        self.headers = None  # request headers
+        self.is_done = False
+        self.is_close = False
+
+
+DECODER_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'x-gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+class HTTPDecoder(object):
+
+    def __init__(self, encoding, sink, max_length=None):
+        """Incremental decompression of content.
+
+           Compressed data is passed to feed as it arrives; decompressed
+           data is passed to sink (as a memoryview), no more than
+           DECODER_CHUNK bytes at a time, so a small amount of data that
+           decompresses to a large amount (a "zip bomb") is never expanded
+           all at once. If the decompressed length exceeds max_length, the
+           decoder stops.
+
+           Problems are reported in error (is_too_long is set if the error
+           is the result of max_length); feed and close don't raise.
+        """
+        self.encoding = encoding
+        self.sink = sink
+        self.max_length = max_length
+        self.length = 0
+        self.error = None
+        self.is_too_long = False
+        self._is_fed = False
+        self._decompressor = zlib.decompressobj(DECODER_WBITS[encoding])
+
+    def feed(self, data):
+        if self.error:
+            return
+        self._is_fed = self._is_fed or len(data) > 0
+        decompressor = self._decompressor
+        try:
+            while True:
+                content = decompressor.decompress(data, DECODER_CHUNK)
+                self._emit(content)
+                data = decompressor.unconsumed_tail
+                if self.error or decompressor.eof or \
+                        not data and len(content) < DECODER_CHUNK:
+                    break
+        except zlib.error:
+            self.error = 'Malformed %s data' % self.encoding
+
+    def close(self):
+        ''' return True if the content was complete and well-formed '''
+        if self.error is None and self._is_fed:
+            try:
+                self._emit(self._decompressor.flush())
+            except zlib.error:
+                pass
+            if self.error is None and not self._decompressor.eof:
+                self.error = 'Malformed %s data' % self.encoding
+        return self.error is None
+
+    def _emit(self, content):
+        if content and not self.error:
+            self.length += len(content)
+            if self.max_length and self.length > self.max_length:
+                self.error = 'Decompressed content exceeds maximum length'
+                self.is_too_long = True
+                return
+            with memoryview(content) as data:
+                self.sink(data)
+
+
+DECODER_CHUNK = 64 * 1024
+
+
+class HTTPMultipart(object):
+
+    def __init__(self, boundary, max_memory, on_part):
+        """Incremental parser for a multipart message.
+
+           Content is passed to feed as it arrives, and on_part is called
+           with an HTTPPart as each part completes. Only a boundary's
+           length of data is held back from a part while looking for the
+           next boundary, and each part's content is written to a
+           SpooledTemporaryFile, which moves to disk after max_memory
+           bytes.
+        """
+        self.delimiter = b'\r\n--' + boundary
+        self.max_memory = max_memory
+        self.on_part = on_part
+        self.error = None
+        self._buffer = bytearray(b'\r\n')  # first boundary has no CRLF
+        self._state = self._preamble
+        self._part = None
+
+    def feed(self, data):
+        if self.error:
+            return
+        self._buffer += data
+        try:
+            while self._state():
+                pass
+        except Exception as e:
+            self.error = str(e)
+            self._buffer = bytearray()
+            if self._part:
+                self._part.file.close()
+
+    def close(self):
+        ''' return True if the message was complete and well-formed '''
+        if self._state != self._epilogue:
+            if self._part:
+                self._part.file.close()
+            self.error = self.error or 'incomplete multipart message'
+        return self.error is None
+
+    def _preamble(self):
+        buffer = self._buffer
+        index = buffer.find(self.delimiter)
+        if index == -1:
+            del buffer[:-len(self.delimiter)]
+            return False
+        del buffer[:index + len(self.delimiter)]
+        self._state = self._boundary
+        return True
+
+    def _boundary(self):
+        buffer = self._buffer
+        if buffer.startswith(b'--'):
+            self._state = self._epilogue
+            return True
+        index = buffer.find(b'\r\n')
+        if index == -1:
+            if len(buffer) > MAX_PART_HEADER:
+                raise ValueError('invalid boundary line')
+            return False
+        del buffer[:index + 2]  # ignore transport padding
+        self._state = self._headers
+        return True
+
+    def _headers(self):
+        buffer = self._buffer
+        if buffer.startswith(b'\r\n'):
+            index, lines = 0, []
+        else:
+            index = buffer.find(b'\r\n\r\n')
+            if index == -1:
+                if len(buffer) > MAX_PART_HEADER:
+                    raise ValueError('part headers too long')
+                return False
+            lines = buffer[:index].decode('utf-8').split('\r\n')
+            index += 2
+        del buffer[:index + 2]
+
+        headers = {}
+        for line in lines:
+            name, colon, value = line.partition(':')
+            if not colon:
+                raise ValueError('invalid part header: missing colon')
+            headers[name.strip().lower()] = value.strip()
+        disposition = _header_params(headers.get('content-disposition', ''))
+
+        self._part = HTTPPart(headers, disposition, file=tempfile.
+                              SpooledTemporaryFile(max_size=self.max_memory))
+        self._state = self._body
+        return True
+
+    def _body(self):
+        buffer = self._buffer
+        index = buffer.find(self.delimiter)
+        end = len(buffer) - len(self.delimiter) if index == -1 else index
+        if end > 0:
+            with memoryview(buffer) as data, data[:end] as content:
+                self._part.file.write(content)
+            del buffer[:end]
+        if index == -1:
+            return False
+        del buffer[:len(self.delimiter)]
+        part, self._part = self._part, None
+        part.file.seek(0)
+        self._state = self._boundary
+        self.on_part(part)
+        return True
+
+    def _epilogue(self):
+        self._buffer.clear()
+        return False
+
+
+MAX_PART_HEADER = 10000
+
+
 class HTTPPart(object):
 
-    def __init__(self, headers, disposition, content):
+    def __init__(self, headers, disposition, content=None, file=None):
         """Container for one part of a multipart message.
 
-           The disposition is a dict with the k:v pairs from the
+           The headers are a dict, with lowercase keys, of the part's
+           headers. The disposition is a dict with the k:v pairs from the
            'Content-Disposition' header, where things like filename are
            stored.
+
+           The content is available as bytes (content), or as a file-like
+           object (file), which avoids reading a large part into memory.
         """
         self.headers = headers
         self.disposition = disposition
-        self.content = content
+        self.file = file
+        self._content = content
+
+    @property
+    def name(self):
+        return self.disposition.get('name')
+
+    @property
+    def filename(self):
+        return self.disposition.get('filename')
+
+    @property
+    def content(self):
+        if self._content is None and self.file is not None:
+            position = self.file.tell()
+            self.file.seek(0)
+            self._content = self.file.read()
+            self.file.seek(position)
+        return self._content
@@ -0,0 +1,563 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+HTTP/2 over cleartext tcp (h2c), with prior knowledge (RFC 9113)
+'''
+import struct
+
+import spindrift.hpack as hpack
+
+import logging
+log = logging.getLogger(__name__)
+
+
+PREFACE = b'PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n'
+
+# frame types
+DATA = 0x0
+HEADERS = 0x1
+PRIORITY = 0x2
+RST_STREAM = 0x3
+SETTINGS = 0x4
+PUSH_PROMISE = 0x5
+PING = 0x6
+GOAWAY = 0x7
+WINDOW_UPDATE = 0x8
+CONTINUATION = 0x9
+
+# frame flags
+END_STREAM = 0x1
+ACK = 0x1
+END_HEADERS = 0x4
+PADDED = 0x8
+PRIORITY_FLAG = 0x20
+
+# error codes
+NO_ERROR = 0x0
+PROTOCOL_ERROR = 0x1
+INTERNAL_ERROR = 0x2
+FLOW_CONTROL_ERROR = 0x3
+STREAM_CLOSED = 0x5
+FRAME_SIZE_ERROR = 0x6
+REFUSED_STREAM = 0x7
+CANCEL = 0x8
+COMPRESSION_ERROR = 0x9
+
+# settings
+SETTINGS_HEADER_TABLE_SIZE = 0x1
+SETTINGS_ENABLE_PUSH = 0x2
+SETTINGS_MAX_CONCURRENT_STREAMS = 0x3
+SETTINGS_INITIAL_WINDOW_SIZE = 0x4
+SETTINGS_MAX_FRAME_SIZE = 0x5
+SETTINGS_MAX_HEADER_LIST_SIZE = 0x6
+
+DEFAULT_WINDOW = 65535
+MAX_WINDOW = 2 ** 31 - 1
+MAX_FRAME_SIZE = 16384  # the default, which is all that is accepted
+
+# HTTP/1 headers which have no meaning in HTTP/2
+CONNECTION_HEADERS = frozenset((
+    'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding',
+    'upgrade',
+))
+
+_FRAME = struct.Struct('>BHBBL')  # length (24 bits), type, flags, stream id
+_SETTING = struct.Struct('>HL')
+
+
+def frame(frame_type, flags, stream_id, payload=b''):
+    ''' the bytes of a frame '''
+    length = len(payload)
+    return _FRAME.pack(length >> 16, length & 0xffff, frame_type, flags,
+                       stream_id) + payload
+
+
+def parse_frame(data, offset=0):
+    ''' (type, flags, stream id, payload, next offset) or None if partial '''
+    if len(data) - offset < 9:
+        return None
+    high, low, frame_type, flags, stream_id = _FRAME.unpack_from(data, offset)
+    end = offset + 9 + (high << 16 | low)
+    if end > len(data):
+        return None
+    return (frame_type, flags, stream_id & 0x7fffffff,
+            bytes(data[offset + 9:end]), end)
+
+
+class HTTP2Error(Exception):
+
+    def __init__(self, code, message):
+        super(HTTP2Error, self).__init__(message)
+        self.code = code
+
+
+class HTTP2Stream(object):
+
+    def __init__(self, stream_id, window):
+        """One request and its response, on an HTTP/2 connection.
+
+           Used in place of an HTTPSlot (see HTTPHandler.http_slot), so that
+           a response is sent on the stream that it belongs to.
+        """
+        self.id = stream_id
+        self.method = None
+        self.path = None
+        self.header_list = []  # (name, value) without pseudo-headers
+        self.content = bytearray()
+        self.headers = None  # request headers (set by HTTPHandler)
+        self.data = bytearray()  # unused (HTTPSlot)
+        self.is_done = False  # response started and completed (HTTPSlot)
+        self.is_close = False  # unused (HTTPSlot)
+        self.is_received = False  # request is complete
+        self.is_sent = False  # response is complete, or stream is reset
+        self.is_reset = False
+        self.window = window  # how much can be sent
+        self.recv_window = 0  # how much can be received
+        self.pending = bytearray()  # waiting for window
+        self.pending_end = False
+
+
+class HTTP2Connection(object):
+
+    def __init__(self, handler, max_streams=100, window=1024 * 1024,
+                 max_header_size=65536):
+        """Server side of an HTTP/2 connection.
+
+           Created by HTTPHandler when an inbound connection starts with the
+           HTTP/2 preface (see HTTPHandler.http_h2c). Frames are parsed from
+           the data passed to on_data; each request is handed to the
+           handler, as if it were a pipelined HTTP/1 request, once it is
+           complete.
+
+           Required Arguments:
+               handler - the HTTPHandler which received the preface
+
+           Optional Arguments:
+               max_streams - maximum number of concurrent streams
+                             (SETTINGS_MAX_CONCURRENT_STREAMS)
+               window - flow control window, for the connection and for each
+                        stream, advertised to the peer
+               max_header_size - maximum size of a request's decoded headers
+                                 (SETTINGS_MAX_HEADER_LIST_SIZE)
+
+           Notes:
+
+               1. A request's content is accumulated before the request is
+                  dispatched; the window is re-opened as the content
+                  arrives, up to the handler's http_max_content_length.
+
+               2. Responses are built by the handler as HTTP/1 messages and
+                  translated here: the status line becomes :status, header
+                  names are lower-cased, and connection-specific headers
+                  (like Transfer-Encoding) are dropped. A chunked response
+                  (HTTPWriter) is sent as DATA frames without the chunk
+                  framing.
+
+               3. Response DATA is held while the peer's window (for the
+                  stream or the connection) is closed, and sent when
+                  WINDOW_UPDATE arrives.
+
+               4. Frames generated while incoming data is parsed, including
+                  the responses of handlers which respond right away, are
+                  gathered into one send.
+        """
+        self.handler = handler
+        self.max_streams = max_streams
+        self.window = window
+        self.streams = {}
+        self.last_stream_id = 0
+        self.is_goaway = False  # peer is finished with the connection
+        self.is_closing = False  # connection error: no more frames
+        self._data = bytearray()
+        self._is_preface = True
+        self._decoder = hpack.Decoder(max_size=max_header_size)
+        self._encoder = hpack.Encoder()
+        self._send_window = DEFAULT_WINDOW
+        self._initial_window = DEFAULT_WINDOW  # peer's, for each stream
+        self._max_frame = MAX_FRAME_SIZE  # peer's
+        self._recv_window = window
+        self._continuation = None  # [stream id, flags, block]
+        self._out = None  # frames to send, when gathering them
+        self._on_frame = {
+            DATA: self._on_data,
+            HEADERS: self._on_headers,
+            RST_STREAM: self._on_rst_stream,
+            SETTINGS: self._on_settings,
+            PUSH_PROMISE: self._on_push_promise,
+            PING: self._on_ping,
+            GOAWAY: self._on_goaway,
+            WINDOW_UPDATE: self._on_window_update,
+            CONTINUATION: self._on_continuation,
+        }
+
+        settings = b''.join(_SETTING.pack(key, value) for key, value in (
+            (SETTINGS_MAX_CONCURRENT_STREAMS, max_streams),
+            (SETTINGS_INITIAL_WINDOW_SIZE, window),
+            (SETTINGS_MAX_HEADER_LIST_SIZE, max_header_size),
+        ))
+        frames = [frame(SETTINGS, 0, 0, settings)]
+        if window > DEFAULT_WINDOW:
+            frames.append(frame(WINDOW_UPDATE, 0, 0, struct.pack(
+                '>L', window - DEFAULT_WINDOW)))
+        self._write(b''.join(frames))
+
+    def on_data(self, data):
+        self._data += data
+        self._out = []
+        try:
+            self._parse()
+        except HTTP2Error as e:
+            self._goaway(e.code, str(e))
+        finally:
+            out, self._out = self._out, None
+            handler = self.handler
+            if out and handler.is_open:
+                handler.send(b''.join(out))
+            if self.is_goaway and not self.streams and handler.is_open and \
+                    not handler._is_sending:
+                handler.close('http2 goaway')
+
+    def _parse(self):
+        data = self._data
+        offset = 0
+        if self._is_preface:
+            if len(data) < len(PREFACE):
+                return
+            if not data.startswith(PREFACE):
+                raise HTTP2Error(PROTOCOL_ERROR, 'invalid preface')
+            offset = len(PREFACE)
+            self._is_preface = False
+        try:
+            while not self.is_closing and self.handler.is_open:
+                if len(data) - offset >= 9 and \
+                        data[offset] << 16 | data[offset + 1] << 8 | \
+                        data[offset + 2] > MAX_FRAME_SIZE:
+                    raise HTTP2Error(FRAME_SIZE_ERROR, 'frame too large')
+                result = parse_frame(data, offset)
+                if result is None:
+                    break
+                frame_type, flags, stream_id, payload, offset = result
+                if self._continuation is not None and \
+                        frame_type != CONTINUATION:
+                    raise HTTP2Error(PROTOCOL_ERROR, 'expected CONTINUATION')
+                on_frame = self._on_frame.get(frame_type)
+                if on_frame is not None:  # unknown types are ignored
+                    on_frame(flags, stream_id, payload)
+        finally:
+            del data[:offset]
+
+    def _write(self, data):
+        if self._out is not None:
+            self._out.append(data)
+        elif self.handler.is_open:
+            self.handler.send(data)
+
+    def _goaway(self, code, message):
+        ''' connection error: tell the peer and close after sending '''
+        log.warning('cid=%s: http2 connection error %d: %s',
+                    self.handler.id, code, message)
+        self.is_closing = True
+        self._write(frame(GOAWAY, 0, 0, struct.pack(
+            '>LL', self.last_stream_id, code) + message.encode('ascii')))
+        for stream in list(self.streams.values()):
+            self._close_stream(stream)
+        self.handler._http_close_on_complete = True
+
+    def reset(self, stream, code=None):
+        ''' end a stream with RST_STREAM, unless it is already complete '''
+        if stream.is_reset or stream.is_received and stream.is_sent:
+            return
+        if code is None:
+            code = NO_ERROR if stream.is_sent else PROTOCOL_ERROR
+        self._write(frame(RST_STREAM, 0, stream.id, struct.pack('>L', code)))
+        self._close_stream(stream)
+
+    def _close_stream(self, stream):
+        stream.is_reset = stream.is_sent = True
+        stream.pending = bytearray()
+        self.streams.pop(stream.id, None)
+        self.handler._http2_reset(stream)
+
+    def _finish(self, stream):
+        ''' forget a stream once the request and the response are complete '''
+        if stream.is_received and stream.is_sent:
+            self.streams.pop(stream.id, None)
+            if self.is_goaway and not self.streams and self._out is None:
+                if self.handler._is_sending:
+                    self.handler._http_close_on_complete = True
+                else:
+                    self.handler.close('http2 goaway')
+
+    @staticmethod
+    def _unpad(flags, payload):
+        if flags & PADDED:
+            if not payload or payload[0] >= len(payload):
+                raise HTTP2Error(PROTOCOL_ERROR, 'invalid padding')
+            payload = payload[1:len(payload) - payload[0]]
+        return payload
+
+    def _on_data(self, flags, stream_id, payload):
+        if stream_id == 0:
+            raise HTTP2Error(PROTOCOL_ERROR, 'DATA on stream 0')
+        size = len(payload)
+        self._recv_window -= size
+        if self._recv_window < 0:
+            raise HTTP2Error(FLOW_CONTROL_ERROR, 'connection window exceeded')
+        if self._recv_window <= self.window // 2:
+            self._write(frame(WINDOW_UPDATE, 0, 0, struct.pack(
+                '>L', self.window - self._recv_window)))
+            self._recv_window = self.window
+
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            if stream_id > self.last_stream_id:
+                raise HTTP2Error(PROTOCOL_ERROR, 'DATA on idle stream')
+            return  # recently reset: ignore
+        if stream.is_received:
+            return self.reset(stream, STREAM_CLOSED)
+        stream.recv_window -= size
+        if stream.recv_window < 0:
+            return self.reset(stream, FLOW_CONTROL_ERROR)
+        payload = self._unpad(flags, payload)
+
+        if not stream.is_done:  # not already responded to
+            stream.content += payload
+            limit = self.handler.http_max_content_length
+            if limit and len(stream.content) > limit:
+                stream.content = bytearray()
+                self.handler._http2_too_long(stream)
+                if stream.is_reset:
+                    return
+
+        if flags & END_STREAM:
+            self._end_stream(stream)
+        elif stream.recv_window <= self.window // 2:
+            self._write(frame(WINDOW_UPDATE, 0, stream_id, struct.pack(
+                '>L', self.window - stream.recv_window)))
+            stream.recv_window = self.window
+
+    def _on_headers(self, flags, stream_id, payload):
+        if stream_id == 0:
+            raise HTTP2Error(PROTOCOL_ERROR, 'HEADERS on stream 0')
+        payload = self._unpad(flags, payload)
+        if flags & PRIORITY_FLAG:
+            payload = payload[5:]
+        if flags & END_HEADERS:
+            self._header_block(stream_id, flags, payload)
+        else:
+            self._continuation = [stream_id, flags, bytearray(payload)]
+
+    def _on_continuation(self, flags, stream_id, payload):
+        continuation = self._continuation
+        if continuation is None or continuation[0] != stream_id:
+            raise HTTP2Error(PROTOCOL_ERROR, 'unexpected CONTINUATION')
+        block = continuation[2]
+        block += payload
+        if len(block) > self._decoder.max_size:
+            raise HTTP2Error(PROTOCOL_ERROR, 'header block too large')
+        if flags & END_HEADERS:
+            self._continuation = None
+            self._header_block(stream_id, continuation[1], block)
+
+    def _header_block(self, stream_id, flags, block):
+        try:
+            headers = self._decoder.decode(block)
+        except hpack.HPACKError as e:
+            raise HTTP2Error(COMPRESSION_ERROR, str(e))
+
+        stream = self.streams.get(stream_id)
+        if stream is not None:  # trailers
+            if stream.is_received:
+                return self.reset(stream, STREAM_CLOSED)
+            if not flags & END_STREAM:
+                raise HTTP2Error(PROTOCOL_ERROR, 'trailers without END_STREAM')
+            stream.header_list.extend(h for h in headers if h[0][0] != ':')
+            return self._end_stream(stream)
+        if stream_id <= self.last_stream_id or not stream_id & 1:
+            raise HTTP2Error(PROTOCOL_ERROR, 'invalid stream id')
+        self.last_stream_id = stream_id
+        if self.is_goaway:
+            return
+
+        stream = HTTP2Stream(stream_id, self._initial_window)
+        stream.recv_window = self.window
+        if len(self.streams) >= self.max_streams:
+            stream.is_received = True
+            return self.reset(stream, REFUSED_STREAM)
+        header_list = stream.header_list
+        cookies = []
+        for name, value in headers:
+            if name[0] == ':':
+                if name == ':method':
+                    stream.method = value
+                elif name == ':path':
+                    stream.path = value
+                elif name == ':authority':
+                    header_list.append(('host', value))
+            elif name == 'cookie':
+                cookies.append(value)
+            elif name in CONNECTION_HEADERS or name != name.lower():
+                stream.is_received = True
+                return self.reset(stream, PROTOCOL_ERROR)
+            else:
+                header_list.append((name, value))
+        if cookies:
+            header_list.append(('cookie', '; '.join(cookies)))
+        if not stream.method or not stream.path:
+            stream.is_received = True
+            return self.reset(stream, PROTOCOL_ERROR)
+
+        self.streams[stream_id] = stream
+        if flags & END_STREAM:
+            self._end_stream(stream)
+
+    def _end_stream(self, stream):
+        stream.is_received = True
+        if stream.is_done:  # already responded to
+            self._finish(stream)
+        else:
+            self.handler._http2_request(stream)
+
+    def _on_rst_stream(self, flags, stream_id, payload):
+        if stream_id == 0:
+            raise HTTP2Error(PROTOCOL_ERROR, 'RST_STREAM on stream 0')
+        if len(payload) != 4:
+            raise HTTP2Error(FRAME_SIZE_ERROR, 'invalid RST_STREAM')
+        stream = self.streams.get(stream_id)
+        if stream is not None:
+            self._close_stream(stream)
+
+    def _on_settings(self, flags, stream_id, payload):
+        if stream_id != 0:
+            raise HTTP2Error(PROTOCOL_ERROR, 'SETTINGS on a stream')
+        if flags & ACK:
+            if payload:
+                raise HTTP2Error(FRAME_SIZE_ERROR, 'SETTINGS ACK with data')
+            return
+        if len(payload) % 6:
+            raise HTTP2Error(FRAME_SIZE_ERROR, 'invalid SETTINGS')
+        for offset in range(0, len(payload), 6):
+            key, value = _SETTING.unpack_from(payload, offset)
+            if key == SETTINGS_INITIAL_WINDOW_SIZE:
+                if value > MAX_WINDOW:
+                    raise HTTP2Error(FLOW_CONTROL_ERROR, 'window too large')
+                delta = value - self._initial_window
+                self._initial_window = value
+                for stream in self.streams.values():
+                    stream.window += delta
+            elif key == SETTINGS_MAX_FRAME_SIZE:
+                if not MAX_FRAME_SIZE <= value < 2 ** 24:
+                    raise HTTP2Error(PROTOCOL_ERROR, 'invalid frame size')
+                self._max_frame = value
+        self._write(frame(SETTINGS, ACK, 0))
+        self._flush()
+
+    def _on_push_promise(self, flags, stream_id, payload):
+        raise HTTP2Error(PROTOCOL_ERROR, 'PUSH_PROMISE from client')
+
+    def _on_ping(self, flags, stream_id, payload):
+        if stream_id != 0:
+            raise HTTP2Error(PROTOCOL_ERROR, 'PING on a stream')
+        if len(payload) != 8:
+            raise HTTP2Error(FRAME_SIZE_ERROR, 'invalid PING')
+        if not flags & ACK:
+            self._write(frame(PING, ACK, 0, payload))
+
+    def _on_goaway(self, flags, stream_id, payload):
+        self.is_goaway = True  # close when the open streams are complete
+
+    def _on_window_update(self, flags, stream_id, payload):
+        if len(payload) != 4:
+            raise HTTP2Error(FRAME_SIZE_ERROR, 'invalid WINDOW_UPDATE')
+        increment = struct.unpack('>L', payload)[0] & 0x7fffffff
+        if stream_id == 0:
+            if increment == 0:
+                raise HTTP2Error(PROTOCOL_ERROR, 'WINDOW_UPDATE of 0')
+            self._send_window += increment
+            if self._send_window > MAX_WINDOW:
+                raise HTTP2Error(FLOW_CONTROL_ERROR, 'window too large')
+            return self._flush()
+        stream = self.streams.get(stream_id)
+        if stream is None:
+            return
+        if increment == 0:
+            return self.reset(stream, PROTOCOL_ERROR)
+        stream.window += increment
+        if stream.window > MAX_WINDOW:
+            return self.reset(stream, FLOW_CONTROL_ERROR)
+        self._flush_stream(stream)
+
+    def is_blocked(self, stream):
+        ''' True if the stream's response data is waiting for window '''
+        return bool(stream.pending)
+
+    def send_response(self, stream, head, content):
+        ''' send an HTTP/1 status line and headers, and content '''
+        if stream.is_sent:
+            return
+        lines = head.decode('latin-1').split('\r\n')
+        headers = [(':status', lines[0].split(' ', 2)[1])]
+        is_chunked = False
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                name = name.strip().lower()
+                if name in CONNECTION_HEADERS:
+                    is_chunked = is_chunked or name == 'transfer-encoding'
+                else:
+                    headers.append((name, value.strip()))
+        block = self._encoder.encode(headers)
+        is_end = not content and not is_chunked
+
+        size = self._max_frame
+        frame_type = HEADERS
+        flags = END_STREAM if is_end else 0
+        frames = []
+        for offset in range(0, len(block), size):
+            piece = block[offset:offset + size]
+            if offset + size >= len(block):
+                flags |= END_HEADERS
+            frames.append(frame(frame_type, flags, stream.id, piece))
+            frame_type = CONTINUATION
+            flags = 0
+        self._write(b''.join(frames))
+
+        if is_end:
+            stream.is_sent = True
+            self._finish(stream)
+        elif content:
+            self.send_data(stream, content, not is_chunked)
+
+    def send_data(self, stream, data, is_end=False):
+        ''' send response content, as the peer's window allows '''
+        if stream.is_sent:
+            return
+        stream.pending += data
+        stream.pending_end = is_end
+        self._flush_stream(stream)
+
+    def _flush(self):
+        for stream in list(self.streams.values()):
+            if stream.pending or stream.pending_end:
+                self._flush_stream(stream)
+
+    def _flush_stream(self, stream):
+        pending = stream.pending
+        while pending or stream.pending_end:
+            size = min(len(pending), stream.window, self._send_window,
+                       self._max_frame)
+            if pending and size <= 0:
+                return  # wait for WINDOW_UPDATE
+            piece = bytes(pending[:size])
+            del pending[:size]
+            stream.window -= size
+            self._send_window -= size
+            if stream.pending_end and not pending:
+                stream.pending_end = False
+                stream.is_sent = True
+                self._write(frame(DATA, END_STREAM, stream.id, piece))
+                self._finish(stream)
+                return
+            self._write(frame(DATA, 0, stream.id, piece))
@@ -0,0 +1,246 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+'''
+import collections
+import errno
+import selectors
+
+from spindrift.network import Network, Listener
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class MemoryNetwork(Network):
+    ''' An in-process Network with no sockets
+
+        A drop-in replacement for Network which connects Handlers with
+        in-memory byte queues (MemoryTransport) instead of sockets. Any
+        Handler subclass (HTTPHandler, RESTHandler, MysqlHandler, ...) can be
+        used with add_server and add_connection, so protocol layers can be
+        exercised and profiled without kernel noise.
+
+        Optional Arguments:
+            chunk_size - maximum number of bytes returned by a single recv,
+                         used to force protocol parsers through partial
+                         reads (default=None, no limit beyond recv_len)
+            latency - number of service ticks before sent data becomes
+                      readable by the peer (default=0, readable on the
+                      next tick)
+            window - maximum number of unread bytes queued for a
+                     transport; a send beyond this is partial, or would
+                     block, exercising a Handler's send buffering
+                     (default=None, no limit)
+
+        Notes:
+
+            1. A tick is one pass of the service loop. Latency is measured in
+               ticks, not seconds, so runs are deterministic and repeatable.
+
+            2. add_connection matches on port only; the host is ignored. A
+               connection to a port without a server fails (on_fail, close)
+               immediately.
+
+            3. ssl and datagrams are not supported.
+    '''
+
+    def __init__(self, chunk_size=None, latency=0, window=None):
+        super(MemoryNetwork, self).__init__()
+        self.chunk_size = chunk_size
+        self.latency = latency
+        self.window = window
+        self.tick = 0
+        self._listeners = {}
+        self._registered = collections.OrderedDict()
+
+    def add_server(self, port, handler, context=None, is_ssl=False,
+                   ssl_certfile=None, ssl_keyfile=None, ssl_password=None):
+        ''' Add a Server (listening) port; see Network.add_server '''
+        if is_ssl:
+            raise ValueError('ssl is not supported by MemoryNetwork')
+        listener = MemoryListener(port, self, handler=handler,
+                                  context=context)
+        self._listeners[port] = listener
+        return listener
+
+    def add_connection(self, host, port, handler, context=None, is_ssl=False):
+        ''' Add a Client (outbound) connection; see Network.add_connection '''
+        if is_ssl:
+            raise ValueError('ssl is not supported by MemoryNetwork')
+        listener = self._listeners.get(port)
+        client = MemoryTransport(self, ('memory', -self._id - 1))
+        h = handler(client, self, context=context, is_outbound=True,
+                    host=host)
+        if listener is None:
+            message = 'Connection refused'
+            h.on_fail(message)
+            h.close('host=%s, port=%s, error=%s' % (host, port, message))
+            return h
+        server = MemoryTransport(self, ('memory', port))
+        client._peer = server
+        server._peer = client
+        h._on_connect()
+        listener._do_accept(server)
+        return h
+
+    def add_datagram(self, host, port, handler, context=None, is_bind=False):
+        raise ValueError('datagrams are not supported by MemoryNetwork')
+
+    def close(self):
+        ''' close every registered transport '''
+        if not self.is_open:
+            return
+        self._is_open = False
+        registered, self._registered = self._registered, {}
+        for transport in registered:
+            transport.close()
+        self._listeners = {}
+
+    def _register(self, sock, event, data):
+        if sock in self._registered:
+            raise KeyError('%r is already registered' % (sock,))
+        self._registered[sock] = (event, data)
+
+    def _register_modify(self, sock, event, data):
+        if sock not in self._registered:
+            raise KeyError('%r is not registered' % (sock,))
+        self._registered[sock] = (event, data)
+
+    def _unregister(self, sock):
+        self._registered.pop(sock, None)
+
+    def _service(self, timeout):
+        self.tick += 1
+        processed = False
+        for transport in list(self._registered):
+            try:
+                event, callback = self._registered[transport]
+            except KeyError:
+                continue  # unregistered by an earlier callback in this pass
+            if event & selectors.EVENT_READ and transport._is_readable or \
+                    event & selectors.EVENT_WRITE and transport._is_writable:
+                processed = True
+                callback()
+        return processed
+
+
+class MemoryListener(Listener):
+
+    def __init__(self, port, network, handler, context=None):
+        super(MemoryListener, self).__init__(None, network, handler,
+                                             context=context)
+        self.port = port
+
+    def close(self):
+        self.network._listeners.pop(self.port, None)
+
+    def _do_accept(self, transport):
+        h = self.handler(transport, self.network, context=self.context)
+        if h.on_accept():
+            h._on_connect()
+        else:
+            h.close('connection not accepted')
+
+
+class MemoryTransport(object):
+    ''' One end of an in-memory connection
+
+        Implements the subset of the socket interface used by Handler. Data
+        sent on one end is queued, stamped with the tick at which it becomes
+        readable, on the other end.
+    '''
+
+    def __init__(self, network, name):
+        self._network = network
+        self._name = name
+        self._peer = None
+        self._inbound = collections.deque()  # (tick, bytes)
+        self._queued = 0  # unread bytes in _inbound
+        self._close_tick = None  # tick at which the peer's close is visible
+        self.is_closed = False
+
+    def __repr__(self):
+        return 'MemoryTransport[%s:%s]' % self._name
+
+    @property
+    def _is_readable(self):
+        ''' True if recv will return data (or end of file) '''
+        tick = self._network.tick
+        if self._inbound:
+            return self._inbound[0][0] <= tick
+        return self._close_tick is not None and self._close_tick <= tick
+
+    @property
+    def _is_writable(self):
+        ''' True if send will accept data (or fail) '''
+        window = self._network.window
+        peer = self._peer
+        return window is None or peer is None or peer.is_closed or \
+            peer._queued < window
+
+    def recv(self, length):
+        if self.is_closed:
+            raise OSError(errno.EBADF, 'Bad file descriptor')
+        chunk_size = self._network.chunk_size
+        if chunk_size:
+            length = min(length, chunk_size)
+        tick = self._network.tick
+        inbound = self._inbound
+        data = bytearray()
+        while inbound and inbound[0][0] <= tick and len(data) < length:
+            ready, chunk = inbound.popleft()
+            need = length - len(data)
+            if len(chunk) > need:
+                inbound.appendleft((ready, chunk[need:]))
+                chunk = chunk[:need]
+            data.extend(chunk)
+        self._queued -= len(data)
+        if not data and not self._is_readable:
+            raise BlockingIOError(errno.EWOULDBLOCK, 'Resource temporarily unavailable')
+        return bytes(data)
+
+    def send(self, data):
+        if self.is_closed:
+            raise OSError(errno.EBADF, 'Bad file descriptor')
+        peer = self._peer
+        if peer is None or peer.is_closed:
+            raise BrokenPipeError(errno.EPIPE, 'Broken pipe')
+        window = self._network.window
+        if window is not None:
+            room = window - peer._queued
+            if room <= 0:
+                raise BlockingIOError(
+                    errno.EWOULDBLOCK, 'Resource temporarily unavailable')
+            data = data[:room]
+        tick = self._network.tick + self._network.latency + 1
+        peer._inbound.append((tick, bytes(data)))
+        peer._queued += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.is_closed:
+            self.is_closed = True
+            self._inbound.clear()
+            peer = self._peer
+            if peer is not None and not peer.is_closed:
+                peer._close_tick = \
+                    self._network.tick + self._network.latency + 1
+
+    def getsockname(self):
+        return self._name
+
+    def getpeername(self):
+        if self._peer is None:
+            raise OSError(errno.ENOTCONN, 'Transport endpoint is not connected')
+        return self._peer._name
+
+    def setsockopt(self, *args):
+        pass
+
+    def getsockopt(self, *args):
+        return 0
+
+    def pending(self):
+        return 0
@@ -10,10 +10,15 @@ import platform
 import signal
 
 from ergaleia.normalize_path import normalize_path
+import spindrift.codec as codec
+from spindrift.compress import Compression
 from spindrift.database.db import DB
 from spindrift.micro_fsm.handler import InboundHandler, MysqlHandler
 from spindrift.micro_fsm.parser import Parser as parser
+from spindrift.rest.cache import Cache
+from spindrift.rest.coalesce import Coalesce
 from spindrift.rest.handler import RESTContext
+from spindrift.rest.limit import Limiter
 from spindrift.rest.mapper import RESTMapper, RESTMethod
 from spindrift.network import Network
 from spindrift.timer import Timer
@@ -32,6 +37,7 @@ class Micro(object):
         self.network = Network()
         self.timer = Timer()
         self.connection = type('Connections', (object,), dict())
+        self.limiters = {}  # name: spindrift.rest.limit.Limiter
 
     def load(self, micro='micro', config=None, is_trace=False):
         self.parser = parser.parse(micro, trace if is_trace else None)
@@ -43,6 +49,7 @@ class Micro(object):
         parser = self.parser
         config = parser.config
         setup_log(config)
+        setup_json(config)
         setup_database(config, self)
         setup_servers(config, self, parser.servers)
         setup_connections(config, self, parser.connections)
@@ -67,13 +74,15 @@ def db_cursor(rest_handler):
     """ Add a databse cursor to a request
 
         The cursor is added to the request as the attribute 'cursor'
-        and set to automatically close on request.respond. The
+        and set to automatically close on request.respond. The cursor
+        has the request's deadline (see spindrift.mysql.cursor). The
         delay() method is called on the request object to allow
         async calls to continue without a premature response.
     """
     def inner(request, *args, **kwargs):
         cursor = micro.db.cursor
         cursor.cid = request.id
+        cursor.deadline = request.deadline
         request.cursor = cursor
         request.cleanup = cursor.close
         request.delay()
@@ -87,12 +96,25 @@ class MicroContext(RESTContext):
                 self, mapper,
                 http_max_content_length,
                 http_max_line_length,
-                http_max_header_count
+                http_max_header_count,
+                http_pipeline=False,
+                http_max_pipeline=10,
+                http_max_part_memory=1024 * 1024,
+                compression=None,
+                http_h2c=False,
+                deadline_header=None,
+                timer=None,
+                limiter=None,
             ):
-        super(MicroContext, self).__init__(mapper)
+        super(MicroContext, self).__init__(
+            mapper, compression, deadline_header, timer, limiter)
         self.http_max_content_length = http_max_content_length
         self.http_max_line_length = http_max_line_length
         self.http_max_header_count = http_max_header_count
+        self.http_pipeline = http_pipeline
+        self.http_max_pipeline = http_max_pipeline
+        self.http_max_part_memory = http_max_part_memory
+        self.http_h2c = http_h2c
 
 
 class MicroHandler(InboundHandler):
@@ -103,6 +125,10 @@ class MicroHandler(InboundHandler):
         self.http_max_content_length = context.http_max_content_length
         self.http_max_line_length = context.http_max_line_length
         self.http_max_header_count = context.http_max_header_count
+        self.http_pipeline = context.http_pipeline
+        self.http_max_pipeline = context.http_max_pipeline
+        self.http_max_part_memory = context.http_max_part_memory
+        self.http_h2c = context.http_h2c
 
     def on_rest_exception(self, exception_type, value, trace):
         log.exception('rest handler exception')
@@ -195,6 +221,11 @@ def setup_log(config):
     setup_signal()
 
 
+def setup_json(config):
+    name = codec.use(config.json.codec).name
+    log.info('json codec: %s', name)
+
+
 def _fsm_trace(s, e, d, i):
     log.debug('mysql fsm s=%s, e=%s, is_internal=%s', s, e,  i)
 
@@ -222,33 +253,97 @@ def setup_database(config, micro):
         context.long_query = db.long_query
 
 
+def setup_limiter(micro, conf, name, maximum=None):
+    ''' a Limiter from server.[name].limit config
+
+        maximum, if specified, is a route's limit, which is also its
+        initial limit.
+    '''
+    limiter = Limiter(
+        name,
+        maximum or conf.initial,
+        min(conf.min, maximum or conf.min),
+        maximum or conf.max,
+        conf.latency,
+        queue_size=conf.queue_size,
+        is_lifo=conf.is_lifo,
+        queue_timeout=conf.queue_timeout,
+        retry_after=conf.retry_after,
+        timer=micro.timer,
+    )
+    micro.limiters[name] = limiter
+    return limiter
+
+
 def setup_servers(config, micro, servers):
     for server in servers.values():
         conf = config._get('server.%s' % server.name)
         if conf.is_active is False:
             continue
-        mapper = RESTMapper()
+        mapper = RESTMapper(conf.route_cache_size)
+        compression = None
+        if conf.compress.is_active:
+            compression = Compression(
+                conf.compress.level,
+                conf.compress.min_size,
+                [t.strip() for t in conf.compress.types.split(',')
+                 if t.strip()],
+            )
         context = MicroContext(
             mapper,
             conf.http_max_content_length,
             conf.http_max_line_length,
             conf.http_max_header_count,
+            conf.http_pipeline,
+            conf.http_max_pipeline,
+            conf.http_max_part_memory,
+            compression,
+            conf.http_h2c,
+            conf.deadline_header or None,
+            micro.timer,
+            setup_limiter(micro, conf.limit, server.name)
+            if conf.limit.is_active else None,
         )
         for routenum, route in enumerate(server.routes, start=1):
             methods = {}
+            cache = None
+            if route.cache is not None:
+                cache = Cache(route.cache, route.cache_headers,
+                              route.cache_max_bytes or conf.cache_max_bytes,
+                              route.cache_stale)
             for name, defn in route.methods.items():
                 try:
-                    method = RESTMethod(defn.path)
+                    is_websocket = name == 'websocket'
+                    route_limiter = None
+                    if defn.limit:
+                        route_limiter = setup_limiter(
+                            micro, conf.limit,
+                            '%s.route%d.%s' % (server.name, routenum, name),
+                            defn.limit,
+                        )
+                    coalesce = None
+                    if defn.coalesce:
+                        coalesce = Coalesce(
+                            defn.coalesce_headers, conf.coalesce_wait)
+                    method = RESTMethod(defn.path, is_stream=defn.is_stream,
+                                        is_websocket=is_websocket,
+                                        timeout=defn.timeout,
+                                        limiter=route_limiter,
+                                        coalesce=coalesce,
+                                        cache=cache if name == 'get'
+                                        else None,
+                                        etag=defn.etag)
                     for arg in route.args:
                         method.add_arg(arg.type)
                     for arg in defn.content:
                         method.add_content(arg.name, arg.type, arg.is_required)
-                    methods[name] = method
+                    methods['get' if is_websocket else name] = method
                 except Exception as e:
                     raise Exception(
                         'error setting up server: {}'.format(str(e))
                     )
             mapper.add(route.pattern, methods)
+        mapper.compile()
         try:
             handler = _import(conf.handler, is_module=True)
         except KeyError:
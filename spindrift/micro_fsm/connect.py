@@ -120,7 +120,7 @@ class Resource(object):
     def __repr__(self):
         return 'connection.%s.resource.%s' % (self.connection.name, self.resource.name)
 
-    def __call__(self, callback, *args, **kwargs):
+    def __call__(self, callback, *args, deadline=None, **kwargs):
         is_verbose = kwargs.pop('is_verbose', None)
         trace = kwargs.pop('trace', None)
         if len(args) != len(self.resource.substitution + self.resource.required):
@@ -168,6 +168,7 @@ class Resource(object):
             evaluate=None,
             debug=is_verbose or self.resource.is_verbose,
             trace=trace or self.resource.trace,
+            deadline=deadline,
         )
 
 
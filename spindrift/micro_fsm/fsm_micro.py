@@ -37,8 +37,8 @@ def create(**actions):
   S_teardown.set_events([EVENT('server',[], S_server),EVENT('connection',[], S_connection),EVENT('config',[actions['add_config']]),EVENT('database',[], S_database),EVENT('setup',[], S_setup),EVENT('enum',[], S_enum),EVENT('log',[], S_log),])
   S_log.set_events([EVENT('server',[], S_server),EVENT('connection',[], S_connection),EVENT('config',[actions['add_config']]),EVENT('database',[], S_database),EVENT('setup',[], S_setup),EVENT('enum',[], S_enum),])
   S_server.set_events([EVENT('route',[], S_route),EVENT('config',[actions['add_config']]),EVENT('connection',[], S_connection),])
-  S_route.set_events([EVENT('arg',[actions['add_arg']]),EVENT('get',[], S_method),EVENT('post',[], S_method),EVENT('put',[], S_method),EVENT('delete',[], S_method),])
-  S_method.set_events([EVENT('content',[actions['add_content']]),EVENT('get',[actions['add_method']]),EVENT('post',[actions['add_method']]),EVENT('put',[actions['add_method']]),EVENT('delete',[actions['add_method']]),EVENT('config',[actions['add_config']]),EVENT('server',[], S_server),EVENT('route',[], S_route),EVENT('connection',[], S_connection),EVENT('database',[], S_database),EVENT('setup',[], S_setup),EVENT('enum',[], S_enum),EVENT('teardown',[], S_teardown),EVENT('log',[], S_log),])
+  S_route.set_events([EVENT('arg',[actions['add_arg']]),EVENT('get',[], S_method),EVENT('post',[], S_method),EVENT('put',[], S_method),EVENT('delete',[], S_method),EVENT('websocket',[], S_method),])
+  S_method.set_events([EVENT('content',[actions['add_content']]),EVENT('get',[actions['add_method']]),EVENT('post',[actions['add_method']]),EVENT('put',[actions['add_method']]),EVENT('delete',[actions['add_method']]),EVENT('websocket',[actions['add_method']]),EVENT('config',[actions['add_config']]),EVENT('server',[], S_server),EVENT('route',[], S_route),EVENT('connection',[], S_connection),EVENT('database',[], S_database),EVENT('setup',[], S_setup),EVENT('enum',[], S_enum),EVENT('teardown',[], S_teardown),EVENT('log',[], S_log),])
   S_connection.set_events([EVENT('header',[actions['add_header']]),EVENT('resource',[], S_resource),EVENT('config',[actions['add_config']]),])
   S_resource.set_events([EVENT('resource',[], S_resource),EVENT('header',[actions['add_resource_header']]),EVENT('required',[actions['add_required']]),EVENT('optional',[actions['add_optional']]),EVENT('config',[actions['add_config']]),EVENT('server',[], S_server),EVENT('connection',[], S_connection),EVENT('database',[], S_database),EVENT('setup',[], S_setup),EVENT('enum',[], S_enum),EVENT('teardown',[], S_teardown),EVENT('log',[], S_log),])
   return FSM([S_init,S_database,S_enum,S_setup,S_teardown,S_log,S_server,S_route,S_method,S_connection,S_resource])
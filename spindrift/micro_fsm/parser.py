@@ -7,6 +7,7 @@ import ergaleia.config as config_file
 from ergaleia.to_args import to_args
 from ergaleia.import_by_path import import_by_path
 from ergaleia.normalize_path import normalize_path
+from spindrift.compress import DEFAULT_TYPES
 from spindrift.micro_fsm.fsm_micro import create as create_machine
 
 import logging
@@ -115,6 +116,7 @@ class Parser(object):
         self.database = None
         self.log = Log()
         self.add_log_config()
+        self._add_config('json.codec', env='JSON_CODEC')
         self.connections = {}
         self._config_servers = {}
         self.servers = {}
@@ -422,6 +424,109 @@ class Parser(object):
                 validator=int,
                 value=100,
             )
+            self._add_config(
+                'server.%s.http_max_part_memory' % server.name,
+                validator=int,
+                value=1024 * 1024,
+            )
+            self._add_config(
+                'server.%s.http_pipeline' % server.name,
+                validator=config_file.validate_bool,
+                value=False,
+            )
+            self._add_config(
+                'server.%s.http_max_pipeline' % server.name,
+                validator=int,
+                value=10,
+            )
+            self._add_config(
+                'server.%s.http_h2c' % server.name,
+                validator=config_file.validate_bool,
+                value=False,
+            )
+            self._add_config(
+                'server.%s.route_cache_size' % server.name,
+                validator=int,
+                value=0,
+            )
+            self._add_config(
+                'server.%s.deadline_header' % server.name,
+                value='X-Request-Timeout',
+            )
+            self._add_config(
+                'server.%s.coalesce_wait' % server.name,
+                validator=float,
+                value=1.0,
+            )
+            self._add_config(
+                'server.%s.cache_max_bytes' % server.name,
+                validator=int,
+                value=1024 * 1024,
+            )
+            self._add_config(
+                'server.%s.limit.is_active' % server.name,
+                validator=config_file.validate_bool,
+                value=False,
+            )
+            self._add_config(
+                'server.%s.limit.initial' % server.name,
+                validator=int,
+                value=20,
+            )
+            self._add_config(
+                'server.%s.limit.min' % server.name,
+                validator=int,
+                value=1,
+            )
+            self._add_config(
+                'server.%s.limit.max' % server.name,
+                validator=int,
+                value=200,
+            )
+            self._add_config(
+                'server.%s.limit.latency' % server.name,
+                validator=float,
+                value=1.0,
+            )
+            self._add_config(
+                'server.%s.limit.queue_size' % server.name,
+                validator=int,
+                value=0,
+            )
+            self._add_config(
+                'server.%s.limit.is_lifo' % server.name,
+                validator=config_file.validate_bool,
+                value=False,
+            )
+            self._add_config(
+                'server.%s.limit.queue_timeout' % server.name,
+                validator=float,
+                value=1.0,
+            )
+            self._add_config(
+                'server.%s.limit.retry_after' % server.name,
+                validator=int,
+                value=1,
+            )
+            self._add_config(
+                'server.%s.compress.is_active' % server.name,
+                validator=config_file.validate_bool,
+                value=False,
+            )
+            self._add_config(
+                'server.%s.compress.level' % server.name,
+                validator=int,
+                value=6,
+            )
+            self._add_config(
+                'server.%s.compress.min_size' % server.name,
+                validator=int,
+                value=1024,
+            )
+            self._add_config(
+                'server.%s.compress.types' % server.name,
+                value=','.join(DEFAULT_TYPES),
+            )
 
     def act_add_setup(self):
         if len(self.args) > 1:
@@ -474,6 +579,11 @@ class Server(object):
         self.route = route
 
     def add_method(self, method):
+        other = dict(get='websocket', websocket='get').get(method.method)
+        if other in self.route.methods:
+            raise Exception(
+                'route %s: GET and WEBSOCKET share the GET method; specify'
+                ' one' % self.route.pattern)
         self.route.method = method
         self.route.methods[method.method] = method
 
@@ -487,8 +597,16 @@ class Server(object):
 
 class Route(object):
 
-    def __init__(self, pattern):
+    def __init__(self, pattern, cache=None, cache_stale=0,
+                 cache_headers=None, cache_max_bytes=None):
         self.pattern = pattern
+        self.cache = float(cache) if cache is not None else None
+        self.cache_stale = float(cache_stale)
+        self.cache_headers = [
+            h.strip() for h in (cache_headers or '').split(',')
+            if h.strip()]
+        self.cache_max_bytes = int(cache_max_bytes) \
+            if cache_max_bytes is not None else None
         self.method = None
         self.methods = {}
         self.args = []
@@ -496,9 +614,19 @@ class Route(object):
 
 class Method(object):
 
-    def __init__(self, method, path):
+    def __init__(self, method, path, is_stream=False, timeout=None,
+                 limit=None, coalesce=False, coalesce_headers=None,
+                 etag=False):
         self.method = method.lower()
         self.path = path
+        self.is_stream = config_file.validate_bool(is_stream)
+        self.timeout = float(timeout) if timeout is not None else None
+        self.limit = int(limit) if limit is not None else None
+        self.coalesce = config_file.validate_bool(coalesce)
+        self.coalesce_headers = [
+            h.strip() for h in (coalesce_headers or '').split(',')
+            if h.strip()]
+        self.etag = config_file.validate_bool(etag)
         self.content = []
 
 
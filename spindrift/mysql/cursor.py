@@ -3,6 +3,7 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
+from spindrift.deadline import TIMEOUT, is_expired
 
 
 class Cursor(object):
@@ -14,6 +15,10 @@ class Cursor(object):
 
         self.is_running = False
 
+        # spindrift.deadline value: once passed, execute fails with TIMEOUT
+        # instead of running a query (ROLLBACK still runs)
+        self.deadline = None
+
     def __setattr__(self, name, value):
         if name == 'cid':
             self.protocol.connection.cid = value
@@ -57,6 +62,9 @@ class Cursor(object):
             raise Exception('callback not specified')
         if self._transaction_depth == 0:
             return callback(0, None)
+        if self._transaction_depth == 1 and self.commit_enabled and \
+                is_expired(self.deadline):
+            return callback(1, TIMEOUT)  # still open, so rollback ends it
         self._transaction_depth -= 1
         if self._transaction_depth != 0:
             return callback(0, None)
@@ -72,7 +80,10 @@ class Cursor(object):
         if self._transaction_depth == 0:
             return callback(0, None)
         self._transaction_depth = 0
-        self._transaction(callback, 'ROLLBACK')
+        if not self.commit_enabled:
+            return callback(0, None)
+        self.statement_before = 'ROLLBACK'
+        self._execute(callback, 'ROLLBACK')  # even after the deadline
 
     @property
     def lastrowid(self):
@@ -91,11 +102,20 @@ class Cursor(object):
         else:
             return self.protocol.escape(args)
 
-    def execute(self, callback, query, args=None, cls=None):
-        """ Execute a query """
+    def execute(self, callback, query, args=None, cls=None, deadline=None):
+        """ Execute a query
+
+            deadline, if specified, replaces the cursor's deadline for this
+            query.
+        """
+        if is_expired(self.deadline if deadline is None else deadline):
+            return callback(1, TIMEOUT)
         self.statement_before = query
         if args is not None:
             query = query % self._escape_args(args)
+        self._execute(callback, query, cls)
+
+    def _execute(self, callback, query, cls=None):
         self.statement = query
 
         def _callback(rc, result):
@@ -3,6 +3,7 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
+import collections
 import errno
 import os
 import selectors
@@ -20,6 +21,7 @@ class Network(object):
         self._id = 0
         self._selector = selectors.DefaultSelector()
         self._is_open = True
+        self.connect_pool = None  # see spindrift.pool.get_pool
 
     @property
     def is_open(self):
@@ -117,6 +119,41 @@ class Network(object):
             h._on_connect(self)
         return h
 
+    def add_datagram(self, host, port, handler, context=None, is_bind=False):
+        ''' Add a Datagram (UDP) socket
+
+            Required Arguments:
+                host - name or ip address of peer (or local address if is_bind)
+                port - peer port (or local port if is_bind)
+                handler - DatagramHandler class/subclass assigned to the socket
+
+            Optional Arguments:
+                context - arbitrary context assigned to the socket
+                is_bind - if True, bind the socket to (host, port) in order to
+                          receive datagrams; otherwise (host, port) is the
+                          default destination for DatagramHandler.sendto
+
+            Return:
+                DatagramHandler instance
+
+            Notes:
+
+            1. The host is resolved once, here, so that a sendto never blocks
+               on a dns lookup.
+
+            2. A datagram socket is registered for reading at all times, so
+               datagrams sent back from a peer arrive at on_datagram.
+        '''
+        address = (socket.gethostbyname(host) if host else '', port)
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        s.setblocking(False)
+        if is_bind:
+            s.bind(address)
+            address = None
+        h = handler(s, self, context=context, address=address)
+        h._register(selectors.EVENT_READ)
+        return h
+
     def service(self, timeout=.1, max_iterations=100):
         processed = False
         while True:
@@ -605,3 +642,167 @@ class Listener(object):
             h._on_connect()
         else:
             h.close('connection not accepted')
+
+
+class DatagramHandler(object):
+    ''' Handle events on a datagram (UDP) socket
+
+        This object is instantiated by Network.add_datagram. There is no
+        connection setup: the socket can send as soon as it is created, and
+        each arriving datagram is handed to on_datagram intact.
+
+        Create custom behavior by subclassing DatagramHandler and providing
+        logic in the appropriate on_* methods:
+
+            on_init - called at object setup
+            on_datagram(self, data, address) - called when a datagram arrives
+            on_close(self, reason) - called on socket close
+            on_drop(self, data, address) - called when a datagram is
+                                           discarded because the send queue
+                                           is full
+            on_send_error(self, message) - called on a non-fatal send error
+
+        These methods allow actions on the socket:
+
+            sendto(data, address=None) - send a datagram
+            close(reason) - close the socket
+
+        The following attributes are available:
+
+            id - unique id assigned by a Network
+            context - context object supplied to add_datagram
+            address - default destination for sendto (None if bound)
+            recv_len - read length passed to socket recvfrom (default 65535)
+            max_queue - maximum number of datagrams held while the socket
+                        is not writable (default 1000)
+            rx_count - number of bytes read
+            tx_count - number of bytes sent
+            is_open - True if socket is open (not yet closed)
+            is_closed - True if socket is closed
+
+        Notes:
+
+            1. A sendto never blocks. If the kernel buffer is full, the
+               datagram is queued and sent when the socket is writable
+               again. If the queue is full, the datagram is dropped; udp
+               makes no delivery promise anyway.
+    '''
+
+    def __init__(self, sock, network, context=None, address=None):
+        self._sock = sock
+        self._network = network
+        self._queue = collections.deque()
+        self._is_registered = False
+        self._mask = 0
+
+        self.id = network._next_id
+        self.context = context
+        self.address = address
+        self.is_closed = False
+        self.recv_len = 65535
+        self.max_queue = 1000
+
+        self.rx_count = 0
+        self.tx_count = 0
+
+        self.on_init()
+
+    def on_init(self):
+        pass
+
+    def on_datagram(self, data, address):
+        ''' called when a datagram arrives '''
+        pass
+
+    def on_close(self, reason):
+        pass
+
+    def on_drop(self, data, address):
+        ''' called when a datagram is discarded (send queue full) '''
+        log.debug('did=%s: send queue full, datagram dropped', self.id)
+
+    def on_send_error(self, message):
+        log.debug(message)  # unusual but not fatal
+
+    @property
+    def is_open(self):
+        return not self.is_closed
+
+    def sendto(self, data, address=None):
+        if self.is_closed:
+            return
+        address = address or self.address
+        if self._queue:
+            self._enqueue(data, address)
+        elif not self._sendto(data, address):
+            self._enqueue(data, address)
+            self._register(selectors.EVENT_READ | selectors.EVENT_WRITE)
+
+    def close(self, reason=None):
+        if not self.is_closed:
+            self.is_closed = True
+            self._queue.clear()
+            self._unregister()
+            self._sock.close()
+            self.on_close(reason)
+
+    def _enqueue(self, data, address):
+        if len(self._queue) >= self.max_queue:
+            self.on_drop(data, address)
+        else:
+            self._queue.append((data, address))
+
+    def _sendto(self, data, address):
+        ''' send one datagram; return False if the socket would block '''
+        try:
+            self.tx_count += self._sock.sendto(data, address)
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError as e:
+            self.on_send_error('did=%s: send error on socket: %s' % (
+                self.id, e.strerror or str(e)))
+        return True
+
+    def _register(self, mask):
+        if mask == self._mask:
+            return
+        self._mask = mask
+        if self._is_registered:
+            self._network._register_modify(self._sock, mask, self._do_ready)
+        else:
+            self._network._register(self._sock, mask, self._do_ready)
+            self._is_registered = True
+
+    def _unregister(self):
+        if self._is_registered:
+            self._network._unregister(self._sock)
+            self._is_registered = False
+            self._mask = 0
+
+    def _do_ready(self):
+        '''
+            the selector doesn't tell us which event fired, so drain as much
+            of the send queue as the socket will take, and then try a read.
+        '''
+        queue = self._queue
+        while queue:
+            data, address = queue[0]
+            if not self._sendto(data, address):
+                break
+            queue.popleft()
+        if not queue and self.is_open:
+            self._register(selectors.EVENT_READ)
+        self._do_read()
+
+    def _do_read(self):
+        try:
+            data, address = self._sock.recvfrom(self.recv_len)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            # a previous sendto to a closed port can surface here (linux)
+            self.on_send_error('did=%s: recv error on socket: %s' % (
+                self.id, e.strerror or str(e)))
+            return
+        self.rx_count += len(data)
+        self.on_datagram(data, address)
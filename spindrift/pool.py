@@ -0,0 +1,187 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+'''
+import collections
+import errno
+import socket
+import time
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class ConnectionPool(object):
+    ''' Idle outbound http connections, kept open for reuse
+
+        Used by spindrift.connect.connect, so that a request to a host which
+        has recently been talked to doesn't pay for dns, tcp and ssl setup.
+        Connections are pooled by (scheme, host, port).
+
+        Optional Arguments:
+            max_per_host - maximum number of pooled connections, idle or
+                           in use, for each (scheme, host, port)
+                           (default=10)
+            idle_timeout - seconds that a connection can sit idle before it
+                           is closed instead of reused (default=4.0)
+            timer        - spindrift.timer.Timer, to close expired idle
+                           connections every idle_timeout seconds (otherwise,
+                           they are closed on checkout or checkin)
+
+        Notes:
+
+            1. A request that finds no idle connection opens a new one. If
+               max_per_host connections are already pooled, the new
+               connection is not added to the pool: it is closed after the
+               response, as if there were no pool (see overflow).
+
+            2. A connection is checked before reuse: it must be open, it
+               must not have been idle for more than idle_timeout, and (for
+               a plain socket) the peer must not have closed it or sent
+               anything since the last response. The default idle_timeout is
+               shorter than the keep-alive timeout of most servers, so that
+               a request isn't sent on a connection that the server is
+               about to close.
+
+            3. A connection is only returned to the pool if the response
+               was read completely and didn't include "Connection: close"
+               (an HTTP/1.0 response must include "Connection: keep-alive").
+
+            4. Counters:
+
+                   hit - requests sent on a pooled connection
+                   miss - requests that opened a new connection
+                   expired - idle connections closed for idle_timeout
+                   unhealthy - idle connections closed by the check on reuse
+                   overflow - connections not pooled due to max_per_host
+    '''
+
+    def __init__(self, max_per_host=10, idle_timeout=4.0, timer=None):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.timer = timer
+        self._sweep = None
+        self.hit = 0
+        self.miss = 0
+        self.expired = 0
+        self.unhealthy = 0
+        self.overflow = 0
+        self._idle = {}  # key -> deque of (time, handler), oldest first
+        self._count = collections.Counter()  # key -> pooled connections
+
+    @property
+    def hit_rate(self):
+        total = self.hit + self.miss
+        return self.hit / total if total else 0.0
+
+    @property
+    def idle_count(self):
+        return sum(len(idle) for idle in self._idle.values())
+
+    def checkout(self, key, handler_class):
+        ''' return an idle handler of handler_class for key, or None '''
+        idle = self._idle.get(key)
+        if idle:
+            self._expire(idle)
+            for item in list(reversed(idle)):  # most recently used first
+                handler = item[1]
+                if handler.__class__ is handler_class:
+                    idle.remove(item)
+                    if self._is_healthy(handler):
+                        self.hit += 1
+                        return handler
+                    self.unhealthy += 1
+                    handler.close('unhealthy pooled connection')
+        self.miss += 1
+        return None
+
+    def add(self, key):
+        ''' True if a new connection for key can be pooled '''
+        if self._count[key] >= self.max_per_host:
+            self.overflow += 1
+            return False
+        self._count[key] += 1
+        return True
+
+    def checkin(self, key, handler):
+        ''' make a handler available for reuse '''
+        idle = self._idle.get(key)
+        if idle:
+            self._expire(idle)  # can remove the key
+        idle = self._idle.get(key)
+        if idle is None:
+            idle = self._idle[key] = collections.deque()
+        idle.append((time.monotonic(), handler))
+        self._sweep_start()
+
+    def discard(self, key, handler):
+        ''' forget a pooled handler (it closed) '''
+        self._count[key] -= 1
+        if self._count[key] <= 0:
+            del self._count[key]
+        idle = self._idle.get(key)
+        if idle:
+            for item in idle:
+                if item[1] is handler:
+                    idle.remove(item)
+                    break
+            if not idle:
+                del self._idle[key]
+
+    def close(self):
+        ''' close every idle connection '''
+        for idle in list(self._idle.values()):
+            for _, handler in list(idle):
+                handler.close('connection pool close')
+
+    def expire(self):
+        ''' close the connections idle for more than idle_timeout '''
+        for key, idle in list(self._idle.items()):
+            self._expire(idle)
+            if not idle and self._idle.get(key) is idle:
+                del self._idle[key]
+        self._sweep_start()
+
+    def _sweep_start(self):
+        if self.timer is None or not self._idle:
+            return
+        if self._sweep is not None and self._sweep.is_running:
+            return
+        self._sweep = self.timer.add(self.expire, self.idle_timeout * 1000)
+        self._sweep.start()
+
+    def _expire(self, idle):
+        limit = time.monotonic() - self.idle_timeout
+        while idle and idle[0][0] < limit:
+            self.expired += 1
+            _, handler = idle.popleft()
+            handler.close('idle pooled connection expired')
+
+    @staticmethod
+    def _is_healthy(handler):
+        if not handler.is_open:
+            return False
+        sock = handler._sock
+        if sock.__class__ is not socket.socket:
+            return True  # ssl (or memory): rely on idle read events
+        try:
+            sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return True  # nothing to read: still open
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return True
+            return False
+        return False  # closed by peer (b'') or unexpected data
+
+
+def get_pool(network, timer=None):
+    ''' return the network's ConnectionPool, creating it if necessary
+
+        timer is used by a new pool to close expired idle connections.
+    '''
+    pool = network.connect_pool
+    if pool is None:
+        pool = network.connect_pool = ConnectionPool(timer=timer)
+    return pool
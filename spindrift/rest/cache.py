@@ -0,0 +1,186 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Response cache
+
+    A Cache keeps the 200 responses of a rest handler function, as the
+    bytes which are sent (encoded and, if the client accepts it, gzipped),
+    for ttl seconds. A request that finds a response in the cache is sent
+    it without calling the function, or encoding the content again.
+
+    Responses are kept by resource, method, query string and values of the
+    selected headers (and whether the client accepts gzip, if the handler
+    compresses). The headers must include any that change the response,
+    Authorization for instance, or one client can be sent another's
+    response. A response meant for one client (with a Set-Cookie header,
+    or Cache-Control: private or no-store) is not cached.
+
+    Stale-while-revalidate: for stale seconds after a response expires,
+    the first request for it calls the function, to refresh it; the
+    requests which arrive while that is happening are sent the stale
+    response, instead of waiting (or also calling the function). If the
+    refresh fails, the next request tries again.
+
+    Responses are not invalidated by writes on their own. After a change,
+    call invalidate (or RESTRequest.invalidate, which finds the route's
+    cache for a resource).
+'''
+from collections import OrderedDict
+import re
+import time
+
+from spindrift.compress import accepts_gzip
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Cache(object):
+
+    def __init__(self, ttl=1.0, headers=(), max_bytes=1024 * 1024,
+                 stale=0.0):
+        """A cache of the responses of a rest handler function.
+
+           Optional Arguments:
+               ttl - seconds a response is fresh
+               headers - names of headers whose values are part of the
+                         key of a response
+               max_bytes - maximum total size of the cached responses;
+                           the least recently used are removed to make
+                           room
+               stale - seconds after ttl that a response can be sent while
+                       it is being refreshed (stale-while-revalidate)
+
+           Notes:
+
+               1. A response larger than a quarter of max_bytes is not
+                  cached.
+
+               2. The hit, stale_hit and miss attributes count requests sent
+                  a fresh response, sent a stale response, and not sent a
+                  cached response.
+        """
+        self.ttl = ttl
+        self.headers = tuple(h.lower() for h in headers)
+        self.max_bytes = max_bytes
+        self.stale = stale
+        self.hit = 0
+        self.miss = 0
+        self.stale_hit = 0
+        self._entries = OrderedDict()  # key: Entry
+        self._resources = {}  # resource: set of keys
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, handler):
+        ''' the key of the handler's current request '''
+        key = (handler.http_resource, handler.http_method,
+               handler.http_query_string)
+        if self.headers:
+            get = handler.http_headers.get
+            key += tuple(get(name) for name in self.headers)
+        if handler.http_compression is not None:
+            key += (accepts_gzip(handler.http_headers.get('accept-encoding')),)
+        return key
+
+    def get(self, key):
+        """ the cached Entry for key, or None
+
+            If None, the caller is expected to call the rest handler
+            function and put the response, or call release.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.miss += 1
+            return None
+        now = time.perf_counter()
+        if now < entry.expires:
+            self.hit += 1
+            self._entries.move_to_end(key)
+            return entry
+        if now < entry.expires + self.stale:
+            if entry.is_refreshing:
+                self.stale_hit += 1
+                return entry
+            entry.is_refreshing = True
+        else:
+            self._remove(key)
+        self.miss += 1
+        return None
+
+    def put(self, key, document, etag=None):
+        """ cache a (head, content) response (see http_server_document)
+
+            etag is the response's ETag, if it has one (see rest.etag).
+        """
+        size = len(document[0]) + len(document[1])
+        if size > self.max_bytes // 4:
+            return self.release(key)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = Entry(document, etag, size,
+                                   time.perf_counter() + self.ttl)
+        self._resources.setdefault(key[0], set()).add(key)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    @staticmethod
+    def is_shared(headers):
+        ''' False if a response's headers (a dict, or None) are per-client '''
+        for name, value in (headers or {}).items():
+            name = name.lower()
+            if name in PRIVATE_HEADERS:
+                return False
+            if name == 'cache-control' and \
+                    PRIVATE_CACHE_CONTROL.search(str(value)):
+                return False
+        return True
+
+    def release(self, key):
+        ''' a refresh of key's response didn't put one; let another try '''
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.is_refreshing = False
+
+    def invalidate(self, resource=None):
+        ''' remove the responses for resource (or all); return the count '''
+        if resource is None:
+            count = len(self._entries)
+            self._entries.clear()
+            self._resources.clear()
+            self._bytes = 0
+            return count
+        keys = self._resources.get(resource, ())
+        count = len(keys)
+        for key in list(keys):
+            self._remove(key)
+        return count
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        keys = self._resources[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._resources[key[0]]
+
+
+PRIVATE_HEADERS = ('set-cookie', 'set-cookie2')
+PRIVATE_CACHE_CONTROL = re.compile(r'\b(private|no-store)\b', re.I)
+
+
+class Entry(object):
+    ''' a cached response '''
+    __slots__ = ('document', 'etag', 'size', 'expires', 'is_refreshing')
+
+    def __init__(self, document, etag, size, expires):
+        self.document = document
+        self.etag = etag
+        self.size = size
+        self.expires = expires
+        self.is_refreshing = False
@@ -0,0 +1,151 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Request coalescing
+
+    When many identical requests arrive at once (for instance, a popular
+    item that just dropped out of a cache), each would run the same rest
+    handler function, doing the same database and outbound work. With
+    coalescing, the first request (the leader) runs the function, and the
+    identical requests which arrive before it responds (the followers)
+    wait, and are sent the leader's response.
+
+    Requests are identical if they have the same method, resource, query
+    string and values of the selected headers. The headers must include
+    any that change the response, Authorization for instance, or one
+    client can be sent another's response.
+
+    A follower is only sent a response with a code below 500. If the
+    leader fails (a 5xx response, or a response which can't be shared,
+    like a stream), the next follower becomes the leader, and runs the
+    function itself; the other followers keep waiting.
+'''
+import time
+
+import spindrift.codec as codec
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Coalesce(object):
+
+    def __init__(self, headers=(), wait=1.0):
+        """Coalescing of identical requests to a rest handler function.
+
+           Optional Arguments:
+               headers - names of headers which are part of the identity
+                         of a request
+               wait - seconds a follower waits for the leader's response;
+                      after that, it gets 504 Gateway Timeout, and the next
+                      identical request leads a new flight
+
+           Notes:
+
+               1. The hit and miss attributes count requests which
+                  followed a leader, and leaders.
+
+               2. Followers are sent 504 when the flight's timer expires
+                  (see join); without a timer, when the next identical
+                  request arrives after wait seconds.
+        """
+        self.headers = tuple(h.lower() for h in headers)
+        self.wait = wait
+        self.hit = 0
+        self.miss = 0
+        self._flights = {}  # key: Flight
+
+    def key(self, handler):
+        ''' the identity of the handler's current request '''
+        key = (handler.http_method, handler.http_resource,
+               handler.http_query_string)
+        if self.headers:
+            get = handler.http_headers.get
+            key += tuple(get(name) for name in self.headers)
+        return key
+
+    def join(self, key, request, start, timer=None):
+        """ True if request follows a leader; otherwise it is the leader
+
+            start is called, with no arguments, if the request becomes the
+            leader later (see Flight.finish). The timer, if specified,
+            sends 504 to followers after wait seconds.
+        """
+        flight = self._flights.get(key)
+        if flight is not None:
+            if time.perf_counter() - flight.started <= self.wait:
+                self.hit += 1
+                flight.followers.append((request, start))
+                request.delay()
+                return True
+            flight.expire()  # no timer, or it hasn't been serviced yet
+        self.miss += 1
+        flight = self._flights[key] = Flight(self, key)
+        if timer is not None:
+            flight.timer = timer.add(flight.expire, self.wait * 1000).start()
+        flight.lead(request)
+        return False
+
+
+class Flight(object):
+    ''' a leader request and the identical requests waiting for it '''
+
+    def __init__(self, coalesce, key):
+        self.coalesce = coalesce
+        self.key = key
+        self.started = time.perf_counter()
+        self.followers = []  # (request, start)
+        self.timer = None
+        self.is_done = False
+
+    def lead(self, request):
+        request._flight = self
+        request.cleanup = self.finish
+
+    def _end(self):
+        self.is_done = True
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.coalesce._flights.get(self.key) is self:
+            del self.coalesce._flights[self.key]
+
+    def land(self, code, content, headers, message, content_type):
+        ''' send the leader's response to the followers '''
+        self._end()
+        if content is not None and \
+                not isinstance(content, (str, bytes, bytearray)):
+            try:  # encode once, instead of for each follower
+                content = codec.dumpb(content)
+                content_type = 'application/json'
+            except Exception:
+                content = str(content)
+        followers, self.followers = self.followers, []
+        for request, _ in followers:
+            request.respond(code, content, dict(headers) if headers else None,
+                            message, content_type)
+
+    def finish(self):
+        ''' the leader is done; if it didn't land, promote a follower '''
+        if self.is_done:
+            return
+        while self.followers:
+            request, start = self.followers.pop(0)
+            if not request.is_done:
+                log.warning('cid=%s: coalesced request leader failed',
+                            request.id)
+                request.is_delayed = False
+                self.lead(request)
+                return start()
+        self._end()
+
+    def expire(self):
+        ''' give up on the leader, for the followers, and end the flight '''
+        self._end()
+        followers, self.followers = self.followers, []
+        for request, _ in followers:
+            if not request.is_done:
+                log.warning('cid=%s: coalesced request timed out',
+                            request.id)
+                request.respond(504)
@@ -3,12 +3,19 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
+from spindrift.rest.generate import function
+
 import logging
 
 
 log = logging.getLogger(__name__)
 
 
+def _fail(request, message, kind='content'):
+    log.warning('%s error, cid=%s: %s', kind, request.id, message)
+    return request.respond(400, message)
+
+
 def content_to_args(*fields, **kwargs):
     """rest_handler decorator that converts handler.html_content to (kw)args
 
@@ -39,56 +46,87 @@ def content_to_args(*fields, **kwargs):
         400 - json conversion fails or specified fields not present in json
     Notes:
          1. This is responsive to the is_delayed flag on the request.
+
+         2. The conversion is done by a function generated from the fields
+            when the decorator is applied.
     """
     as_args = kwargs.setdefault('as_args', True)
 
     def __content_to_args(rest_handler):
-        def inner(request, *args):
-            kwargs = dict()
-            try:
-                if fields:
-                    args = list(args)
-                    for field in fields:
-                        if isinstance(field, tuple):
-                            if len(field) == 3:
-                                fname, ftype, fdflt = field
-                                value = request.json.get(fname, fdflt)
-                            else:
-                                fname, ftype = field
-                                value = request.json[fname]
-                            if ftype:
-                                value = ftype(value)
-                        else:
-                            fname = field
-                            value = request.json[fname]
-                        if as_args:
-                            args.append(value)
-                        else:
-                            kwargs[fname] = value
-            except KeyError as e:
-                msg = 'Missing required key: %s' % str(e)
-                log.warning('content error, cid=%s: %s', request.id, msg)
-                return request.respond(400, msg)
-            except Exception as e:
-                msg = "Unable to read field '%s': %s" % (fname, e.message)
-                log.warning('content error, cid=%s: %s', request.id, msg)
-                return request.respond(400, msg)
-            return rest_handler(request, *args, **kwargs)
-        return inner
+        namespace = dict(rest_handler=rest_handler, _fail=_fail)
+        lines = ['def inner(request, *args):']
+        if as_args:
+            lines.append('    args = list(args)')
+        else:
+            lines.append('    kwargs = {}')
+        for n, field in enumerate(fields):
+            if not isinstance(field, tuple):
+                field = (field, None)
+            namespace['k%d' % n] = field[0]
+            namespace['m%d' % n] = "Unable to read field '%s': " % field[0]
+            if n == 0:
+                lines.extend((
+                    '    try:',
+                    '        content = request.json',
+                    '    except Exception as e:',
+                    '        return _fail(request, m0 + str(e))',
+                ))
+            lines.append('    try:')
+            if len(field) == 3:
+                namespace['d%d' % n] = field[2]
+                lines.append('        value = content.get(k%d, d%d)' % (n, n))
+            else:
+                lines.append('        value = content[k%d]' % n)
+            if field[1]:
+                namespace['t%d' % n] = field[1]
+                lines.append('        value = t%d(value)' % n)
+            lines.extend((
+                '    except KeyError as e:',
+                "        return _fail(request, 'Missing required key: %s' % e)",
+                '    except Exception as e:',
+                '        return _fail(request, m%d + str(e))' % n,
+            ))
+            if as_args:
+                lines.append('    args.append(value)')
+            else:
+                lines.append('    kwargs[k%d] = value' % n)
+        if as_args:
+            lines.append('    return rest_handler(request, *args)')
+        else:
+            lines.append('    return rest_handler(request, *args, **kwargs)')
+        return function('inner', lines, namespace, '<content_to_args %s>' %
+                        getattr(rest_handler, '__qualname__', rest_handler))
     return __content_to_args
 
 
 def coerce(*types):
+    """rest_handler decorator that converts the handler's args
+
+    Each arg (regex group) is converted by the corresponding function in
+    types; the handler is called with the converted args, up to the
+    number of types or args, whichever is fewer.
+
+    Errors:
+        400 - a conversion fails
+    """
     def __coerce(rest_handler):
-        def inner(request, *args):
-            new_args = []
-            try:
-                for coercer, value in zip(types, args):
-                    new_args.append(coercer(value))
-            except Exception as e:
-                msg = 'Unable to coerce: {}'.format(e)
-                log.warning('Argument error, cid=%s: %s', request.id, msg)
-                return request.respond(400, msg)
-            return rest_handler(request, *new_args)
-        return inner
+        namespace = dict(rest_handler=rest_handler, _fail=_fail, types=types)
+        count = len(types)
+        lines = [
+            'def inner(request, *args):',
+            '    try:',
+            '        if len(args) >= %d:' % count,
+            '            args = (%s)' % ''.join(
+                't%d(args[%d]), ' % (n, n) for n in range(count)),
+            '        else:',
+            '            args = [t(v) for t, v in zip(types, args)]',
+            '    except Exception as e:',
+            "        return _fail(request, 'Unable to coerce: %s' % e,"
+            " 'Argument')",
+            '    return rest_handler(request, *args)',
+        ]
+        for n, type in enumerate(types):
+            namespace['t%d' % n] = type
+        return function('inner', lines, namespace, '<coerce %s>' %
+                        getattr(rest_handler, '__qualname__', rest_handler))
     return __coerce
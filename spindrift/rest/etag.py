@@ -0,0 +1,52 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Entity tags
+
+    An ETag header identifies the content of a 200 response. A client
+    which has the content sends the tag back in an If-None-Match header,
+    and, if the content hasn't changed, is sent 304 Not Modified, without
+    the content.
+
+    A strong tag is a digest of the bytes of the content, as sent; or
+    the tag is made from a version (for instance, a column in a database
+    row which changes whenever the row does), which doesn't need the
+    content at all (see RESTRequest.not_modified).
+'''
+import hashlib
+
+
+def strong(content):
+    ''' a strong entity tag for the bytes of content '''
+    return '"%s"' % hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def quote(version):
+    ''' an entity tag for a version (a str or int), if not already one '''
+    version = str(version)
+    if version.startswith(('"', 'W/"')):
+        return version
+    return '"%s"' % version
+
+
+def matches(if_none_match, etag):
+    ''' True if an If-None-Match header value matches etag
+
+        The comparison is weak (a W/ prefix is ignored), as specified for
+        If-None-Match.
+    '''
+    if not if_none_match:
+        return False
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
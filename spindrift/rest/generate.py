@@ -0,0 +1,26 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Build functions from generated source
+
+    Used to turn a description of a rest handler's arguments into a
+    function which does exactly the needed conversions, without loops or
+    per-call checks of the description.
+'''
+
+
+def function(name, lines, namespace, filename='<generated>'):
+    ''' define a function from lines of source
+
+        name is the function defined by lines; namespace holds the globals
+        the source refers to. The source is available as the function's
+        source attribute.
+    '''
+    source = '\n'.join(lines) + '\n'
+    namespace = dict(namespace)
+    exec(compile(source, filename, 'exec'), namespace)
+    fn = namespace[name]
+    fn.source = source
+    return fn
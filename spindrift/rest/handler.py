@@ -3,20 +3,47 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
-import json
 import sys
 
+import spindrift.codec as codec
+import spindrift.deadline as deadlines
 import spindrift.http as http
+import spindrift.rest.etag as etags
+import spindrift.rest.limit as limit
 import spindrift.rest.request as rest_request
+from spindrift.websocket import is_upgrade
 
 import logging
 log = logging.getLogger(__name__)
 
 
+MESSAGE = {
+    200: 'OK',
+    201: 'Created',
+    204: 'No Content',
+    101: 'Switching Protocols',
+    302: 'Found',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    401: 'Unauthorized',
+    403: 'Forbidden',
+    404: 'Not Found',
+    426: 'Upgrade Required',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+}
+
+
 class RESTContext(object):
 
-    def __init__(self, mapper):
+    def __init__(self, mapper, compression=None, deadline_header=None,
+                 timer=None, limiter=None):
         self.mapper = mapper
+        self.compression = compression  # spindrift.compress.Compression
+        self.deadline_header = deadline_header  # seconds allowed, by client
+        self.timer = timer  # spindrift.timer.Timer, to respond at deadline
+        self.limiter = limiter  # spindrift.rest.limit.Limiter, all routes
 
 
 class RESTHandler(http.HTTPHandler):
@@ -30,8 +57,101 @@ class RESTHandler(http.HTTPHandler):
             on_rest_data(self, *groups)
             on_rest_exception(self, exc_type, exc_value, exc_traceback)
             on_rest_send(self, code, message, content, headers)
+
+        Streaming:
+
+            If the matching RESTMethod has is_stream=True, the request body
+            is not buffered. The rest handler function is called as soon as
+            the headers arrive (content arguments come from the query string
+            only), and can set these attributes on the request:
+
+                on_chunk(chunk) - called with a memoryview of each piece of
+                                  the body (see HTTPHandler.on_http_chunk)
+                on_end() - called when the body is complete
+
+            Unless the request has already been responded to, or is delayed,
+            the response is the return value of on_end (if defined), or of
+            the rest handler function. If the request is responded to before
+            the body is complete, the rest of the body is discarded.
+
+        WebSocket:
+
+            If the matching RESTMethod has is_websocket=True, only upgrade
+            requests reach the rest handler function, which accepts the
+            upgrade with request.websocket (see RESTRequest).
+
+        Expect: 100-continue:
+
+            A request with no matching route gets its 404 before the body
+            is sent. To check other headers (for instance, Authorization)
+            first, override on_http_headers and respond there; the rest
+            handler function is not called, and the connection closes.
+
+        Deadlines:
+
+            A request's deadline (request.deadline, see spindrift.deadline)
+            is the earlier of the time allowed by the matching RESTMethod's
+            timeout and by the context's deadline_header (a number of
+            seconds, sent by the client). If it has already passed, the
+            response is 503 and the rest handler function is not called;
+            if the context has a timer, a request which is still waiting
+            for a response at the deadline gets 504 (and its cleanup
+            callables run).
+
+        Concurrency limits:
+
+            If the context has a limiter, or the matching RESTMethod has one
+            (see spindrift.rest.limit), the rest handler function is called
+            only when each limiter (the RESTMethod's first) admits the
+            request; until then, the request waits in the limiter's queue.
+            A request which can't be admitted gets a prebuilt 503 with a
+            Retry-After header, and the connection closes. The request
+            holds its place in the limit until it is responded to.
+            Streaming requests don't wait in a queue, and websocket
+            requests aren't limited.
+
+        Coalescing:
+
+            If the matching RESTMethod has a coalesce (see
+            spindrift.rest.coalesce), a request identical to one whose rest
+            handler function is running waits for, and is sent, that
+            request's response. Streaming and websocket requests aren't
+            coalesced.
+
+        Caching:
+
+            If the matching RESTMethod has a cache (see
+            spindrift.rest.cache), a request whose response is in the cache
+            is sent it, encoded and compressed as it was the first time,
+            without calling the rest handler function; otherwise a 200
+            response is put in the cache as it is sent, unless it is
+            meant for one client (Set-Cookie, for instance). The cache is
+            checked after on_rest_request, and before any limiter.
+            Streaming and websocket requests aren't cached. See
+            RESTRequest.invalidate.
+
+        Conditional GET:
+
+            If the matching RESTMethod has etag=True, a 200 response has
+            an ETag header, a digest of the content as sent (see
+            spindrift.rest.etag); a rest handler function can supply a
+            version instead (see RESTRequest.etag and not_modified). If a
+            GET request's If-None-Match header matches the ETag, the
+            response is 304 Not Modified, without the content. A cached
+            response keeps its ETag.
     '''
 
+    def _on_init(self):
+        super(RESTHandler, self)._on_init()
+        self.http_compression = getattr(self.context, 'compression', None)
+        self._rest_headers = b''  # the matched route's header_lines
+        self._rest_deadline_header = getattr(
+            self.context, 'deadline_header', None)
+        self._rest_timer = getattr(self.context, 'timer', None)
+        self._rest_failed = None  # request whose rest handler raised
+        limiter = getattr(self.context, 'limiter', None)
+        self._rest_global_limiters = (limiter,) if limiter else ()
+
     def _map(self, resource, method):
         mapper = self.context.mapper
         return mapper.match(resource, method)
@@ -42,33 +162,176 @@ class RESTHandler(http.HTTPHandler):
             self._rest_handler = rest_match.handler
             self._groups = rest_match.groups
             self._coercer = rest_match.coercer
+            self.http_stream = rest_match.is_stream
+            self._rest_headers = rest_match.headers
+            self._rest_is_websocket = rest_match.is_websocket
+            self._rest_timeout = rest_match.timeout
+            self._rest_coalesce = None if rest_match.is_websocket \
+                else rest_match.coalesce
+            self._rest_cache = None if rest_match.is_websocket \
+                else rest_match.cache
+            self._rest_etag = rest_match.etag
+            if rest_match.is_websocket:
+                self._rest_limiters = ()
+            elif rest_match.limiter is None:
+                self._rest_limiters = self._rest_global_limiters
+            else:
+                self._rest_limiters = \
+                    (rest_match.limiter,) + self._rest_global_limiters
         else:
+            self._rest_handler = None
+            self._rest_headers = b''
             self.on_rest_no_match()
-            self._rest_send(404, 'Not Found', close=True)
+            self._rest_error(404)
 
     def on_http_data(self):
+        if self._rest_handler is None:  # already responded (404)
+            return
+        if self._rest_is_websocket and not is_upgrade(self.http_headers):
+            return self._rest_send(
+                426, headers={'Upgrade': 'websocket',
+                              'Sec-WebSocket-Version': '13'}, close=True)
+        self._rest_guard(self._rest_call)
+
+    def on_http_body_start(self):
+        self._rest_request = None
+        if self._rest_handler is None:  # already responded (404)
+            return
+        self._rest_guard(self._rest_call, True)
+
+    def on_http_chunk(self, chunk):
+        request = self._rest_request
+        if request is not None and not request.is_done and request.on_chunk:
+            self._rest_guard(request.on_chunk, chunk)
+
+    def on_http_body_end(self):
+        request, self._rest_request = self._rest_request, None
+        if request is not None and not request.is_done:
+            self._rest_guard(self._rest_end, request)
+
+    def _rest_guard(self, fn, *args):
         try:
-            self.on_rest_data(self._groups)
-            request = rest_request.RESTRequest(self)
-            request = self.on_rest_request(request)
-            try:
-                args, kwargs = self._coercer(
-                    self._groups, request.json
-                )
-            except Exception as e:
-                log.warning(e)
-                return request.respond(400, str(e))
-            result = self._rest_handler(request, *args, **kwargs)
-            if request.is_done:  # already responded
-                pass
-            elif not request.is_delayed:
-                request.respond(result)
+            fn(*args)
         except Exception:
+            self._rest_request = None
             content = self.on_rest_exception(*sys.exc_info())
             kwargs = dict(code=501, message='Internal Server Error')
             if content:
                 kwargs['content'] = str(content)
             self._rest_send(close=True, **kwargs)
+            request, self._rest_failed = self._rest_failed, None
+            if request is not None:
+                request._run_cleanup()
+
+    def _rest_call(self, is_stream=False):
+        self.on_rest_data(self._groups)
+        request = rest_request.RESTRequest(self)
+        request.deadline = self._rest_deadline()
+        if self._rest_etag:
+            request.etag = True
+        request = self.on_rest_request(request)
+        if deadlines.is_expired(request.deadline):
+            log.warning('cid=%s: deadline passed before %s %s', self.id,
+                        self.http_method, self.http_resource)
+            return request.respond(503)
+        cache = None if is_stream else self._rest_cache
+        if cache is not None:
+            cache_key = cache.key(self)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return request._send_cached(entry)
+        call = (self._rest_handler, self._groups, self._coercer,
+                self._rest_limiters)
+        coalesce = self._rest_coalesce
+        if coalesce is not None and not is_stream:
+            def lead():  # when a follower's leader fails
+                self._rest_later(self._rest_start, request, *call, False)
+
+            key = coalesce.key(self)
+            if coalesce.join(key, request, lead, self._rest_timer):
+                if request.deadline is not None and \
+                        self._rest_timer is not None:
+                    request._expire_at_deadline(self._rest_timer)
+                return
+        if cache is not None:
+            request._cache = (cache, cache_key)
+            request.cleanup = lambda: cache.release(cache_key)
+        self._rest_start(request, *call, is_stream)
+
+    def _rest_start(self, request, fn, groups, coercer, limiters, is_stream):
+        try:
+            args, kwargs = coercer(
+                groups, request.http_query if is_stream else request.json
+            )
+        except Exception as e:
+            log.warning(e)
+            return request.respond(400, str(e))
+        if not limiters:
+            return self._rest_run(request, fn, args, kwargs, is_stream)
+
+        is_waiting = False
+
+        def start(release):
+            request.cleanup = release
+            if is_waiting:
+                self._rest_later(
+                    self._rest_run, request, fn, args, kwargs, False)
+            else:
+                self._rest_run(request, fn, args, kwargs, is_stream)
+
+        def reject(limiter):
+            log.debug('cid=%s: over limit %s', self.id, limiter.name)
+            request._error(503, limiter.headers)
+
+        limit.acquire(limiters, start, reject, not is_stream)
+        is_waiting = True
+
+    def _rest_later(self, run, request, *args):
+        ''' run(request, *args) for a request which has been waiting
+
+            (for a limiter, or for a coalesced request's leader)
+        '''
+        if request.is_done or not self.is_open:
+            return request._run_cleanup()
+        if deadlines.is_expired(request.deadline):
+            log.warning('cid=%s: deadline passed while waiting', self.id)
+            return request.respond(503)
+        if request._slot is not None:
+            self.http_slot = request._slot
+        self._rest_headers = request._headers
+        self._rest_guard(run, request, *args)
+
+    def _rest_run(self, request, fn, args, kwargs, is_stream):
+        try:
+            result = fn(request, *args, **kwargs)
+        except Exception:
+            if not request.is_done:  # _rest_guard responds, then cleans up
+                request.is_done = True
+                self._rest_failed = request
+            raise
+        if request.is_done:  # already responded
+            return
+        elif is_stream:
+            request.response = result
+            self._rest_request = request
+        elif not request.is_delayed:
+            return request.respond(result)
+        if request.deadline is not None and self._rest_timer is not None:
+            request._expire_at_deadline(self._rest_timer)
+
+    def _rest_deadline(self):
+        header = self._rest_deadline_header
+        deadline = deadlines.from_header(
+            self.http_headers.get(header)) if header else None
+        if self._rest_timeout is not None:
+            deadline = deadlines.earliest(
+                deadline, deadlines.after(self._rest_timeout))
+        return deadline
+
+    def _rest_end(self, request):
+        result = request.on_end() if request.on_end else request.response
+        if not request.is_done and not request.is_delayed:
+            request.respond(result)
 
     def on_rest_data(self, groups):
         ''' called before rest_handler execution '''
@@ -101,12 +364,13 @@ class RESTHandler(http.HTTPHandler):
         '''
         return None
 
-    def _rest_send(self, code, message=None, content='', content_type=None, headers=None, close=False):
+    def _rest_send(self, code, message=None, content='', content_type=None, headers=None, close=False, request=None):
 
-        if isinstance(content, (dict, list, tuple)):
+        if content is not None and \
+                not isinstance(content, (str, bytes, bytearray)):
             try:
-                content = json.dumps(content)
-                content_type = 'application/json; charset=utf-8'
+                content = codec.dumpb(content)
+                content_type = 'application/json'  # charset added by http
             except Exception:
                 content = str(content)
 
@@ -116,25 +380,72 @@ class RESTHandler(http.HTTPHandler):
             headers['Content-Type'] = content_type
 
         if not message:
-            message = {
-                200: 'OK',
-                201: 'Created',
-                204: 'No Content',
-                302: 'Found',
-                400: 'Bad Request',
-                401: 'Unauthorized',
-                403: 'Forbidden',
-                404: 'Not Found',
-                500: 'Internal Server Error',
-            }.get(code, '')
-
-        args = dict(code=code, message=message, close=close)
+            message = MESSAGE.get(code, '')
+
+        args = dict(code=code, message=message)
         if content:
             args['content'] = content
         if headers:
             args['headers'] = headers
+        if request is not None and code == 200:  # to cache, or with ETag
+            document = self.http_server_document(**args)
+            etag = request.etag
+            if etag is not None:
+                etag = etags.strong(document[1]) if etag is True \
+                    else etags.quote(etag)
+                document = (
+                    document[0] + b'ETag: %s\r\n' % etag.encode('ascii'),
+                    document[1],
+                )
+            if request._cache is not None:
+                cache, key = request._cache
+                if cache.is_shared(headers):  # else released by cleanup
+                    cache.put(key, document, etag)
+            return self._rest_send_document(document, etag, request, close)
         self.on_rest_send(code, message, content, headers)
-        self.http_send_server(**args)
+        self.http_send_server(close=close, static=self._rest_headers, **args)
+
+    def _rest_send_document(self, document, etag, request, close):
+        ''' send a prebuilt 200 response (see http_server_document)
+
+            or, if etag is in the request's If-None-Match, 304 Not Modified
+        '''
+        if etag is not None and request.http_method == 'GET' and \
+                etags.matches(request.http_headers.get('if-none-match'), etag):
+            return self._rest_not_modified(etag, close)
+        self.on_rest_send(200, MESSAGE[200], document[1], None)
+        self.http_send_document(
+            *document, close=close, static=self._rest_headers)
+
+    def _rest_not_modified(self, etag, close):
+        ''' send 304 Not Modified, which has no content '''
+        self.on_rest_send(304, MESSAGE[304], None, None)
+        self.http_send_document(
+            http.status_line(304, MESSAGE[304]) +
+            b'ETag: %s\r\n' % etag.encode('ascii'),
+            b'', close=close, static=self._rest_headers)
+
+    def _rest_error(self, code, headers=b''):
+        ''' send a prebuilt error response (see http.ERROR) '''
+        self.on_rest_send(code, http.ERROR[code], '', None)
+        self.http_send_error(code, headers)
+
+    def _rest_stream(self, code, message=None, headers=None,
+                     content_type=None, close=False, iterable=None,
+                     on_end=None):
+        if not message:
+            message = MESSAGE.get(code, '')
+        self.on_rest_send(code, message, None, headers)
+        kwargs = dict(code=code, message=message, headers=headers,
+                      close=close, iterable=iterable, on_end=on_end,
+                      static=self._rest_headers)
+        if content_type:
+            kwargs['content_type'] = content_type
+        return self.http_send_server_stream(**kwargs)
+
+    def _rest_websocket(self, on_message, on_close, protocol, on_end):
+        self.on_rest_send(101, MESSAGE[101], None, None)
+        return self.http_websocket(on_message, on_close, protocol, on_end)
 
     def on_rest_send(self, code, message, content, headers):
         pass
@@ -0,0 +1,187 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Adaptive concurrency limits
+
+    A Limiter caps the number of requests being handled at once. Requests
+    over the limit wait in a bounded queue, or are rejected (RESTHandler
+    sends a prebuilt 503 with Retry-After), so that an overloaded server
+    answers the requests it can quickly, instead of every request slowly.
+
+    The limit adapts to the latency of the requests handled (AIMD): it
+    increases by one for each limit's worth of responses which take less
+    than the target latency, while the limit is in use; it is multiplied by
+    backoff (for instance, 0.9) for each response which takes longer.
+'''
+from collections import deque
+import time
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Limiter(object):
+
+    def __init__(self, name='global', limit=20, min_limit=1, max_limit=200,
+                 latency=1.0, backoff=0.9, queue_size=0, is_lifo=False,
+                 queue_timeout=1.0, retry_after=1, timer=None):
+        """An adaptive concurrency limit.
+
+           Optional Arguments:
+               name - used in log messages and stats
+               limit - initial number of concurrent requests
+               min_limit, max_limit - range of the limit
+               latency - target response time, in seconds; a slower
+                         response decreases the limit
+               backoff - factor applied to the limit on a slow response
+               queue_size - number of requests which can wait for a slot
+                            (default=0, no queue)
+               is_lifo - serve the queue newest first (which keeps latency
+                         low for the requests served under sustained
+                         overload), instead of oldest first
+               queue_timeout - seconds a request can wait in the queue
+                               before it is rejected
+               retry_after - seconds, in the Retry-After header of a
+                             rejection
+               timer - spindrift.timer.Timer, to reject a request when
+                       queue_timeout passes (otherwise, a waiting request
+                       is checked only when a slot frees)
+
+           Notes:
+
+               1. acquire(start, reject) calls start(release) when the
+                  request is admitted, right away or from the queue, or
+                  reject(limiter) if it isn't. release() must be called when
+                  the response is sent.
+        """
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency = latency
+        self.backoff = backoff
+        self.queue_size = queue_size
+        self.is_lifo = is_lifo
+        self.queue_timeout = queue_timeout
+        self.headers = b'Retry-After: %d\r\n' % retry_after
+        self.inflight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.expired = 0  # rejected after waiting in the queue
+        self._queue = deque()  # (time queued, start, reject)
+        self.timer = timer
+        self._sweep = None  # timer for the oldest request in the queue
+
+    def __repr__(self):
+        return 'Limiter[%s limit=%d inflight=%d queued=%d]' % (
+            self.name, self.limit, self.inflight, len(self._queue))
+
+    def acquire(self, start, reject, can_queue=True):
+        if self.inflight < int(self.limit) and not self._queue:
+            return self._start(start)
+        if can_queue and len(self._queue) < self.queue_size:
+            self._queue.append((time.perf_counter(), start, reject))
+            self._sweep_start()
+            return
+        self.rejected += 1
+        reject(self)
+
+    def _start(self, start):
+        self.inflight += 1
+        self.accepted += 1
+        started = time.perf_counter()
+        is_released = False
+
+        def release(is_measured=True):
+            nonlocal is_released
+            if is_released:
+                return
+            is_released = True
+            self.inflight -= 1
+            if is_measured:
+                self._adjust(time.perf_counter() - started)
+            self._drain()
+        start(release)
+
+    def _adjust(self, latency):
+        if latency > self.latency:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self.inflight + 1 >= self.limit / 2:  # the limit was in use
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _drain(self):
+        queue = self._queue
+        while queue and self.inflight < int(self.limit):
+            queued, start, reject = queue.pop() if self.is_lifo \
+                else queue.popleft()
+            if time.perf_counter() - queued > self.queue_timeout:
+                self.expired += 1
+                reject(self)
+            else:
+                self._start(start)
+
+    def _sweep_start(self):
+        if self.timer is None or not self._queue:
+            return
+        if self._sweep is not None and self._sweep.is_running:
+            return
+        wait = self._queue[0][0] + self.queue_timeout - time.perf_counter()
+        self._sweep = self.timer.add(self._expire, max(0, wait) * 1000)
+        self._sweep.start()
+
+    def _expire(self):
+        ''' reject the requests which have waited for queue_timeout '''
+        queue = self._queue
+        now = time.perf_counter()
+        while queue and now - queue[0][0] >= self.queue_timeout:
+            queued, start, reject = queue.popleft()  # oldest, even if lifo
+            self.expired += 1
+            reject(self)
+        self._sweep_start()
+
+    def stats(self):
+        return dict(
+            limit=int(self.limit),
+            inflight=self.inflight,
+            queued=len(self._queue),
+            accepted=self.accepted,
+            rejected=self.rejected,
+            expired=self.expired,
+        )
+
+    def send_stats(self, statsd, prefix='limit'):
+        ''' record stats as gauges on a spindrift.statsd.Statsd '''
+        for key, value in self.stats().items():
+            statsd.gauge('%s.%s.%s' % (prefix, self.name, key), value)
+
+
+def acquire(limiters, start, reject, can_queue=True):
+    ''' start(release) once each of limiters admits, else reject(limiter)
+
+        The limiters are acquired in order; a request waiting in a
+        limiter's queue holds the ones before it.
+    '''
+    if not limiters:
+        return start(_release)
+    limiter, rest = limiters[0], limiters[1:]
+    if not rest:
+        return limiter.acquire(start, reject, can_queue)
+
+    def admitted(release):
+        def start_rest(release_rest):
+            def release_all():
+                release_rest()
+                release()
+            start(release_all)
+
+        def reject_rest(limiter):
+            release(False)
+            reject(limiter)
+        acquire(rest, start_rest, reject_rest, can_queue)
+    limiter.acquire(admitted, reject, can_queue)
+
+
+def _release():
+    pass
@@ -3,11 +3,13 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
-from collections import namedtuple
-from itertools import zip_longest
+from collections import OrderedDict, namedtuple
 import re
 
 from ergaleia.import_by_path import import_by_path
+from spindrift.http import header_lines
+from spindrift.rest.generate import function
+from spindrift.rest.router import Router
 
 import logging
 log = logging.getLogger(__name__)
@@ -38,55 +40,187 @@ class RESTArg(object):
 
 
 class RESTMethod(object):
+    ''' A rest handler function and its arguments
+
+        Optional Arguments:
+            headers - dict of headers added to every response from the
+                      handler (for instance, Cache-Control); they are
+                      encoded once, here, and are sent as is
+            is_websocket - the handler accepts websocket upgrade requests
+                           (see RESTRequest.websocket); other requests
+                           get 426 Upgrade Required
+            timeout - seconds allowed for a response, which sets the
+                      request's deadline (see spindrift.deadline); a
+                      deadline from the request's headers can be earlier
+            limiter - spindrift.rest.limit.Limiter for requests to the
+                      handler (see RESTHandler)
+            coalesce - spindrift.rest.coalesce.Coalesce, to share one
+                       call of the handler among identical requests
+            cache - spindrift.rest.cache.Cache, to keep the handler's
+                    responses (use on a get)
+            etag - add an ETag, a digest of the content, to the handler's
+                   200 responses, and respond to a matching If-None-Match
+                   with 304 Not Modified (see RESTHandler)
+
+        Notes:
+
+            1. The args and content are converted by a function generated
+               from them (see coercer), which is rebuilt after add_arg or
+               add_content.
+    '''
 
-    def __init__(self, handler, args=None, content=None):
+    def __init__(self, handler, args=None, content=None, is_stream=False,
+                 headers=None, is_websocket=False, timeout=None,
+                 limiter=None, coalesce=None, cache=None, etag=False):
         self.handler = import_by_path(handler)
         self.args = args or []
         self.content = content or []
+        self.is_stream = is_stream
+        self.headers = header_lines(headers)
+        self.is_websocket = is_websocket
+        self.timeout = timeout
+        self.limiter = limiter
+        self.coalesce = coalesce
+        self.cache = cache
+        self.etag = etag
+        self._coerce = None
 
     def add_arg(self, type):
         self.args.append(RESTArg(type))
+        self._coerce = None
 
     def add_content(self, name, type=None, is_required=True):
         self.content.append(RESTArg(type, name, is_required))
+        self._coerce = None
 
     def coerce(self, arg_data, content_data):
-        args = []
-        kwargs = {}
-
-        if len(self.args) > len(arg_data):
-            raise ArgumentCountMismatch()
-        for coercer, arg in zip_longest(self.args, arg_data):
-            if coercer:
-                arg = coercer.type(arg)
-            args.append(arg)
-
-        for coercer in self.content:
-            try:
-                value = content_data[coercer.name]
-            except KeyError:
-                if coercer.is_required:
-                    raise MissingRequiredContent(coercer.name)
-            else:
-                if coercer.type:
+        ''' return (args, kwargs) for the handler
+
+            arg_data is the resource's regex groups, and content_data is the
+            request's json (or query) dict.
+        '''
+        return self.coercer()(arg_data, content_data)
+
+    def coercer(self):
+        ''' the coerce function for the current args and content '''
+        if self._coerce is None:
+            self._coerce = self._generate()
+        return self._coerce
+
+    def _generate(self):
+        ''' generate a coerce function for the current args and content
+
+            for instance, with one int arg and a required content 'name'
+            of type str:
+
+                def coerce(arg_data, content_data):
+                    if len(arg_data) < 1:
+                        raise ArgumentCountMismatch()
+                    args = [a0(arg_data[0])]
+                    if len(arg_data) > 1:
+                        args.extend(arg_data[1:])
+                    kwargs = {}
                     try:
-                        value = coercer.type(value)
+                        value = content_data[k0]
+                    except KeyError:
+                        raise MissingRequiredContent(k0)
+                    try:
+                        value = c0(value)
                     except ValueError as e:
-                        raise InvalidContent(coercer.name, str(e))
-                kwargs[coercer.name] = value
+                        raise InvalidContent(k0, str(e))
+                    kwargs[k0] = value
+                    return args, kwargs
+        '''
+        namespace = dict(
+            ArgumentCountMismatch=ArgumentCountMismatch,
+            MissingRequiredContent=MissingRequiredContent,
+            InvalidContent=InvalidContent,
+        )
+        lines = ['def coerce(arg_data, content_data):']
+        count = len(self.args)
+        if count:
+            lines.extend((
+                '    if len(arg_data) < %d:' % count,
+                '        raise ArgumentCountMismatch()',
+                '    args = [%s]' % ', '.join(
+                    'a%d(arg_data[%d])' % (n, n) for n in range(count)),
+                '    if len(arg_data) > %d:' % count,
+                '        args.extend(arg_data[%d:])' % count,
+            ))
+            for n, arg in enumerate(self.args):
+                namespace['a%d' % n] = arg.type
+        else:
+            lines.append('    args = list(arg_data)')
+
+        if not self.content:
+            lines.append('    return args, {}')
+            return function('coerce', lines, namespace, self._filename)
+
+        lines.append('    kwargs = {}')
+        for n, arg in enumerate(self.content):
+            namespace['k%d' % n] = arg.name
+            lines.extend((
+                '    try:',
+                '        value = content_data[k%d]' % n,
+                '    except KeyError:',
+            ))
+            indent = '    '
+            if arg.is_required:
+                lines.append('        raise MissingRequiredContent(k%d)' % n)
+            else:
+                lines.extend(('        pass', '    else:'))
+                indent = '        '
+            if arg.type:
+                namespace['c%d' % n] = arg.type
+                lines.extend(indent + line for line in (
+                    'try:',
+                    '    value = c%d(value)' % n,
+                    'except ValueError as e:',
+                    '    raise InvalidContent(k%d, str(e))' % n,
+                ))
+            lines.append(indent + 'kwargs[k%d] = value' % n)
+        lines.append('    return args, kwargs')
+        return function('coerce', lines, namespace, self._filename)
+
+    @property
+    def _filename(self):
+        return '<coerce %s>' % getattr(
+            self.handler, '__qualname__', self.handler)
+
+
+RESTMatch = namedtuple(
+    'RESTMatch',
+    ('handler', 'groups', 'coercer', 'is_stream', 'headers', 'is_websocket',
+     'timeout', 'limiter', 'coalesce', 'cache', 'etag'),
+    defaults=(False, b'', False, None, None, None, None, False),
+)
 
-        return args, kwargs
 
+class RESTMapper(object):
+    ''' A Mapper between REST resource+method and a rest handler function
 
-RESTMatch = namedtuple('RESTMatch', ('handler', 'groups', 'coercer'))
+        Optional Arguments:
+            cache_size - maximum number of (method, resource) results of
+                         match to keep (default=0, no cache)
 
+        Notes:
 
-class RESTMapper(object):
-    ''' A Mapper between REST resource+method and a rest handler function
+            1. The cache is least-recently-used. A result is only cached
+               the second time its (method, resource) is matched (within
+               the last cache_size misses), so that resources which are
+               seldom repeated, like those carrying unique ids, don't push
+               out the ones which are. The hit and miss attributes count
+               cache lookups.
     '''
 
-    def __init__(self):
+    def __init__(self, cache_size=0):
         self._mapping = []
+        self._routers = None  # method: Router (see compile)
+        self.cache_size = cache_size
+        self.hit = 0
+        self.miss = 0
+        self._cache = OrderedDict()
+        self._seen = set()  # keys missed once (admitted on the next miss)
 
     def add(self, pattern, methods):
         """ add a mapping between a resource and one or more functions
@@ -117,9 +251,46 @@ class RESTMapper(object):
                     (my_func, (123,))
 
                 2. The methods dict is a set of RESTMethod objects indexed
-                   by HTTP verb (lowercase get, post put, delete).
+                   by HTTP verb (lowercase get, post put, delete). A
+                   websocket handler is a get (see RESTMethod).
         """
         self._mapping.append(RESTMapping(pattern, methods))
+        self._routers = None
+        self._cache.clear()
+        self._seen.clear()
+
+    def compile(self):
+        """ build the route tables used by match
+
+            A Router (see spindrift.rest.router) is built for each method
+            from the mappings, in order, which define the method. This is
+            done by match if it hasn't already been done since the last add.
+        """
+        routes = {}
+        for mapping in self._mapping:
+            for method, rest_method in mapping.method.items():
+                if not rest_method:
+                    continue
+                routes.setdefault(method.lower(), []).append((
+                    mapping.pattern.pattern,
+                    RESTMatch(
+                        rest_method.handler,
+                        (),
+                        rest_method.coercer(),
+                        rest_method.is_stream,
+                        rest_method.headers,
+                        rest_method.is_websocket,
+                        rest_method.timeout,
+                        rest_method.limiter,
+                        rest_method.coalesce,
+                        rest_method.cache,
+                        rest_method.etag,
+                    ),
+                ))
+        self._routers = {
+            method: Router(method_routes)
+            for method, method_routes in routes.items()
+        }
 
     def match(self, resource, method):
         """ Match a resource + method to a RESTMethod
@@ -129,21 +300,64 @@ class RESTMapper(object):
             the http status line. The user shouldn't call this method, it
             is called by the on_http_status method of the RESTHandler.
 
-            Step through the mappings in the order they were defined
-            and look for a match on the regex which also has a method
-            defined.
+            The result is the first mapping, in the order they were
+            defined, with a regex that matches and the method defined.
         """
-        for mapping in self._mapping:
-            m = mapping.pattern.match(resource)
-            if m:
-                rest_method = mapping.method.get(method.lower())
-                if rest_method:
-                    return RESTMatch(
-                        rest_method.handler,
-                        m.groups(),
-                        rest_method.coerce,
-                    )
-        return None
+        if not self.cache_size:
+            return self._match(resource, method)
+
+        key = (method, resource)
+        cache = self._cache
+        try:
+            result = cache[key]
+        except KeyError:
+            self.miss += 1
+        else:
+            self.hit += 1
+            cache.move_to_end(key)
+            return result
+
+        result = self._match(resource, method)
+        seen = self._seen
+        if key in seen:
+            seen.discard(key)
+            cache[key] = result
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        else:
+            if len(seen) >= self.cache_size:
+                seen.clear()
+            seen.add(key)
+        return result
+
+    def invalidate(self, resource):
+        """ remove resource's cached responses (see RESTMethod cache)
+
+            The cache of each method whose route matches resource is
+            invalidated; the number of responses removed is returned.
+        """
+        if self._routers is None:
+            self.compile()
+        count = 0
+        for method in self._routers:
+            rest_match = self._match(resource, method)
+            if rest_match is not None and rest_match.cache is not None:
+                count += rest_match.cache.invalidate(resource)
+        return count
+
+    def _match(self, resource, method):
+        if self._routers is None:
+            self.compile()
+        router = self._routers.get(method.lower())
+        if router is None:
+            return None
+        result = router.match(resource)
+        if result is None:
+            return None
+        rest_match, groups = result
+        if groups:
+            return rest_match._replace(groups=groups)
+        return rest_match
 
 
 class RESTMapping(object):
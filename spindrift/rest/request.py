@@ -3,9 +3,12 @@ The MIT License (MIT)
 
 https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 '''
-import json
+from operator import attrgetter
 import urllib.parse as urlparse
 
+import spindrift.codec as codec
+from spindrift.deadline import is_expired, remaining
+from spindrift.rest.etag import matches, quote
 from spindrift.task import Task, inspect_parameters
 
 
@@ -13,6 +16,32 @@ import logging
 log = logging.getLogger(__name__)
 
 
+_HTTP_ATTRIBUTES = (
+    'http_headers', 'http_content', 'http_method', 'http_multipart',
+    'http_resource', 'http_query_string', 'http_query', 'http_message',
+)
+
+
+class _Document(object):
+    """ a copy of a handler's http document attributes """
+    __slots__ = _HTTP_ATTRIBUTES
+
+    def __init__(self, handler):
+        for name in _HTTP_ATTRIBUTES:
+            setattr(self, name, getattr(handler, name))
+
+
+def _http_attribute(name):
+    """ property for an http document attribute
+
+        The document is the handler, or a copy of its attributes (see Note 2
+        on RESTRequest); setting the attribute changes the document.
+    """
+    def fset(self, value):
+        setattr(self._document, name, value)
+    return property(attrgetter('_document.' + name), fset)
+
+
 class RESTRequest(object):
     """ First parameter passed to rest-handler routines
 
@@ -39,30 +68,77 @@ class RESTRequest(object):
         Notes:
 
             1. The attribute 'cleanup' can be set with one or more callables,
-               which will be executed at request.respond. The callables will be
-               invoked in the order assigned.
+               which will be executed at request.respond. The callables are
+               kept on a stack, and invoked in the reverse of the order
+               assigned (the last one assigned runs first).
+
+            2. If the handler is pipelining (http_pipeline), the http document
+               attributes are copied from the handler when the request is
+               created, since the handler moves on to the next request before
+               this one is responded to.
+
+            3. The attributes 'on_chunk' and 'on_end' are used by streaming
+               routes (see rest.handler.RESTHandler).
+
+            4. A request is created for every http document, so the commonly
+               used attributes are slots; other attributes (set by a rest
+               handler function, for instance) go in a __dict__, which is
+               only allocated if one is set.
+
+            5. The attribute 'deadline' is the time (see spindrift.deadline)
+               after which a response is of no use, or None. It is passed on
+               by call (see Note 4 on call).
+
+            6. The attribute 'etag' is the ETag of a 200 response (see
+               rest.etag): a version (str or int) of the content, True for
+               a digest of the content (set if the RESTMethod has
+               etag=True), or None for no ETag. If the request's
+               If-None-Match header matches, the response is 304 Not
+               Modified instead.
     """
+    __slots__ = (
+        'handler', 'id', 'is_delayed', 'response', 'is_done', 'on_chunk',
+        'on_end', 'cursor', 'deadline', '_cleanup', '_headers', '_slot', '_document',
+        'etag', '_json', '_flight', '_cache', '__dict__',
+    )
+
     def __init__(self, handler):
         self.handler = handler
+        self.id = handler.id
         self.is_delayed = False
         self.response = None
         self.is_done = False
+        self.on_chunk = None
+        self.on_end = None
+        self.deadline = None
+        self.etag = None
         self._cleanup = []
+        self._headers = getattr(handler, '_rest_headers', b'')  # route's
+        self._slot = getattr(handler, 'http_slot', None)
+        if self._slot is None:
+            self._document = handler
+        else:
+            self._document = _Document(handler)
+        self._json = None
+        self._flight = None  # coalesce.Flight, if leading one
+        self._cache = None  # (cache.Cache, key), to put the response
+
+    http_headers = _http_attribute('http_headers')
+    http_content = _http_attribute('http_content')
+    http_method = _http_attribute('http_method')
+    http_multipart = _http_attribute('http_multipart')
+    http_resource = _http_attribute('http_resource')
+    http_query_string = _http_attribute('http_query_string')
+    http_query = _http_attribute('http_query')
+    http_message = _http_attribute('http_message')
 
-    def __getattr__(self, name):
-        if name in (
-            'id', 'http_headers', 'http_content', 'http_method',
-            'http_multipart', 'http_resource', 'http_query_string',
-            'http_query', 'http_message',
-        ):
-            return getattr(self.handler, name)
-        super(RESTRequest, self).__getattribute__(name)
+    @property
+    def cleanup(self):
+        return tuple(self._cleanup)
 
-    def __setattr__(self, name, value):
-        if name == 'cleanup':
-            self._cleanup.append(value)
-        else:
-            super(RESTRequest, self).__setattr__(name, value)
+    @cleanup.setter
+    def cleanup(self, value):
+        self._cleanup.append(value)
 
     def delay(self):
         """ Don't respond immediately to the connection peer.
@@ -93,9 +169,9 @@ class RESTRequest(object):
 
             content_type=None
 
-                if content is one of type (dict, list, float, bool, int), then
-                content_type is changed to applicaton/json and the content
-                translated with json.dumps
+                if content is not a str or bytes (for instance, a dict, list
+                or DAO), then content_type is changed to application/json
+                and the content translated with spindrift.codec.dumpb
 
 
         """
@@ -107,17 +183,156 @@ class RESTRequest(object):
     def _respond(self, code=200, content='', headers=None, message=None,
                  content_type=None):
         if not self.is_done:
-            close = self.handler.http_headers.get('connection') == 'close'
+            close = self.http_headers.get('connection') == 'close'
             self.is_delayed = True  # prevent second response on handler return
+            if self._slot is not None:
+                self.handler.http_slot = self._slot
+            self.handler._rest_headers = self._headers
+            args = (code, message, content, content_type, headers, close)
+            if self._cache is not None or self.etag is not None:
+                args += (self,)
             try:
-                self.handler._rest_send(code, message, content, content_type,
-                                        headers, close)
+                self.handler._rest_send(*args)
             except Exception:
                 log.exception('error sending http response')
                 self.handler._rest_send(500)
             self.is_done = True
-            for cleanup in self._cleanup[::-1]:
-                cleanup()
+            if self._flight is not None and code < 500:
+                self._flight.land(code, content, headers, message,
+                                  content_type)
+            self._run_cleanup()
+
+    def _error(self, code, headers=b''):
+        """ respond with a prebuilt error response (see http.ERROR) """
+        if not self.is_done:
+            self.is_delayed = True
+            self.is_done = True
+            if self._slot is not None:
+                self.handler.http_slot = self._slot
+            self.handler._rest_error(code, headers)
+            self._run_cleanup()
+
+    def _send_cached(self, entry):
+        """ respond with a cached response (see rest.cache) """
+        if not self.is_done:
+            close = self.http_headers.get('connection') == 'close'
+            self.is_delayed = True
+            self.is_done = True
+            if self._slot is not None:
+                self.handler.http_slot = self._slot
+            self.handler._rest_headers = self._headers
+            self.handler._rest_send_document(
+                entry.document, entry.etag, self, close)
+            self._run_cleanup()
+
+    def not_modified(self, etag):
+        """ Respond with 304 Not Modified, if the client has the content.
+
+            The etag is a version of the content (for instance, a column
+            which changes whenever a database row does), which is quoted if
+            it isn't an entity tag already (see rest.etag). If this is a
+            GET request, and its If-None-Match header matches the etag, the
+            response is 304 Not Modified, and True is returned; there is no
+            more work to do. Otherwise, False is returned, and the etag is
+            kept (see Note 6) for the response.
+        """
+        self.etag = etag = quote(etag)
+        if self.http_method != 'GET' or self.is_done or \
+                not matches(self.http_headers.get('if-none-match'), etag):
+            return False
+        close = self.http_headers.get('connection') == 'close'
+        self.is_delayed = True
+        self.is_done = True
+        if self._slot is not None:
+            self.handler.http_slot = self._slot
+        self.handler._rest_headers = self._headers
+        self.handler._rest_not_modified(etag, close)
+        self._run_cleanup()
+        return True
+
+    def invalidate(self, resource=None):
+        """ Remove the cached responses for a resource.
+
+            The resource (default=this request's http_resource) is matched
+            against the handler's routes, and the responses in the cache of
+            each matching method (see rest.cache) are removed. Call this
+            after a change to the data the responses are made from.
+
+            Returns the number of responses removed.
+        """
+        if resource is None:
+            resource = self.http_resource
+        return self.handler.context.mapper.invalidate(resource)
+
+    def _expire_at_deadline(self, timer):
+        """ respond with 504 if not done by the deadline """
+        def expire():
+            if not self.is_done:
+                log.warning('cid=%s: deadline passed', self.id)
+                self.respond(504)
+        self.cleanup = timer.add(
+            expire, max(remaining(self.deadline), 0) * 1000).start().cancel
+
+    def _run_cleanup(self):
+        for cleanup in reversed(self._cleanup):
+            cleanup()
+
+    def stream(self, code=200, headers=None, content_type=None,
+               iterable=None, message=None):
+        """ Start a streaming (chunked) response to the connection peer.
+
+            Returns a spindrift.http.HTTPWriter, which sends the content in
+            pieces with write, and finishes the response with end. If
+            iterable is specified, content is pulled from it as the
+            connection is able to send it, and the response ends when the
+            iterable is exhausted.
+
+            If content_type is 'text/event-stream', the response is a
+            Server-Sent Events stream; use the writer's event method (or
+            supply an iterable of event data or event keyword dicts).
+
+            The request is done (see respond) as soon as this is called;
+            cleanup callables run when the response ends or the connection
+            closes.
+        """
+        if self.is_done:
+            log.warning('cid=%s: stream after response', self.id)
+            return None
+        close = self.http_headers.get('connection') == 'close'
+        self.is_delayed = True
+        self.is_done = True
+        if self._slot is not None:
+            self.handler.http_slot = self._slot
+        self.handler._rest_headers = self._headers
+        return self.handler._rest_stream(
+            code, message, headers, content_type, close, iterable,
+            self._run_cleanup,
+        )
+
+    def websocket(self, on_message=None, on_close=None, protocol=None):
+        """ Accept a WebSocket upgrade request.
+
+            Returns a spindrift.websocket.WebSocket, which has methods
+            send_message(message) and close(code, reason). on_message is
+            called with (websocket, message) for each message from the
+            peer; on_close is called with (websocket, code, reason).
+
+            If the request is not a websocket upgrade, it is responded to
+            with 426 Upgrade Required, and None is returned.
+
+            The request is done (see respond) as soon as this is called;
+            cleanup callables run when the websocket closes.
+        """
+        if self.is_done:
+            log.warning('cid=%s: websocket after response', self.id)
+            return None
+        self.is_delayed = True
+        self.is_done = True
+        if self._slot is not None:
+            self.handler.http_slot = self._slot
+        self.handler._rest_headers = self._headers
+        return self.handler._rest_websocket(
+            on_message, on_close, protocol, self._run_cleanup)
 
     def call(
                 self, fn, args=None, kwargs=None, on_success=None,
@@ -181,6 +396,13 @@ class RESTRequest(object):
                then a spindrift.Task object is passed instead of a callable.
                If available, the 'cursor' attribute is added to the Task.
 
+            4. If the request's deadline has passed, fn is not called, and
+               the response is 504 Gateway Timeout. Otherwise the deadline
+               is added to the Task (see Note 3), or passed to fn if it has
+               a 'deadline' parameter which is not in kwargs. A failure
+               after the deadline has passed gets 504 instead of 500 by
+               default.
+
         Example:
 
             def on_load(request, result):
@@ -216,12 +438,21 @@ class RESTRequest(object):
 
         self.delay()
 
-        task, cursor = inspect_parameters(fn, kwargs)
+        if is_expired(self.deadline):
+            log.warning('cid=%s: deadline passed before call fn=%s',
+                        self.id, fn)
+            return self.respond(504)
+
+        task, cursor, deadline = inspect_parameters(fn, kwargs)
 
         if task:
-            cb = Task(cb, self.id, getattr(self, 'cursor', None))
-        elif cursor:
-            kwargs['cursor'] = getattr(self, 'cursor', None)
+            cb = Task(cb, self.id, getattr(self, 'cursor', None),
+                      self.deadline)
+        else:
+            if cursor:
+                kwargs['cursor'] = getattr(self, 'cursor', None)
+            if deadline:
+                kwargs['deadline'] = self.deadline
 
         try:
             log.debug(
@@ -235,12 +466,12 @@ class RESTRequest(object):
 
     @property
     def json(self):
-        if not hasattr(self, '_json'):
+        if self._json is None:
             if isinstance(self.http_content, bytearray):
                 self.http_content = self.http_content.decode()
             if self.http_content and self.http_content.lstrip()[0] in '[{':
                 try:
-                    self._json = json.loads(self.http_content)
+                    self._json = codec.loads(self.http_content)
                 except Exception:
                     raise Exception('Unable to parse json content')
             elif len(self.http_query) > 0:
@@ -296,4 +527,4 @@ def _callback_error(request, fn, rc, message, on_error):
     else:
         log.debug('request.callback cid=%s, default error', request.id)
         log.warning('cid=%s, error: %s', request.id, message)
-        request.respond(500)
+        request.respond(504 if is_expired(request.deadline) else 500)
@@ -0,0 +1,169 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+Route table compiled from an ordered list of regex patterns
+'''
+import re
+import sys
+
+import logging
+log = logging.getLogger(__name__)
+
+
+META = set('.^$*+?{}[]|()\\')
+QUANTIFIER = set('*+?{')
+EXACT = ('$', '\\Z')  # end of pattern anchors
+NOT_COMBINABLE = re.compile(r'\(\?[^:=!<]|\(\?<[^=!]|\\[1-9]')
+
+
+def literal_prefix(pattern):
+    ''' the literal text that a pattern's match must start with
+
+        returns (prefix, is_exact); is_exact is True if the pattern
+        matches only the prefix itself (for instance, '/foo/bar$').
+    '''
+    if '|' in pattern:  # alternation: no common prefix
+        return '', False
+    chars = []
+    i = 1 if pattern.startswith('^') else 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            escaped = pattern[i + 1:i + 2]
+            if not escaped or escaped.isalnum() or escaped == '_':
+                break  # a class (\d), anchor (\Z) or back reference
+            chars.append(escaped)
+            i += 2
+        elif c in META:
+            break
+        else:
+            chars.append(c)
+            i += 1
+    rest = pattern[i:]
+    if rest[:1] in QUANTIFIER:  # the last character is optional/repeated
+        return ''.join(chars[:-1]), False
+    return ''.join(chars), rest in EXACT
+
+
+class Router(object):
+
+    def __init__(self, routes):
+        """Find the first of an ordered list of patterns that matches.
+
+           Required Arguments:
+               routes - list of (pattern, value) tuples, in priority order
+
+           Notes:
+
+               1. A pattern is a regex string which is matched at the start
+                  of a resource (re.match). The match method returns the
+                  value and the regex groups of the first pattern that
+                  matches, or None.
+
+               2. A pattern which is a literal string anchored with $ is
+                  found with a dict lookup.
+
+               3. The other patterns are placed in a trie of path segments
+                  by their literal prefix (for instance, '/item/(\\d+)$' is
+                  under 'item'). Only the patterns along the resource's path
+                  are tried. The patterns at each trie node are combined
+                  into one regex, an alternation of named groups, so that
+                  a single regex call finds the first one that matches.
+
+               4. The result of the first match wins, regardless of how it is
+                  found, just as if each pattern was tried in order.
+        """
+        self._exact = {}  # literal: (index, value)
+        self._trie = RouterNode()
+        for index, (pattern, value) in enumerate(routes):
+            re.compile(pattern)  # fail here, if it's going to
+            prefix, is_exact = literal_prefix(pattern)
+            if is_exact:
+                self._exact.setdefault(prefix, (index, value))
+                continue
+            node = self._trie
+            for segment in prefix.split('/')[:-1]:  # complete segments
+                node = node.children.setdefault(segment, RouterNode())
+            node.routes.append((index, pattern, value))
+        self._trie.compile()
+
+    def match(self, resource):
+        ''' return (value, groups) of the first matching pattern, or None '''
+        best = self._exact.get(resource)
+        if best is None:
+            index, result = sys.maxsize, None
+        else:
+            index, result = best[0], (best[1], ())
+
+        node = self._trie
+        segments = resource.split('/')
+        last = len(segments) - 1
+        depth = 0
+        while True:
+            for first, regex, names in node.units:
+                if first > index:
+                    break
+                m = regex.match(resource)
+                if m is None:
+                    continue
+                if names is None:  # a single pattern
+                    result, index = (node.values[first], m.groups()), first
+                else:
+                    route, start, count = names[m.lastgroup]
+                    if route < index:
+                        groups = m.groups()[start:start + count]
+                        result, index = (node.values[route], groups), route
+                break
+            if depth == last:
+                break
+            node = node.children.get(segments[depth])
+            if node is None:
+                break
+            depth += 1
+        return result
+
+
+class RouterNode(object):
+    ''' patterns that share a literal prefix (of complete path segments) '''
+
+    def __init__(self):
+        self.children = {}
+        self.routes = []  # (index, pattern, value)
+        self.units = []  # (first index, regex, names or None)
+        self.values = {}  # index: value
+
+    def compile(self):
+        ''' combine consecutive combinable patterns into one regex '''
+        run = []
+        for index, pattern, value in self.routes:
+            self.values[index] = value
+            if NOT_COMBINABLE.search(pattern):
+                self._unit(run)
+                run = []
+                self.units.append((index, re.compile(pattern), None))
+            else:
+                run.append((index, pattern))
+        self._unit(run)
+        self.routes = None
+        for child in self.children.values():
+            child.compile()
+
+    def _unit(self, run):
+        if not run:
+            return
+        if len(run) == 1:
+            index, pattern = run[0]
+            self.units.append((index, re.compile(pattern), None))
+            return
+        names = {}
+        parts = []
+        group = 0
+        for index, pattern in run:
+            name = 'r%d' % index
+            count = re.compile(pattern).groups
+            names[name] = (index, group + 1, count)  # groups after the name
+            group += 1 + count
+            parts.append('(?P<%s>%s)' % (name, pattern))
+        self.units.append((run[0][0], re.compile('|'.join(parts)), names))
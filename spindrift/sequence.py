@@ -1,6 +1,9 @@
+import inspect
 from itertools import chain
 import logging
 
+from spindrift.deadline import TIMEOUT, is_expired
+
 
 log = logging.getLogger(__name__)
 
@@ -42,6 +45,9 @@ class Step:
                    used to lookup the previous Step's result by Step name (see
                    Note 2) and passed to the current Step as a keyword
                    argument.
+
+                4. If fn has a parameter named "deadline", it is passed the
+                   sequence's deadline (unless it is in kwargs).
         """
         if include:
             include = include if isinstance(include, (tuple, list)) \
@@ -53,6 +59,12 @@ class Step:
         self.include = include or list()
         self.args = args or list()
         self.kwargs = kwargs or dict()
+        try:
+            parameters = inspect.signature(fn).parameters
+        except (TypeError, ValueError):
+            parameters = ()
+        self.is_deadline = 'deadline' in parameters and \
+            'deadline' not in self.kwargs
 
     @property
     def label(self):
@@ -60,10 +72,12 @@ class Step:
             return 'Step<fn=%s name=%s>' % (self.fn.__name__, self.name)
         return 'Step<fn=%s>' % self.fn.__name__
 
-    def __call__(self, callback, results):
+    def __call__(self, callback, results, deadline=None):
         log.debug('step.call %s' % self.label)
         for key in self.include:
             self.kwargs[key] = results[key]
+        if self.is_deadline:
+            self.kwargs['deadline'] = deadline
         self.fn(callback, *self.args, **self.kwargs)
 
 
@@ -77,7 +91,8 @@ def flatten(items):
     )
 
 
-def sequence(callback, *steps, on_complete=None, on_failure=None):
+def sequence(callback, *steps, on_complete=None, on_failure=None,
+             deadline=None):
     """Execute a series of Step instances
 
         Parameters:
@@ -85,6 +100,7 @@ def sequence(callback, *steps, on_complete=None, on_failure=None):
             steps - any number of Step instances
             on_complete - a function to run at the end of the sequence (2)
             on_failure - a function to run if a failure occurs (3)
+            deadline - spindrift.deadline value (4)
 
         Notes:
             1. The callback is invoked with two arguments when the function is
@@ -109,6 +125,13 @@ def sequence(callback, *steps, on_complete=None, on_failure=None):
                the specified callback function is invoked. The result passed
                to the callback function will be used as the error result
                passed to the sequence callback.
+
+            4. If the deadline passes, the remaining steps are not run, and
+               the sequence fails (on_failure still runs) with the error
+               result spindrift.deadline.TIMEOUT. The deadline is passed to
+               steps which accept it (see Step). When a sequence is started
+               by request.call or Task.call, the deadline is provided
+               automatically.
     """
 
     steps = flatten(steps)
@@ -142,8 +165,11 @@ def sequence(callback, *steps, on_complete=None, on_failure=None):
 
     def next_step():
         step = steps[0]
+        if is_expired(deadline):
+            log.warning('deadline passed before %s' % step.label)
+            return fail(TIMEOUT)
         try:
-            step(on_step, results)
+            step(on_step, results, deadline)
         except Exception:
             log.exception('failure running step: %s' % step.label)
             return fail('step exception during sequence')
@@ -152,7 +178,7 @@ def sequence(callback, *steps, on_complete=None, on_failure=None):
     return context
 
 
-def transaction(callback, cursor, *steps, on_complete=None):
+def transaction(callback, cursor, *steps, on_complete=None, deadline=None):
 
     for step in steps:
         step.kwargs['cursor'] = cursor
@@ -171,4 +197,5 @@ def transaction(callback, cursor, *steps, on_complete=None):
         Step(cursor.commit),
         on_complete=on_complete,
         on_failure=failure,
+        deadline=deadline,
     )
@@ -0,0 +1,129 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+'''
+from spindrift.network import DatagramHandler
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Statsd(object):
+    ''' Batched statsd client
+
+        Metrics are aggregated in memory and flushed to a statsd server on a
+        Timer, so recording a metric in a handler is a dict update and never
+        touches the network.
+
+        Usage:
+
+            stats = Statsd(network, timer, 'localhost', 8125, prefix='myapp')
+
+            stats.incr('request')
+            stats.timing('request.time', 12.5)
+            stats.gauge('connections', 10)
+
+        Parameters:
+            network  - instance of spindrift.network.Network
+            timer    - instance of spindrift.timer.Timer
+            host     - statsd host (default=localhost)
+            port     - statsd port (default=8125)
+            prefix   - optional prefix added to every metric name
+            interval - flush interval in ms (default=1000)
+            max_packet - maximum datagram size in bytes (default=1432, which
+                       fits in a standard ethernet mtu)
+
+        Notes:
+
+            1. Counters are summed and gauges are last-value-wins for each
+               interval; each timing value is sent, since statsd computes the
+               percentiles itself.
+
+            2. Metric lines are packed, newline delimited, into as few
+               datagrams as max_packet allows.
+
+            3. Call flush directly to send immediately (for instance, at
+               shutdown).
+    '''
+
+    def __init__(self, network, timer, host='localhost', port=8125,
+                 prefix=None, interval=1000, max_packet=1432):
+        self.prefix = prefix + '.' if prefix else ''
+        self.max_packet = max_packet
+        self._counters = {}
+        self._timers = {}
+        self._gauges = {}
+        self._handler = network.add_datagram(host, port, DatagramHandler)
+        self._timer = timer.add(self._on_timer, interval).start()
+
+    def incr(self, name, count=1):
+        counters = self._counters
+        counters[name] = counters.get(name, 0) + count
+
+    def decr(self, name, count=1):
+        self.incr(name, -count)
+
+    def timing(self, name, ms):
+        try:
+            self._timers[name].append(ms)
+        except KeyError:
+            self._timers[name] = [ms]
+
+    def gauge(self, name, value):
+        self._gauges[name] = value
+
+    def close(self):
+        self._timer.cancel()
+        self.flush()
+        self._handler.close('statsd close')
+
+    def flush(self):
+        lines = self._lines()
+        if lines:
+            for packet in pack(lines, self.max_packet):
+                self._handler.sendto(packet)
+
+    def _on_timer(self):
+        try:
+            self.flush()
+        finally:
+            self._timer.start()
+
+    def _lines(self):
+        prefix = self.prefix
+        lines = []
+        if self._counters:
+            counters, self._counters = self._counters, {}
+            lines.extend('%s%s:%s|c' % (prefix, name, value)
+                         for name, value in counters.items())
+        if self._timers:
+            timers, self._timers = self._timers, {}
+            for name, values in timers.items():
+                lines.extend('%s%s:%s|ms' % (prefix, name, value)
+                             for value in values)
+        if self._gauges:
+            gauges, self._gauges = self._gauges, {}
+            lines.extend('%s%s:%s|g' % (prefix, name, value)
+                         for name, value in gauges.items())
+        return [line.encode('utf-8') for line in lines]
+
+
+def pack(lines, max_packet):
+    ''' join lines into newline-delimited packets of at most max_packet bytes
+
+        A line longer than max_packet is sent in a packet of its own.
+    '''
+    packet = []
+    size = 0
+    for line in lines:
+        length = len(line) + 1 if packet else len(line)
+        if packet and size + length > max_packet:
+            yield b'\n'.join(packet)
+            packet = []
+            size = 0
+            length = len(line)
+        packet.append(line)
+        size += length
+    if packet:
+        yield b'\n'.join(packet)
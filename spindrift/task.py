@@ -6,16 +6,19 @@ https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
 import inspect
 import logging
 
+from spindrift.deadline import TIMEOUT, is_expired
+
 
 log = logging.getLogger(__name__)
 
 
 class Task(object):
 
-    def __init__(self, callback, cid=None, cursor=None):
+    def __init__(self, callback, cid=None, cursor=None, deadline=None):
         self._callback = callback
         self.cid = cid
         self.cursor = cursor
+        self.deadline = deadline
         self.is_done = True
         self._cleanup = []
 
@@ -53,12 +56,21 @@ class Task(object):
         if kwargs is None:
             kwargs = {}
 
-        task, cursor = inspect_parameters(fn, kwargs)
+        if is_expired(self.deadline):
+            log.warning('task.call, cid=%s, deadline passed before fn=%s',
+                        self.cid, fn)
+            cb(1, TIMEOUT)
+            return self
+
+        task, cursor, deadline = inspect_parameters(fn, kwargs)
 
         if task:
-            cb = Task(cb, self.cid, self.cursor)
-        elif cursor:
-            kwargs['cursor'] = getattr(self, 'cursor')
+            cb = Task(cb, self.cid, self.cursor, self.deadline)
+        else:
+            if cursor:
+                kwargs['cursor'] = getattr(self, 'cursor')
+            if deadline:
+                kwargs['deadline'] = self.deadline
 
         log.debug('task.call fn=%s %s', fn, 'as task' if task else '')
         fn(cb, *args, **kwargs)
@@ -66,9 +78,17 @@ class Task(object):
 
 
 def inspect_parameters(fn, kwargs):
+    """ return (task, cursor, deadline) flags for calling fn
+
+        task is True if fn's first parameter is named 'task' (fn gets a
+        Task, which carries the cursor and deadline); otherwise cursor and
+        deadline are True if fn has a parameter of that name which is not
+        already in kwargs.
+    """
 
     task = False
     cursor = False
+    deadline = False
 
     parameters = inspect.signature(fn).parameters
     parameter_names = [p.name for p in parameters.values()]
@@ -78,8 +98,10 @@ def inspect_parameters(fn, kwargs):
     else:
         if 'cursor' in parameters and 'cursor' not in kwargs:
             cursor = True
+        if 'deadline' in parameters and 'deadline' not in kwargs:
+            deadline = True
 
-    return task, cursor
+    return task, cursor, deadline
 
 
 def _callback(task, fn, result, on_success, on_none_return, on_none):
@@ -0,0 +1,329 @@
+'''
+The MIT License (MIT)
+
+https://github.com/robertchase/spindrift/blob/master/LICENSE.txt
+
+WebSocket protocol, server side (RFC 6455)
+'''
+import base64
+import hashlib
+import struct
+
+import logging
+log = logging.getLogger(__name__)
+
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# opcodes
+CONTINUATION = 0x0
+TEXT = 0x1
+BINARY = 0x2
+CLOSE = 0x8
+PING = 0x9
+PONG = 0xA
+
+# close codes
+NORMAL = 1000
+GOING_AWAY = 1001
+PROTOCOL_ERROR = 1002
+UNSUPPORTED_DATA = 1003
+NO_STATUS = 1005
+ABNORMAL = 1006
+INVALID_DATA = 1007
+POLICY_VIOLATION = 1008
+MESSAGE_TOO_BIG = 1009
+INTERNAL_ERROR = 1011
+
+
+def accept_key(key):
+    ''' the Sec-WebSocket-Accept value for a Sec-WebSocket-Key '''
+    digest = hashlib.sha1((key + GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def is_upgrade(headers):
+    ''' True if request headers ask for a (version 13) websocket '''
+    return headers.get('upgrade', '').lower() == 'websocket' and \
+        'upgrade' in headers.get('connection', '').lower() and \
+        bool(headers.get('sec-websocket-key')) and \
+        headers.get('sec-websocket-version') == '13'
+
+
+def mask(data, key):
+    ''' xor data with a 4 byte key (masking and unmasking are the same) '''
+    length = len(data)
+    if not length:
+        return b''
+    key = (key * (length // 4 + 1))[:length]
+    return (int.from_bytes(data, 'little') ^
+            int.from_bytes(key, 'little')).to_bytes(length, 'little')
+
+
+def encode_frame(opcode, payload=b'', fin=True, key=None):
+    ''' the bytes of a frame; key (4 bytes) masks it, as a client must '''
+    first = opcode | 0x80 if fin else opcode
+    masked = 0x80 if key is not None else 0
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('>BB', first, masked | length)
+    elif length < 65536:
+        header = struct.pack('>BBH', first, masked | 126, length)
+    else:
+        header = struct.pack('>BBQ', first, masked | 127, length)
+    if key is not None:
+        return header + key + mask(payload, key)
+    return header + payload
+
+
+def encode_message(message):
+    ''' the frame for a message: str is sent as text, bytes as binary '''
+    if isinstance(message, str):
+        return encode_frame(TEXT, message.encode('utf-8'))
+    return encode_frame(BINARY, bytes(message))
+
+
+def broadcast(websockets, message):
+    ''' send message to each open WebSocket, encoding it only once
+
+        returns the number of WebSockets that the message was sent to
+    '''
+    frame = encode_message(message)
+    count = 0
+    for websocket in websockets:
+        if websocket.is_open:
+            websocket.send_frame(frame)
+            count += 1
+    return count
+
+
+class WebSocket(object):
+
+    def __init__(self, handler, on_message=None, on_close=None,
+                 max_message_size=1024 * 1024, on_end=None):
+        """One end of a WebSocket connection.
+
+           Returned by HTTPHandler.http_websocket, which completes the
+           upgrade handshake; the handler's data is then handed to this
+           object instead of the http parser.
+
+           Optional Arguments:
+               on_message - callable, called with (websocket, message) for
+                            each complete message: str for a text message,
+                            bytes for a binary message
+               on_close - callable, called with (websocket, code, reason)
+                          when the websocket closes; code is ABNORMAL if
+                          the connection closed without a close frame
+               max_message_size - the largest message (after reassembly of
+                                  fragments) that is accepted; a larger one
+                                  closes the websocket with MESSAGE_TOO_BIG
+               on_end - callable, without arguments, called when the
+                        websocket closes (after on_close)
+
+           Notes:
+
+               1. on_message and on_close can also be assigned later. They
+                  are arguments so that messages which arrive right behind
+                  the upgrade request are not missed.
+
+               2. Pings are answered automatically.
+
+               3. To send one message to many websockets, use broadcast,
+                  which encodes the frame once.
+
+               4. If messages are sent faster than the peer reads them,
+                  they accumulate in the handler's send buffer; is_blocked
+                  is True while there is data in the buffer.
+        """
+        self.handler = handler
+        self.on_message = on_message
+        self.on_close = on_close
+        self.max_message_size = max_message_size
+        self.is_open = True  # messages can be sent
+        self.close_code = None
+        self.close_reason = None
+        self._on_end = on_end
+        self._data = bytearray()
+        self._fragments = None  # parts of a fragmented message
+        self._fragment_opcode = None
+        self._fragment_size = 0
+        self._is_close_sent = False
+        self._is_close_received = False
+        self._close_on_send_complete = False
+
+    @property
+    def id(self):
+        return self.handler.id
+
+    @property
+    def is_blocked(self):
+        return self.handler._is_sending
+
+    def send_message(self, message):
+        ''' send a str (as text) or bytes (as binary) message '''
+        if not self.is_open:
+            log.warning('cid=%s: websocket message after close', self.id)
+            return
+        self.handler.send(encode_message(message))
+
+    def send_frame(self, frame):
+        ''' send an already encoded frame (see encode_message) '''
+        if self.is_open:
+            self.handler.send(frame)
+
+    def ping(self, payload=b''):
+        if self.is_open:
+            self.handler.send(encode_frame(PING, payload))
+
+    def close(self, code=NORMAL, reason=''):
+        ''' start the closing handshake '''
+        if self._is_close_sent or self.handler.is_closed:
+            return
+        self._send_close(code, reason)
+
+    def _send_close(self, code, reason):
+        self.is_open = False
+        self._is_close_sent = True
+        payload = b''
+        if code != NO_STATUS:
+            payload = struct.pack('>H', code) + reason.encode('utf-8')[:123]
+        self.handler.send(encode_frame(CLOSE, payload))
+
+    def on_send_complete(self):
+        handler = self.handler
+        if self._close_on_send_complete:
+            handler.close('websocket closed')
+        elif handler.is_quiesced:  # the upgrade response has been sent
+            handler.unquiesce()
+            if not handler._http_is_parsing:  # else, when parsing is done
+                self.on_data(b'')
+
+    def on_data(self, data):
+        buf = self._data
+        buf += data
+        offset = 0
+        try:
+            while not self._is_close_received and self.handler.is_open:
+                available = len(buf) - offset
+                if available < 2:
+                    break
+                first, second = buf[offset], buf[offset + 1]
+                length = second & 0x7f
+                start = offset + 2
+                if length == 126:
+                    if available < 4:
+                        break
+                    length = struct.unpack_from('>H', buf, start)[0]
+                    start += 2
+                elif length == 127:
+                    if available < 10:
+                        break
+                    length = struct.unpack_from('>Q', buf, start)[0]
+                    start += 8
+                if not second & 0x80:
+                    return self._fail(PROTOCOL_ERROR, 'unmasked frame')
+                if first & 0x70:
+                    return self._fail(PROTOCOL_ERROR, 'reserved bits set')
+                if length > self.max_message_size:
+                    return self._fail(MESSAGE_TOO_BIG, 'message too big')
+                end = start + 4 + length
+                if end > len(buf):
+                    break
+                payload = mask(buf[start + 4:end], bytes(buf[start:start + 4]))
+                offset = end
+                self._on_frame(first & 0x80, first & 0x0f, payload)
+        finally:
+            del buf[:offset]
+
+    def _on_frame(self, fin, opcode, payload):
+        if opcode >= CLOSE:
+            if not fin or len(payload) > 125:
+                return self._fail(PROTOCOL_ERROR, 'invalid control frame')
+            if opcode == CLOSE:
+                self._on_close_frame(payload)
+            elif opcode == PING:
+                if not self._is_close_sent:
+                    self.handler.send(encode_frame(PONG, payload))
+            elif opcode != PONG:
+                self._fail(PROTOCOL_ERROR, 'reserved opcode')
+            return
+
+        if opcode == CONTINUATION:
+            if self._fragments is None:
+                return self._fail(PROTOCOL_ERROR, 'unexpected continuation')
+        elif opcode == TEXT or opcode == BINARY:
+            if self._fragments is not None:
+                return self._fail(PROTOCOL_ERROR, 'expected continuation')
+            if fin:
+                return self._on_message(opcode, payload)
+            self._fragments = []
+            self._fragment_opcode = opcode
+            self._fragment_size = 0
+        else:
+            return self._fail(PROTOCOL_ERROR, 'reserved opcode')
+
+        self._fragments.append(payload)
+        self._fragment_size += len(payload)
+        if self._fragment_size > self.max_message_size:
+            return self._fail(MESSAGE_TOO_BIG, 'message too big')
+        if fin:
+            fragments, self._fragments = self._fragments, None
+            self._on_message(self._fragment_opcode, b''.join(fragments))
+
+    def _on_message(self, opcode, payload):
+        if opcode == TEXT:
+            try:
+                payload = payload.decode('utf-8')
+            except UnicodeDecodeError:
+                return self._fail(INVALID_DATA, 'invalid utf-8')
+        if self.on_message is not None and not self._is_close_sent:
+            self.on_message(self, payload)
+
+    def _on_close_frame(self, payload):
+        self._is_close_received = True
+        if len(payload) == 1:
+            return self._fail(PROTOCOL_ERROR, 'invalid close frame')
+        code, reason = NO_STATUS, ''
+        if payload:
+            code = struct.unpack_from('>H', payload)[0]
+            if not (1000 <= code <= 1011 and code not in (1004, 1005, 1006)
+                    or 3000 <= code <= 4999):
+                return self._fail(PROTOCOL_ERROR, 'invalid close code')
+            try:
+                reason = payload[2:].decode('utf-8')
+            except UnicodeDecodeError:
+                return self._fail(INVALID_DATA, 'invalid utf-8')
+        self._closed(code, reason)
+        self._close_on_send_complete = True  # the server closes tcp first
+        if self._is_close_sent:
+            self.handler.close('websocket closed')
+        else:
+            self._send_close(code, '')
+
+    def _fail(self, code, reason):
+        ''' close the websocket because of a protocol problem '''
+        log.warning('cid=%s: websocket error: %s', self.id, reason)
+        self._is_close_received = True  # stop reading
+        self._closed(code, reason)
+        self._close_on_send_complete = True
+        if self._is_close_sent:
+            self.handler.close('websocket error')
+        else:
+            self._send_close(code, reason)
+        return False
+
+    def _closed(self, code, reason):
+        ''' the websocket is done: call on_close and on_end, once '''
+        if self.close_code is not None:
+            return
+        self.is_open = False
+        self.close_code = code
+        self.close_reason = reason
+        if self.on_close is not None:
+            self.on_close(self, code, reason)
+        on_end, self._on_end = self._on_end, None
+        if on_end is not None:
+            on_end()
+
+    def _on_handler_close(self):
+        self._closed(ABNORMAL, '')
@@ -0,0 +1,259 @@
+import gzip
+import time
+
+import pytest
+
+import spindrift.compress as compress
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.rest.cache as cache
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.mapper as rest_mapper
+
+
+PORT = 12359
+CALLS = []
+DELAYED = []
+
+
+def item(request, id):
+    CALLS.append((id, request.http_query_string))
+    return {'id': id, 'count': len(CALLS), 'pad': 'x' * 2000}
+
+
+def later(request, id):
+    CALLS.append(id)
+    DELAYED.append(request)
+    request.delay()
+
+
+def cookie(request, id):
+    CALLS.append(id)
+    request.respond(200, {'id': id}, {'Set-Cookie': 'n=%d' % len(CALLS)})
+
+
+def update(request, id):
+    return {'removed': request.invalidate()}
+
+
+class Context(rest_handler.RESTContext):
+
+    def __init__(self, cache, compression=None):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/item/(\\d+)$', dict(
+            get=rest_mapper.RESTMethod(
+                item, [rest_mapper.RESTArg(int)], cache=cache),
+            put=rest_mapper.RESTMethod(update, [rest_mapper.RESTArg(int)]),
+        ))
+        mapper.add('/later/(\\d+)$', dict(get=rest_mapper.RESTMethod(
+            later, [rest_mapper.RESTArg(int)], cache=cache)))
+        mapper.add('/both/(\\d+)$', dict(
+            get=rest_mapper.RESTMethod(
+                item, [rest_mapper.RESTArg(int)], cache=cache),
+            post=rest_mapper.RESTMethod(
+                item, [rest_mapper.RESTArg(int)], cache=cache),
+        ))
+        mapper.add('/cookie/(\\d+)$', dict(get=rest_mapper.RESTMethod(
+            cookie, [rest_mapper.RESTArg(int)], cache=cache)))
+        super(Context, self).__init__(mapper, compression)
+
+
+class Client(network.Handler):
+
+    def on_init(self):
+        self.received = b''
+
+    def on_ready(self):
+        self.send(self.context)
+
+    def on_data(self, data):
+        self.received += data
+
+    @property
+    def content(self):
+        return self.received.split(b'\r\n\r\n', 1)[1]
+
+
+class Server(object):
+
+    def __init__(self, compression=None, **kwargs):
+        CALLS.clear()
+        DELAYED.clear()
+        self.cache = cache.Cache(**kwargs)
+        self.network = memory.MemoryNetwork()
+        self.network.add_server(PORT, rest_handler.RESTHandler,
+                                context=Context(self.cache, compression))
+
+    def request(self, resource, headers=b'', method=b'GET'):
+        c = self.network.add_connection('localhost', PORT, Client, context=(
+            b'%s %s HTTP/1.1\r\n%s\r\n' % (method, resource, headers)))
+        self.service()
+        return c
+
+    def service(self):
+        for _ in range(3):
+            self.network.service()
+
+    def close(self):
+        self.network.close()
+
+
+@pytest.fixture
+def server():
+    s = Server(ttl=10)
+    yield s
+    s.close()
+
+
+def test_cache(server):
+    a = server.request(b'/item/1')
+    b = server.request(b'/item/1')
+    assert len(CALLS) == 1
+    assert b.received.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert b'\r\nContent-Type: application/json; charset=utf-8\r\n' in \
+        b.received
+    assert b'\r\nDate: ' in b.received
+    assert b.content == a.content
+    assert (server.cache.hit, server.cache.miss) == (1, 1)
+
+
+def test_key():
+    server = Server(ttl=10, headers=('Authorization',))
+    server.request(b'/item/1')
+    server.request(b'/item/1?a=1')
+    server.request(b'/item/1?a=1')
+    server.request(b'/item/2')
+    server.request(b'/item/1', b'Authorization: a\r\n')
+    server.request(b'/item/1', b'authorization: a\r\n')
+    assert CALLS == [(1, ''), (1, 'a=1'), (2, ''), (1, '')]
+    assert len(server.cache) == 4
+    server.close()
+
+
+def test_method(server):
+    server.request(b'/both/1', method=b'POST')
+    server.request(b'/both/1')
+    server.request(b'/both/1')
+    assert len(CALLS) == 2
+    assert len(server.cache) == 2
+    assert server.cache.invalidate('/both/1') == 2
+
+
+def test_set_cookie(server):
+    a = server.request(b'/cookie/1')
+    b = server.request(b'/cookie/1')
+    assert CALLS == [1, 1]
+    assert b'\r\nSet-Cookie: n=1\r\n' in a.received
+    assert b'\r\nSet-Cookie: n=2\r\n' in b.received
+    assert len(server.cache) == 0
+
+
+@pytest.mark.parametrize('headers, expect', (
+    (None, True),
+    ({'Content-Type': 'text/plain'}, True),
+    ({'Cache-Control': 'max-age=60'}, True),
+    ({'set-cookie': 'a=1'}, False),
+    ({'Cache-Control': 'private, max-age=60'}, False),
+    ({'cache-control': 'No-Store'}, False),
+))
+def test_is_shared(headers, expect):
+    assert cache.Cache.is_shared(headers) is expect
+
+
+def test_ttl():
+    server = Server(ttl=0)
+    server.request(b'/item/1')
+    server.request(b'/item/1')
+    assert len(CALLS) == 2
+    server.close()
+
+
+def test_not_ok(server):
+    server.request(b'/item/1?x=1', method=b'PUT')
+    server.request(b'/item/x')  # 404
+    assert len(server.cache) == 0
+
+
+def test_invalidate(server):
+    server.request(b'/item/1')
+    server.request(b'/item/1?a=1')
+    server.request(b'/item/2')
+    c = server.request(b'/item/1', method=b'PUT')
+    assert c.content == b'{"removed":2}'
+    server.request(b'/item/1')
+    server.request(b'/item/2')
+    assert len(CALLS) == 4
+    assert server.cache.invalidate() == 2
+    assert server.cache._bytes == 0
+
+
+def test_stale():
+    server = Server(ttl=0, stale=10)
+    server.request(b'/later/1')
+    DELAYED[0].respond('first')
+    server.service()
+    b = server.request(b'/later/1')  # refreshes
+    c = server.request(b'/later/1')
+    assert len(CALLS) == 2
+    assert c.content == b'first'
+    assert server.cache.stale_hit == 1
+    DELAYED[1].respond(500)  # the refresh failed
+    server.service()
+    assert b.received.startswith(b'HTTP/1.1 500 ')
+    d = server.request(b'/later/1')  # tries again
+    assert len(CALLS) == 3
+    DELAYED[2].respond('second')
+    server.service()
+    assert d.content == b'second'
+    server.request(b'/later/1')  # refreshes
+    assert server.request(b'/later/1').content == b'second'
+    assert len(CALLS) == 4
+    server.close()
+
+
+def test_expired():
+    server = Server(ttl=0, stale=.001)
+    server.request(b'/item/1')
+    time.sleep(.002)
+    server.request(b'/item/1')
+    assert len(CALLS) == 2
+    assert server.cache.stale_hit == 0
+    server.close()
+
+
+def test_max_bytes():
+    server = Server(ttl=10, max_bytes=12000)
+    for n in range(1, 6):
+        server.request(b'/item/%d' % n)
+    assert len(server.cache) == 5
+    assert server.cache._bytes <= 12000
+    server.request(b'/item/1')  # least recently used is now 2
+    server.request(b'/item/6')
+    assert len(CALLS) == 6
+    server.request(b'/item/1')
+    assert len(CALLS) == 6
+    server.request(b'/item/2')
+    assert len(CALLS) == 7
+    server.close()
+
+
+def test_too_big():
+    server = Server(ttl=10, max_bytes=4000)
+    server.request(b'/item/1')
+    assert len(server.cache) == 0
+    server.close()
+
+
+def test_compress():
+    server = Server(compress.Compression(min_size=100), ttl=10)
+    gzipped = b'Accept-Encoding: gzip\r\n'
+    a = server.request(b'/item/1', gzipped)
+    b = server.request(b'/item/1', gzipped)
+    c = server.request(b'/item/1')
+    assert len(CALLS) == 2
+    assert b'\r\nContent-Encoding: gzip\r\n' in b.received
+    assert b.content == a.content
+    assert gzip.decompress(b.content).startswith(b'{"id":1,"count":1,')
+    assert b'Content-Encoding' not in c.received
+    assert c.content.startswith(b'{"id":1,"count":2,')
+    server.close()
@@ -0,0 +1,168 @@
+import time
+
+import pytest
+
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.rest.coalesce as coalesce
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.mapper as rest_mapper
+from spindrift.timer import Timer
+
+
+PORT = 12358
+DELAYED = []
+
+
+def item(request, id):
+    DELAYED.append(request)
+    request.delay()
+
+
+class Context(rest_handler.RESTContext):
+
+    def __init__(self, coalesce, timer=None):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/item/(\\d+)$', dict(get=rest_mapper.RESTMethod(
+            item, [rest_mapper.RESTArg(int)], coalesce=coalesce)))
+        super(Context, self).__init__(mapper, timer=timer)
+
+
+class Client(network.Handler):
+
+    def on_init(self):
+        self.received = b''
+
+    def on_ready(self):
+        self.send(self.context)
+
+    def on_data(self, data):
+        self.received += data
+
+
+class Server(object):
+
+    def __init__(self, headers=(), wait=1.0, timer=None):
+        DELAYED.clear()
+        self.coalesce = coalesce.Coalesce(headers, wait)
+        self.network = memory.MemoryNetwork()
+        self.network.add_server(PORT, rest_handler.RESTHandler,
+                                context=Context(self.coalesce, timer))
+
+    def request(self, resource, headers=b''):
+        c = self.network.add_connection('localhost', PORT, Client, context=(
+            b'GET %s HTTP/1.1\r\n%s\r\n' % (resource, headers)))
+        self.service()
+        return c
+
+    def service(self):
+        for _ in range(3):
+            self.network.service()
+
+    def close(self):
+        self.network.close()
+
+
+@pytest.fixture
+def server():
+    s = Server()
+    yield s
+    s.close()
+
+
+def test_coalesce(server):
+    clients = [server.request(b'/item/1') for _ in range(3)]
+    other = server.request(b'/item/2')
+    query = server.request(b'/item/1?a=1')
+    assert len(DELAYED) == 3  # /item/1, /item/2, /item/1?a=1
+    assert server.coalesce.hit == 2
+    DELAYED[0].respond({'id': 1})
+    server.service()
+    for c in clients:
+        assert c.received.startswith(b'HTTP/1.1 200 OK\r\n')
+        assert c.received.endswith(b'{"id":1}')
+    assert other.received == b''
+    assert query.received == b''
+    assert len(server.coalesce._flights) == 2  # /item/1 landed
+
+
+def test_again(server):
+    a = server.request(b'/item/1')
+    DELAYED[0].respond('first')
+    server.service()
+    b = server.request(b'/item/1')
+    assert len(DELAYED) == 2  # the first flight landed
+    DELAYED[1].respond('second')
+    server.service()
+    assert a.received.endswith(b'first')
+    assert b.received.endswith(b'second')
+
+
+def test_headers():
+    server = Server(headers=('Authorization',))
+    a = server.request(b'/item/1', b'Authorization: a\r\n')
+    b = server.request(b'/item/1', b'Authorization: b\r\n')
+    c = server.request(b'/item/1', b'authorization: a\r\n')
+    assert len(DELAYED) == 2
+    DELAYED[0].respond('a')
+    DELAYED[1].respond('b')
+    server.service()
+    assert a.received.endswith(b'a')
+    assert b.received.endswith(b'b')
+    assert c.received.endswith(b'a')
+    server.close()
+
+
+def test_leader_error(server):
+    a = server.request(b'/item/1')
+    b = server.request(b'/item/1')
+    c = server.request(b'/item/1')
+    DELAYED[0].respond(500)
+    server.service()
+    assert a.received.startswith(b'HTTP/1.1 500 ')
+    assert len(DELAYED) == 2  # b is the leader now
+    assert c.received == b''
+    DELAYED[1].respond('ok')
+    server.service()
+    assert b.received.endswith(b'ok')
+    assert c.received.endswith(b'ok')
+
+
+def test_wait():
+    timer = Timer()
+    server = Server(wait=.01, timer=timer)
+    a = server.request(b'/item/1')
+    b = server.request(b'/item/1')
+    time.sleep(.02)
+    timer.service()
+    server.service()
+    assert b.received.startswith(b'HTTP/1.1 504 Gateway Timeout\r\n')
+    assert server.coalesce._flights == {}  # the flight ended
+    c = server.request(b'/item/1')  # the leader is too old to follow
+    d = server.request(b'/item/1')  # follows c
+    assert len(DELAYED) == 2
+    DELAYED[0].respond('a')
+    DELAYED[1].respond('c')
+    server.service()
+    assert a.received.endswith(b'a')
+    assert c.received.endswith(b'c')
+    assert d.received.endswith(b'c')
+    server.close()
+
+
+def test_wait_no_timer():
+    server = Server(wait=.01)
+    a = server.request(b'/item/1')
+    b = server.request(b'/item/1')
+    time.sleep(.02)
+    assert b.received == b''
+    c = server.request(b'/item/1')  # expires the flight, and leads
+    server.service()
+    assert b.received.startswith(b'HTTP/1.1 504 Gateway Timeout\r\n')
+    assert len(DELAYED) == 2
+    DELAYED[0].respond('a')
+    DELAYED[1].respond('c')
+    server.service()
+    assert a.received.endswith(b'a')
+    assert c.received.endswith(b'c')
+    server.close()
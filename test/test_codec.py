@@ -0,0 +1,74 @@
+import datetime
+import decimal
+
+import pytest
+
+import spindrift.codec as codec
+from spindrift.database.dao import DAO
+from spindrift.database.field import Field, coerce_int
+
+
+class Item(DAO):
+    TABLENAME = 'item'
+    id = Field(coerce_int, is_primary=True)
+    name = Field()
+
+
+VALUE = {
+    'id': 1,
+    'name': 'café',
+    'tags': ['a', 'b'],
+    'ratio': 0.5,
+    'flag': None,
+}
+ROW = {
+    'created': datetime.datetime(2020, 1, 2, 3, 4, 5, 6000),
+    'day': datetime.date(2020, 1, 2),
+    'elapsed': datetime.timedelta(days=1, seconds=3723),
+    'price': decimal.Decimal('10.25'),
+    'ids': {3},
+    'item': Item(id=7, name='seven'),
+}
+ROW_JSON = {
+    'created': '2020-01-02T03:04:05.006000',
+    'day': '2020-01-02',
+    'elapsed': '25:02:03',
+    'price': '10.25',
+    'ids': [3],
+    'item': {'id': 7, 'name': 'seven'},
+}
+
+
+@pytest.fixture(params=list(codec.CODECS))
+def use(request):
+    yield codec.use(request.param)
+    codec.use()
+
+
+def test_default():
+    assert codec.use().name == next(iter(codec.CODECS))
+    assert 'json' in codec.CODECS
+
+
+def test_round_trip(use):
+    data = codec.dumpb(VALUE)
+    assert isinstance(data, bytes)
+    assert codec.dumps(VALUE) == data.decode('utf-8')
+    assert data == b'{"id":1,"name":"caf\xc3\xa9","tags":["a","b"],' \
+        b'"ratio":0.5,"flag":null}'  # the same for every codec
+    assert codec.loads(data) == VALUE
+    assert codec.loads(data.decode('utf-8')) == VALUE
+
+
+def test_types(use):
+    assert codec.loads(codec.dumpb(ROW)) == ROW_JSON
+
+
+def test_not_serializable(use):
+    with pytest.raises(TypeError):
+        codec.dumpb({'a': object()})
+
+
+def test_unknown():
+    with pytest.raises(ValueError):
+        codec.use('nope')
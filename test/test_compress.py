@@ -0,0 +1,136 @@
+import gzip
+
+import pytest
+
+import spindrift.compress as compress
+import spindrift.http as http
+import spindrift.memory as memory
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 12351
+BIG = 'abcdefghij' * 200
+
+
+@pytest.mark.parametrize('accept, expected', (
+    (None, False),
+    ('', False),
+    ('gzip', True),
+    ('deflate, gzip', True),
+    ('GZIP;q=0.5', True),
+    ('gzip;q=0', False),
+    ('gzip;q=0.0, *', False),
+    ('*', True),
+    ('*;q=0', False),
+    ('br, identity', False),
+    ('x-gzip', True),
+))
+def test_accepts_gzip(accept, expected):
+    assert compress.accepts_gzip(accept) is expected
+
+
+def test_is_compressible():
+    c = compress.Compression()
+    assert c.is_compressible('text/html; charset=utf-8')
+    assert c.is_compressible('application/json')
+    assert not c.is_compressible('image/png')
+    assert not c.is_compressible(None)
+
+
+def test_cache():
+    c = compress.Compression(cache_size=1000)
+    data = BIG[:200].encode()
+    result = c.compress(data)
+    assert gzip.decompress(result) == data
+    assert c.compress(data) is result
+    assert (c.hit, c.miss) == (1, 1)
+
+    c.compress(BIG.encode())  # too big to cache
+    assert (c.hit, c.miss) == (1, 1)
+
+    for n in range(100):  # push the first entry out
+        c.compress(b'%d' % n * 50)
+    assert c._cache_bytes <= 1000
+    c.compress(data)
+    assert c.miss == 102
+
+
+def big(request):
+    return BIG
+
+
+def small(request):
+    return 'small'
+
+
+def image(request):
+    return request.respond(200, BIG, content_type='image/png')
+
+
+def lines(request):
+    return request.stream(content_type='text/plain',
+                          iterable=('line %d\n' % n for n in range(3)))
+
+
+class Client(http.HTTPHandler):
+
+    def on_ready(self):
+        self.http_send(resource=self.context.resource,
+                       headers=self.context.headers)
+
+    def on_http_data(self):
+        self.context.result = (self.http_headers, self.http_content)
+        self.close()
+
+
+class ClientContext(object):
+
+    def __init__(self, resource, headers):
+        self.resource = resource
+        self.headers = headers
+        self.result = None
+
+
+def get(resource, accept='gzip', compression=True):
+    mapper = RESTMapper()
+    mapper.add('/big$', dict(get=RESTMethod('test.test_compress.big')))
+    mapper.add('/small$', dict(get=RESTMethod('test.test_compress.small')))
+    mapper.add('/image$', dict(get=RESTMethod('test.test_compress.image')))
+    mapper.add('/lines$', dict(get=RESTMethod('test.test_compress.lines')))
+    context = RESTContext(
+        mapper, compress.Compression() if compression else None)
+    n = memory.MemoryNetwork()
+    n.add_server(PORT, RESTHandler, context=context)
+    headers = {'Accept-Encoding': accept} if accept else {}
+    ctx = ClientContext(resource, headers)
+    c = n.add_connection('localhost', PORT, Client, ctx)
+    while c.is_open:
+        n.service()
+    n.close()
+    return ctx.result
+
+
+@pytest.mark.parametrize('resource, accept, compression, encoding, vary', (
+    ('/big', 'gzip', True, 'gzip', True),
+    ('/big', 'gzip;q=0', True, None, True),
+    ('/big', None, True, None, True),
+    ('/big', 'gzip', False, None, False),
+    ('/small', 'gzip', True, None, False),
+    ('/image', 'gzip', True, None, False),
+))
+def test_negotiate(resource, accept, compression, encoding, vary):
+    headers, content = get(resource, accept, compression)
+    assert headers.get('content-encoding') == encoding
+    assert ('vary' in headers) is vary
+    assert content == ('small' if resource == '/small' else BIG)
+
+
+@pytest.mark.parametrize('accept, encoding', (
+    ('gzip', 'gzip'),
+    (None, None),
+))
+def test_stream(accept, encoding):
+    headers, content = get('/lines', accept)
+    assert headers.get('content-encoding') == encoding
+    assert content == 'line 0\nline 1\nline 2\n'
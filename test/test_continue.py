@@ -0,0 +1,124 @@
+import pytest
+
+import spindrift.http as http
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.mapper as rest_mapper
+
+
+PORT = 12355
+CALLED = []
+
+
+def echo(request):
+    CALLED.append(request.http_content)
+    return request.http_content
+
+
+class Server(rest_handler.RESTHandler):
+
+    def on_init(self):
+        self.http_max_content_length = 100
+        self.http_pipeline = self.context.pipeline
+
+    def on_http_headers(self):
+        if self.http_headers.get('authorization') == 'no':
+            self.http_send_server('denied', code=401, message='Unauthorized')
+
+
+class Context(rest_handler.RESTContext):
+
+    def __init__(self, pipeline=False):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/echo$', dict(post=rest_mapper.RESTMethod(echo)))
+        super(Context, self).__init__(mapper)
+        self.pipeline = pipeline
+
+
+class Client(network.Handler):
+    ''' sends the headers, then the body when "100 Continue" arrives '''
+
+    def on_init(self):
+        self.headers, self.body = self.context
+        self.received = b''
+
+    def on_ready(self):
+        self.send(self.headers)
+
+    def on_data(self, data):
+        self.received += data
+        if data.startswith(b'HTTP/1.1 100 Continue\r\n\r\n'):
+            self.send(self.body)
+
+
+def request(length=5, resource=b'/echo', extra=b''):
+    return b'POST %s HTTP/1.1\r\nExpect: 100-continue\r\n' \
+        b'Content-Length: %d\r\n%s\r\n' % (resource, length, extra)
+
+
+def run(headers, body=b'hello', pipeline=False):
+    CALLED.clear()
+    n = memory.MemoryNetwork()
+    n.add_server(PORT, Server, context=Context(pipeline))
+    c = n.add_connection('localhost', PORT, Client, context=(headers, body))
+    for _ in range(10):
+        n.service()
+    n.close()
+    return c
+
+
+@pytest.mark.parametrize('pipeline', (False, True))
+def test_continue(pipeline):
+    c = run(request(), pipeline=pipeline)
+    assert c.received.startswith(
+        b'HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 200 OK\r\n')
+    assert c.received.endswith(b'\r\n\r\nhello')
+    assert CALLED == ['hello']
+    assert c.is_open
+
+
+def test_body_sent():
+    ''' the body arrives with the headers: no interim response '''
+    c = run(request() + b'hello')
+    assert c.received.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert CALLED == ['hello']
+
+
+@pytest.mark.parametrize('headers, status', (
+    (request(resource=b'/nope'), b'404 Not Found'),
+    (request(length=101), b'413 Request Entity Too Large'),
+    (request(extra=b'Authorization: no\r\n'), b'401 Unauthorized'),
+))
+def test_reject(headers, status):
+    c = run(headers)
+    assert c.received.startswith(b'HTTP/1.1 ' + status + b'\r\n')
+    assert CALLED == []
+    assert not c.is_open
+
+
+class Interim(network.Handler):
+
+    def on_data(self, data):
+        self.send(b'HTTP/1.1 100 Continue\r\n\r\n'
+                  b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok')
+
+
+class HTTPClient(http.HTTPHandler):
+
+    def on_ready(self):
+        self.http_send('POST', resource='/', content='hi')
+
+    def on_http_data(self):
+        self.result = (self.http_status_code, self.http_content)
+        self.close()
+
+
+def test_client_interim():
+    n = memory.MemoryNetwork()
+    n.add_server(PORT, Interim)
+    c = n.add_connection('localhost', PORT, HTTPClient)
+    while c.is_open:
+        n.service()
+    n.close()
+    assert c.result == (200, b'ok')
@@ -0,0 +1,58 @@
+import spindrift.network as network
+
+
+PORT = 12346
+
+
+class Receiver(network.DatagramHandler):
+
+    def on_init(self):
+        self.received = []
+
+    def on_datagram(self, data, address):
+        self.received.append(data)
+        self.sendto(data.upper(), address)  # echo back to sender
+
+
+class Sender(network.DatagramHandler):
+
+    def on_init(self):
+        self.received = []
+
+    def on_datagram(self, data, address):
+        self.received.append(data)
+
+
+def test_datagram():
+    n = network.Network()
+    r = n.add_datagram('localhost', PORT, Receiver, is_bind=True)
+    s = n.add_datagram('localhost', PORT, Sender)
+    s.sendto(b'one')
+    s.sendto(b'two')
+    for _ in range(10):
+        n.service(timeout=.01)
+        if len(s.received) == 2:
+            break
+    assert r.received == [b'one', b'two']
+    assert s.received == [b'ONE', b'TWO']
+    assert s.tx_count == 6
+    n.close()
+
+
+def test_queue():
+    n = network.Network()
+    r = n.add_datagram('localhost', PORT, Receiver, is_bind=True)
+    s = n.add_datagram('localhost', PORT, Sender)
+    s.max_queue = 2
+    s._queue.append((b'queued', s.address))  # as if the socket had blocked
+    s._register(network.selectors.EVENT_READ | network.selectors.EVENT_WRITE)
+    s.sendto(b'one')
+    s.sendto(b'two')  # dropped: queue full
+    for _ in range(10):
+        n.service(timeout=.01)
+        if len(r.received) == 2:
+            break
+    assert r.received == [b'queued', b'one']
+    assert len(s._queue) == 0
+    assert s._mask == network.selectors.EVENT_READ
+    n.close()
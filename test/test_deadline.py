@@ -0,0 +1,214 @@
+import time
+
+import pytest
+
+import spindrift.connect as connect
+import spindrift.deadline as deadline
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.mapper as rest_mapper
+from spindrift.mysql.cursor import Cursor
+from spindrift.sequence import sequence, Step
+from spindrift.task import Task
+from spindrift.timer import Timer
+
+
+PORT = 12356
+PASSED = deadline.after(-1)
+
+
+def test_helpers():
+    assert deadline.remaining(None) is None
+    assert not deadline.is_expired(None)
+    assert deadline.is_expired(PASSED)
+    assert not deadline.is_expired(deadline.after(10))
+    assert deadline.earliest(None, None) is None
+    assert deadline.earliest(None, 2, 1) == 1
+    assert deadline.timeout(None, 5.0) == 5.0
+    assert deadline.timeout(deadline.after(1), 5.0) <= 1
+    assert deadline.timeout(PASSED, 5.0) == 0
+    assert deadline.from_header(None) is None
+    assert deadline.from_header('junk') is None
+    assert deadline.remaining(deadline.from_header('2.5')) > 2
+
+
+def test_task():
+    result = []
+
+    def fn(callback):
+        result.append('called')
+
+    def on_timeout(task, message):
+        result.append(message)
+
+    Task(lambda rc, r: None, deadline=PASSED).call(fn, on_timeout=on_timeout)
+    assert result == ['timeout']
+
+
+def test_task_passes_deadline():
+    result = []
+    when = deadline.after(10)
+
+    def inner(callback, deadline=None):
+        callback(0, deadline)
+
+    def outer(task):
+        task.call(inner, on_success=lambda t, r: result.append(r))
+
+    Task(lambda rc, r: None, deadline=when).call(outer)
+    assert result == [when]
+
+
+def test_sequence():
+    result = []
+
+    def step(callback, deadline=None):
+        result.append(deadline)
+        callback(0, None)
+
+    sequence(lambda rc, r: result.append((rc, r)), Step(step),
+             deadline=PASSED)
+    assert result == [(1, 'timeout')]
+
+    del result[:]
+    when = deadline.after(10)
+    sequence(lambda rc, r: result.append((rc, r)), Step(step),
+             deadline=when)
+    assert result == [when, (0, None)]
+
+
+class Protocol(object):
+
+    def __init__(self):
+        self.queries = []
+
+    def query(self, callback, query, cls=None):
+        self.queries.append(query)
+        callback(0, None)
+
+
+def test_cursor():
+    result = []
+    cursor = Cursor(Protocol())
+    cursor.deadline = PASSED
+    cursor.execute(lambda rc, r: result.append((rc, r)), 'SELECT 1')
+    assert result == [(1, 'timeout')]
+    assert cursor.protocol.queries == []
+
+    cursor.execute(lambda rc, r: result.append((rc, r)), 'SELECT 1',
+                   deadline=deadline.after(10))
+    assert cursor.protocol.queries == ['SELECT 1']
+
+
+def test_cursor_rollback():
+    cursor = Cursor(Protocol())
+    cursor._transaction_depth = 1
+    cursor.protocol.context = type('Context', (), dict(commit_enabled=True))
+    cursor.deadline = PASSED
+    cursor.rollback(lambda rc, r: None)
+    assert cursor.protocol.queries == ['ROLLBACK']
+
+
+def test_connect():
+    result = []
+    handler = connect.connect(
+        None, None, lambda rc, r: result.append((rc, r)),
+        'http://localhost:%d/test' % PORT, deadline=PASSED)
+    assert handler is None
+    assert result == [(1, 'timeout')]
+
+
+CALLED = []
+
+
+def fast(request):
+    CALLED.append(request.deadline)
+    return 'fast'
+
+
+def slow(request):
+    CALLED.append(request.deadline)
+    request.cleanup = lambda: CALLED.append('cleanup')
+    request.delay()
+
+
+class Context(rest_handler.RESTContext):
+
+    def __init__(self, timer):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/fast$', dict(get=rest_mapper.RESTMethod(fast)))
+        mapper.add('/slow$', dict(get=rest_mapper.RESTMethod(
+            slow, timeout=.05)))
+        super(Context, self).__init__(
+            mapper, deadline_header='X-Request-Timeout', timer=timer)
+
+
+class Client(network.Handler):
+
+    def on_init(self):
+        self.received = b''
+
+    def on_ready(self):
+        self.send(self.context)
+
+    def on_data(self, data):
+        self.received += data
+
+
+def run(resource, timeout=None, wait=0):
+    CALLED.clear()
+    timer = Timer()
+    n = memory.MemoryNetwork()
+    n.add_server(PORT, rest_handler.RESTHandler, context=Context(timer))
+    header = b'X-Request-Timeout: %s\r\n' % timeout if timeout else b''
+    c = n.add_connection('localhost', PORT, Client, context=(
+        b'GET %s HTTP/1.1\r\n%s\r\n' % (resource, header)))
+    for _ in range(5):
+        n.service()
+    if wait:
+        time.sleep(wait)
+        timer.service()
+        n.service()
+    n.close()
+    return c.received
+
+
+def test_no_deadline():
+    assert run(b'/fast').startswith(b'HTTP/1.1 200 OK\r\n')
+    assert CALLED == [None]
+
+
+def test_header():
+    assert run(b'/fast', b'10').startswith(b'HTTP/1.1 200 OK\r\n')
+    assert deadline.remaining(CALLED[0]) > 9
+
+
+@pytest.mark.parametrize('timeout', (b'0', b'-1'))
+def test_passed(timeout):
+    received = run(b'/fast', timeout)
+    assert received.startswith(b'HTTP/1.1 503 Service Unavailable\r\n')
+    assert CALLED == []
+
+
+def test_route_timeout():
+    received = run(b'/slow', wait=.1)
+    assert received.startswith(b'HTTP/1.1 504 Gateway Timeout\r\n')
+    assert CALLED[1:] == ['cleanup']
+
+
+def test_header_earlier_than_route():
+    run(b'/slow', b'.01')
+    assert deadline.remaining(CALLED[0]) < .02
+
+
+def test_cursor_commit():
+    result = []
+    cursor = Cursor(Protocol())
+    cursor._transaction_depth = 1
+    cursor.protocol.context = type('Context', (), dict(commit_enabled=True))
+    cursor.deadline = PASSED
+    cursor.commit(lambda rc, r: result.append((rc, r)))
+    assert result == [(1, deadline.TIMEOUT)]
+    cursor.rollback(lambda rc, r: None)
+    assert cursor.protocol.queries == ['ROLLBACK']
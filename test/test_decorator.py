@@ -0,0 +1,52 @@
+import pytest
+
+from spindrift.rest.decorator import coerce, content_to_args
+
+
+class Request(object):
+
+    id = 1
+
+    def __init__(self, json=None):
+        self._json = json
+
+    @property
+    def json(self):
+        if self._json is None:
+            raise Exception('Unable to parse json content')
+        return self._json
+
+    def respond(self, code, content):
+        return code, content
+
+
+def handler(request, *args, **kwargs):
+    return args, kwargs
+
+
+@pytest.mark.parametrize('json, result', (
+    ({'a': 1, 'b': '2'}, (('x', 1, 2, 5), {})),
+    ({'a': 1, 'b': '2', 'c': 6}, (('x', 1, 2, 6), {})),
+    ({'b': '2'}, (400, "Missing required key: 'a'")),
+    ({'a': 1, 'b': 'z'}, (400, "Unable to read field 'b': invalid literal "
+                               "for int() with base 10: 'z'")),
+    (None, (400, "Unable to read field 'a': Unable to parse json content")),
+))
+def test_content_to_args(json, result):
+    fn = content_to_args('a', ('b', int), ('c', None, 5))(handler)
+    assert fn(Request(json), 'x') == result
+
+
+def test_content_to_kwargs():
+    fn = content_to_args('a', ('b', int), as_args=False)(handler)
+    assert fn(Request({'a': 1, 'b': '2'}), 'x') == (('x',), {'a': 1, 'b': 2})
+
+
+@pytest.mark.parametrize('args, result', (
+    (('1', '2.5', 'extra'), ((1, 2.5), {})),
+    (('1',), ((1,), {})),
+    (('x', '1'), (400, "Unable to coerce: invalid literal for int() with "
+                       "base 10: 'x'")),
+))
+def test_coerce(args, result):
+    assert coerce(int, float)(handler)(Request(), *args) == result
@@ -0,0 +1,173 @@
+import pytest
+
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.rest.cache as cache
+import spindrift.rest.etag as etag
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.mapper as rest_mapper
+
+
+PORT = 12360
+CALLS = []
+VERSION = '"v1"'
+
+
+def item(request, id):
+    CALLS.append(id)
+    return {'id': id}
+
+
+def versioned(request, id):
+    if request.not_modified(3):
+        return
+    CALLS.append(id)
+    return {'id': id}
+
+
+@pytest.mark.parametrize('if_none_match, tag, expect', (
+    (None, VERSION, False),
+    ('', VERSION, False),
+    ('"v1"', VERSION, True),
+    ('"v0", "v1"', VERSION, True),
+    ('W/"v1"', VERSION, True),
+    ('"v1"', 'W/"v1"', True),
+    ('*', VERSION, True),
+    ('"v2"', VERSION, False),
+    ('v1', VERSION, False),
+))
+def test_matches(if_none_match, tag, expect):
+    assert etag.matches(if_none_match, tag) is expect
+
+
+@pytest.mark.parametrize('version, expect', (
+    (1, '"1"'),
+    ('abc', '"abc"'),
+    ('"abc"', '"abc"'),
+    ('W/"abc"', 'W/"abc"'),
+))
+def test_quote(version, expect):
+    assert etag.quote(version) == expect
+
+
+def test_strong():
+    assert etag.strong(b'abc') == etag.strong(b'abc')
+    assert etag.strong(b'abc') != etag.strong(b'abd')
+    assert etag.strong(b'abc').startswith('"')
+
+
+class Context(rest_handler.RESTContext):
+
+    def __init__(self, cache=None):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/item/(\\d+)$', dict(
+            get=rest_mapper.RESTMethod(
+                item, [rest_mapper.RESTArg(int)], cache=cache, etag=True),
+            put=rest_mapper.RESTMethod(
+                item, [rest_mapper.RESTArg(int)], etag=True),
+        ))
+        mapper.add('/plain/(\\d+)$', dict(get=rest_mapper.RESTMethod(
+            item, [rest_mapper.RESTArg(int)])))
+        mapper.add('/versioned/(\\d+)$', dict(get=rest_mapper.RESTMethod(
+            versioned, [rest_mapper.RESTArg(int)])))
+        super(Context, self).__init__(mapper)
+
+
+class Client(network.Handler):
+
+    def on_init(self):
+        self.received = b''
+
+    def on_ready(self):
+        self.send(self.context)
+
+    def on_data(self, data):
+        self.received += data
+
+    @property
+    def headers(self):
+        head = self.received.split(b'\r\n\r\n', 1)[0].decode()
+        return dict(
+            line.split(': ', 1) for line in head.split('\r\n')[1:])
+
+    @property
+    def content(self):
+        return self.received.split(b'\r\n\r\n', 1)[1]
+
+
+class Server(object):
+
+    def __init__(self, cache=None):
+        CALLS.clear()
+        self.network = memory.MemoryNetwork()
+        self.network.add_server(PORT, rest_handler.RESTHandler,
+                                context=Context(cache))
+
+    def request(self, resource, if_none_match=None, method=b'GET'):
+        headers = b''
+        if if_none_match is not None:
+            headers = b'If-None-Match: %s\r\n' % if_none_match.encode()
+        c = self.network.add_connection('localhost', PORT, Client, context=(
+            b'%s %s HTTP/1.1\r\n%s\r\n' % (method, resource, headers)))
+        for _ in range(3):
+            self.network.service()
+        return c
+
+    def close(self):
+        self.network.close()
+
+
+@pytest.fixture
+def server():
+    s = Server()
+    yield s
+    s.close()
+
+
+def test_etag(server):
+    a = server.request(b'/item/1')
+    assert a.received.startswith(b'HTTP/1.1 200 OK\r\n')
+    tag = a.headers['ETag']
+    assert tag == etag.strong(a.content)
+    b = server.request(b'/item/1', tag)
+    assert b.received.startswith(b'HTTP/1.1 304 Not Modified\r\n')
+    assert b.headers['ETag'] == tag
+    assert 'Content-Length' not in b.headers
+    assert b.content == b''
+    c = server.request(b'/item/2', tag)
+    assert c.received.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert c.headers['ETag'] != tag
+
+
+def test_not_get(server):
+    a = server.request(b'/item/1', method=b'PUT')
+    b = server.request(b'/item/1', a.headers['ETag'], method=b'PUT')
+    assert b.received.startswith(b'HTTP/1.1 200 OK\r\n')
+
+
+def test_no_etag(server):
+    a = server.request(b'/plain/1', '*')
+    assert a.received.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert 'ETag' not in a.headers
+
+
+def test_not_modified(server):
+    a = server.request(b'/versioned/1')
+    assert a.headers['ETag'] == '"3"'
+    b = server.request(b'/versioned/1', '"3"')
+    assert b.received.startswith(b'HTTP/1.1 304 Not Modified\r\n')
+    assert CALLS == [1]  # no work done for b
+    c = server.request(b'/versioned/1', '"2"')
+    assert c.content == b'{"id":1}'
+
+
+def test_cache():
+    server = Server(cache.Cache(ttl=10))
+    a = server.request(b'/item/1')
+    b = server.request(b'/item/1', a.headers['ETag'])
+    c = server.request(b'/item/1')
+    assert CALLS == [1]
+    assert b.received.startswith(b'HTTP/1.1 304 Not Modified\r\n')
+    assert c.headers['ETag'] == a.headers['ETag']
+    assert c.content == a.content
+    server.close()
@@ -1,8 +1,14 @@
+import email.utils
 import gzip
+import time
+import zlib
 import pytest
 
+import spindrift.connect as connect
 import spindrift.http as http
+import spindrift.memory as memory
 import spindrift.network as network
+import spindrift.timer as timer
 
 
 PORT = 12345
@@ -106,3 +112,366 @@ def test_server_compress():
     handler.tested = False
     handler.http_send_server(data, gzip=True)
     assert handler.tested
+
+
+def test_http_date():
+    date = http.http_date()
+    assert date.endswith(' GMT')
+    parsed = email.utils.parsedate_to_datetime(date)
+    assert abs(parsed.timestamp() - time.time()) < 2
+
+
+def test_status_line():
+    line = http.status_line(200, 'OK')
+    assert line == b'HTTP/1.1 200 OK\r\n'
+    assert http.status_line(200, 'OK') is line
+
+
+@pytest.mark.parametrize('code', (400, 404, 413, 503))
+def test_error_response(code):
+
+    class _handler(http.HTTPHandler):
+        def _send(self, headers, content):
+            self.sent = headers + content
+
+    handler = _handler(0, network.Network())
+    handler.http_headers = {}
+    handler.http_send_error(code)
+    assert handler.sent == http.error_response(code)
+    assert handler.sent.startswith(b'HTTP/1.1 %d %s\r\nDate: ' % (
+        code, http.ERROR[code].encode()))
+    assert handler.sent.endswith(
+        b'\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+    assert handler._http_close_on_complete
+
+
+class Parser(http.HTTPHandler):
+
+    def on_init(self):
+        self.result = []
+
+    def quiesce(self):
+        pass
+
+    def on_http_data(self):
+        self.result.append((
+            self.http_method,
+            self.http_resource,
+            self.http_query,
+            self.http_headers,
+            self.http_content,
+            bytes(self.http_message),
+        ))
+
+
+PIPELINE = (
+    b'GET /a/b?x=1&y=2&x=3 HTTP/1.1\r\nHost: h\r\nContent-Length: 3\r\n\r\nabc',
+    b'GET /a;p?q=1#frag HTTP/1.0\r\nA:  b \r\ncontent-length: 0\r\n\r\n',
+    b'POST /c HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n'
+    b'3\r\nabc\r\n2;x\r\nde\r\n0\r\nFoot: er\r\n\r\n',
+)
+
+
+@pytest.mark.parametrize('size', (1, 2, 7, 1000))
+def test_parse(size):
+    handler = Parser(0, network.Network())
+    data = b''.join(PIPELINE)
+    for i in range(0, len(data), size):
+        handler.on_data(data[i:i + size])
+    assert handler.result == [
+        ('GET', '/a/b', {'x': ['1', '3'], 'y': '2'},
+         {'host': 'h', 'content-length': '3'}, b'abc', PIPELINE[0]),
+        ('GET', '/a', {'q': '1'},
+         {'a': 'b', 'content-length': '0'}, b'', PIPELINE[1]),
+        ('POST', '/c', {},
+         {'transfer-encoding': 'chunked', 'Foot': 'er'}, b'abcde',
+         PIPELINE[2]),
+    ]
+    assert len(handler._data) == 0
+
+
+@pytest.mark.parametrize('status', (
+    b'204 No Content', b'304 Not Modified'))
+def test_no_content(status):
+    handler = Parser(0, network.Network(), is_outbound=True)
+    handler.on_data(b'HTTP/1.1 %s\r\nETag: "a"\r\n\r\n' % status)
+    assert len(handler.result) == 1  # without waiting for close
+
+
+def test_headers():
+    handler = Parser(0, network.Network())
+    handler.on_data(
+        b'GET / HTTP/1.1\r\nAccept: a\r\nX-Thing:  one \r\n'
+        b'Content-Type: text/plain\r\n'
+        b'x-thing: two\r\nContent-Length: 0\r\n\r\n')
+    headers = handler.result[0][3]
+    assert isinstance(headers, http.HTTPHeaders)
+    assert headers['x-thing'] == 'two'
+    assert headers['X-THING'] == 'two'
+    assert headers.get_all('X-Thing') == ['one', 'two']
+    assert headers.get_all('nope') == []
+    assert headers.get('Nope', 'default') == 'default'
+    assert 'ACCEPT' in headers
+    assert len(headers) == 4
+    headers.add('New', 'value')
+    assert headers['new'] == 'value'
+    assert list(headers)[-1] == 'New'
+    del headers['NEW']
+    assert 'new' not in headers
+
+
+def test_headers_lazy():
+
+    class _handler(Parser):
+        def on_http_headers(self):
+            assert self.http_headers._raw is not None
+            self.raw = self.http_headers._raw
+
+    handler = _handler(0, network.Network())
+    handler.on_data(b'GET / HTTP/1.1\r\nHost: h\r\n\r\n')
+    assert handler.raw == b'Host: h\r\n'
+    assert handler.http_headers._raw is None  # split to find content-length
+
+
+@pytest.mark.parametrize('data', (
+    b'GET / HTTP/1.1\r\nHost h\r\n\r\n',
+    b'GET / HTTP/1.1\r\nA: b\r\nHost h\r\n\r\n',
+    b'GET / HTTP/1.1\r\nHost: h\r\nA: b\r\nC: d\r\n\r\n',
+    b'GET / HTTP/1.1\r\nHost: h\r\nA: %s\r\n\r\n' % (b'b' * 100),
+    b'GET / HTTP/1.1\r\nHost: h\r\nA: b\r\nC: d\r\n',
+    b'GET / HTTP/1.1\r\nHost: h\r\nA: %s' % (b'b' * 100),
+))
+def test_header_error(data):
+    handler = Parser(0, network.Network())
+    handler.http_max_header_count = 2
+    handler.http_max_line_length = 50
+    handler.on_data(data)
+    assert handler.result == []
+    assert handler._http_close_on_complete
+
+
+def test_charset():
+    handler = http.HTTPHandler(0, network.Network())
+    handler.http_headers = {'content-type': 'text/plain; charset=ascii'}
+    assert handler.charset == 'ascii'
+    assert handler._http_charset == ('text/plain; charset=ascii', 'ascii')
+    handler.http_headers['content-type'] = 'text/plain'
+    assert handler.charset is None
+
+
+def test_lazy_query():
+
+    class _handler(http.HTTPHandler):
+        def on_http_data(self):
+            assert self.http_query_string == 'b=1'
+            assert self._http_query is None
+            assert self.http_query == {'b': '1'}
+            self.tested = True
+
+    handler = _handler(0, network.Network())
+    handler.on_data(b'GET /a?b=1 HTTP/1.1\r\nContent-Length: 0\r\n\r\n')
+    assert handler.tested
+
+
+def test_line_too_long():
+    handler = Parser(0, network.Network())
+    handler.http_max_line_length = 10
+    handler.on_data(b'GET /abcdefghijkl')
+    assert handler._http_close_on_complete
+
+
+MULTIPART = (
+    b'--XyZ\r\n'
+    b'Content-Disposition: form-data; name="field"\r\n'
+    b'\r\n'
+    b'value\r\n'
+    b'--XyZ\r\n'
+    b'Content-Disposition: form-data; name="upload"; filename="a;b.txt"\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'\r\n'
+    + b"\r\n--XyY" * 100 +
+    b'\r\n--XyZ--\r\n'
+)
+
+
+class Multipart(http.HTTPHandler):
+
+    def on_init(self):
+        self.parts = []
+        self.result = None
+
+    def on_http_part(self, part):
+        self.parts.append(part.name)
+
+    def on_http_data(self):
+        self.result = self.http_multipart
+
+    def on_http_error(self, message):
+        self.result = message
+
+
+def multipart(data, size, max_part_memory=1024):
+    handler = Multipart(0, network.Network())
+    handler.http_max_part_memory = max_part_memory
+    data = (
+        b'POST / HTTP/1.1\r\n'
+        b'Content-Type: multipart/form-data; boundary=XyZ\r\n'
+        b'Content-Length: %d\r\n\r\n' % len(data)
+    ) + data
+    for i in range(0, len(data), size):
+        handler.on_data(data[i:i + size])
+    return handler
+
+
+@pytest.mark.parametrize('size', (1, 5, 1000))
+def test_multipart(size):
+    handler = multipart(MULTIPART, size)
+    assert handler.parts == ['field', 'upload']
+    field, upload = handler.result
+    assert field.content == b'value'
+    assert upload.filename == 'a;b.txt'
+    assert upload.headers['content-type'] == 'text/plain'
+    assert upload.content == b"\r\n--XyY" * 100
+    assert handler.http_content == b''  # not buffered
+
+
+def test_multipart_spool():
+    handler = multipart(MULTIPART, 100, max_part_memory=100)
+    field, upload = handler.result
+    assert not field.file._rolled
+    assert upload.file._rolled  # on disk
+    assert upload.file.read() == b"\r\n--XyY" * 100
+
+
+def test_multipart_spool_buffer():
+    content = b'x' * (256 * 1024)
+    data = (
+        b'--XyZ\r\n'
+        b'Content-Disposition: form-data; name="upload"; filename="x"\r\n'
+        b'\r\n' + content + b'\r\n--XyZ--\r\n'
+    )
+    handler = Multipart(0, network.Network())
+    handler.http_max_part_memory = 1024
+    data = (
+        b'POST / HTTP/1.1\r\n'
+        b'Content-Type: multipart/form-data; boundary=XyZ\r\n'
+        b'Content-Length: %d\r\n\r\n' % len(data)
+    ) + data
+    largest = 0
+    for i in range(0, len(data), 4096):
+        handler.on_data(data[i:i + 4096])
+        largest = max(largest, len(handler._data))
+    upload, = handler.result
+    assert upload.file._rolled  # on disk
+    assert upload.file.read() == content
+    assert largest <= 2 * 4096  # the part isn't also kept in the buffer
+
+
+def test_multipart_incomplete():
+    handler = multipart(MULTIPART[:-10], 1000)
+    assert handler.result == 'Malformed multipart message'
+
+
+def test_malformed_gzip():
+    handler = Multipart(0, network.Network())
+    handler.on_data(
+        b'POST / HTTP/1.1\r\nContent-Encoding: gzip\r\n'
+        b'Content-Length: 3\r\n\r\nabcGET / HTTP/1.1\r\n\r\n'
+    )
+    assert handler.result == 'Malformed gzip data'  # and no more parsing
+
+
+class Decoded(Multipart):
+
+    def _send(self, headers, content):
+        self.sent = headers
+
+    def on_http_chunk(self, chunk):
+        self.parts.append(bytes(chunk))
+
+    def on_http_body_end(self):
+        self.result = b''.join(self.parts)
+
+    def on_http_data(self):
+        self.result = self.http_content
+
+
+def decoded(data, size=1000, encoding='gzip', max_length=None,
+            stream=False):
+    handler = Decoded(0, network.Network())
+    handler.http_max_content_length = max_length
+    if stream:
+        handler.on_http_headers = lambda: setattr(handler, 'http_stream', 1)
+    data = (
+        b'POST / HTTP/1.1\r\nContent-Encoding: %s\r\n'
+        b'Content-Length: %d\r\n\r\n' % (encoding.encode(), len(data))
+    ) + data
+    for i in range(0, len(data), size):
+        handler.on_data(data[i:i + size])
+    return handler
+
+
+DATA = b'0123456789abcdef' * 10000
+
+
+@pytest.mark.parametrize('size', (1, 100, 100000))
+@pytest.mark.parametrize('stream', (False, True))
+def test_decode_gzip(size, stream):
+    handler = decoded(gzip.compress(DATA), size, stream=stream)
+    assert handler.result == DATA
+    if stream:
+        assert max(len(p) for p in handler.parts) <= http.DECODER_CHUNK
+
+
+def test_decode_deflate():
+    handler = decoded(zlib.compress(DATA), encoding='deflate')
+    assert handler.result == DATA
+
+
+def test_decode_too_long():
+    handler = decoded(gzip.compress(DATA), max_length=len(DATA) - 1)
+    assert handler.result == 'Decompressed content exceeds maximum length'
+    assert handler.sent.startswith(b'HTTP/1.1 413 ')
+    assert len(handler.http_content) < len(DATA)  # stopped at the limit
+
+
+def test_decode_malformed():
+    handler = decoded(gzip.compress(DATA)[:-20])
+    assert handler.result == 'Malformed gzip data'
+    handler = decoded(b'not gzip')
+    assert handler.result == 'Malformed gzip data'
+
+
+def test_decode_multipart():
+    handler = Multipart(0, network.Network())
+    data = gzip.compress(MULTIPART)
+    handler.on_data((
+        b'POST / HTTP/1.1\r\n'
+        b'Content-Type: multipart/form-data; boundary=XyZ\r\n'
+        b'Content-Encoding: gzip\r\n'
+        b'Content-Length: %d\r\n\r\n' % len(data)
+    ) + data)
+    assert handler.parts == ['field', 'upload']
+
+
+@pytest.mark.parametrize('max_length, expected', (
+    (None, (0, DATA.decode())),
+    (1000, (1, 'Decompressed content exceeds maximum length')),
+))
+def test_connect_decode(max_length, expected):
+
+    class GzipServer(http.HTTPHandler):
+        def on_http_data(self):
+            self.http_send_server(DATA.decode(), gzip=True)
+
+    n = memory.MemoryNetwork(chunk_size=1000)
+    n.add_server(12350, GzipServer)
+    result = []
+    c = connect.connect(
+        n, timer.Timer(), lambda rc, r: result.append((rc, r)),
+        'http://localhost:12350/', is_json=False,
+        max_content_length=max_length,
+    )
+    while not c.is_done:
+        n.service()
+    assert result == [expected]
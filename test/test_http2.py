@@ -0,0 +1,328 @@
+import gzip
+import json
+import struct
+
+import pytest
+
+import spindrift.hpack as hpack
+import spindrift.http as http
+import spindrift.http2 as http2
+import spindrift.memory as memory
+import spindrift.network as network
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 12353
+SETTINGS = http2.frame(http2.SETTINGS, 0, 0)
+
+
+@pytest.mark.parametrize('data', (
+    b'', b'a', b'www.example.com', b'no-cache', bytes(range(256)),
+))
+def test_huffman(data):
+    assert hpack.huffman_decode(hpack.huffman_encode(data)) == data
+
+
+def test_huffman_rfc():
+    assert hpack.huffman_encode(b'www.example.com').hex() == \
+        'f1e3c2e5f23a6ba0ab90f4ff'
+
+
+@pytest.mark.parametrize('data', (
+    b'\xff\xff\xff\xff',  # EOS
+    b'\xf1\xe3\xc2\xe5\xf2\x3a\x6b\xa0\xab\x90\xf4\x00',  # zero padding
+))
+def test_huffman_error(data):
+    with pytest.raises(hpack.HPACKError):
+        hpack.huffman_decode(data)
+
+
+def test_decoder_rfc():
+    ''' RFC 7541 C.4: requests with huffman coding '''
+    decoder = hpack.Decoder()
+    assert decoder.decode(bytes.fromhex(
+        '828684418cf1e3c2e5f23a6ba0ab90f4ff')) == [
+        (':method', 'GET'), (':scheme', 'http'), (':path', '/'),
+        (':authority', 'www.example.com')]
+    assert decoder.decode(bytes.fromhex(
+        '828684be5886a8eb10649cbf'))[-1] == ('cache-control', 'no-cache')
+    assert decoder.decode(bytes.fromhex(
+        '828785bf408825a849e95ba97d7f8925a849e95bb8e8b4bf'))[-1] == \
+        ('custom-key', 'custom-value')
+    assert decoder._table_size == 164
+
+
+def test_decoder_evict():
+    ''' RFC 7541 C.5: responses with a 256 byte table '''
+    decoder = hpack.Decoder(max_table_size=256)
+    decoder.decode(b'\x3f\xe1\x01')  # table size update to 256
+    decoder.decode(bytes.fromhex(
+        '4803333032580770726976617465611d4d6f6e2c203231204f63742032303133'
+        '2032303a31333a323120474d546e1768747470733a2f2f7777772e6578616d70'
+        '6c652e636f6d'))
+    assert decoder.decode(bytes.fromhex('4803333037c1c0bf')) == [
+        (':status', '307'), ('cache-control', 'private'),
+        ('date', 'Mon, 21 Oct 2013 20:13:21 GMT'),
+        ('location', 'https://www.example.com')]
+    assert decoder._table_size == 222
+
+
+@pytest.mark.parametrize('data', (
+    b'\x80',  # index 0
+    b'\xbf\x10',  # index past the end of the table
+    b'\x3f\xe2\x1f',  # table size update too large (4097)
+    b'\x00\x85abc',  # truncated string
+))
+def test_decoder_error(data):
+    with pytest.raises(hpack.HPACKError):
+        hpack.Decoder().decode(data)
+
+
+def test_encoder():
+    headers = [(':status', '200'), ('content-type', 'text/html'),
+               ('x-custom', 'value')]
+    encoder = hpack.Encoder()
+    block = encoder.encode(headers)
+    assert block[0] == 0x88  # :status 200 from the static table
+    assert hpack.Decoder().decode(block) == headers
+    assert encoder.encode(headers) == block
+
+
+def echo(request):
+    return dict(method=request.http_method, query=request.http_query_string,
+                content=request.json, host=request.http_headers.get('host'))
+
+
+def slow(request):
+    request.delay()
+    request.handler.context.delayed.append(request)
+
+
+def lines(request):
+    return request.stream(content_type='text/plain',
+                          iterable=('line %d\n' % n for n in range(3)))
+
+
+class Context(RESTContext):
+
+    def __init__(self, mapper):
+        super(Context, self).__init__(mapper)
+        self.delayed = []
+
+
+class Server(RESTHandler):
+
+    def on_init(self):
+        self.http_h2c = True
+        self.http_max_content_length = 100
+
+
+def request(stream_id, path, method='GET', content=None, headers=()):
+    ''' the frames of a request (Encoder doesn't use the dynamic table) '''
+    block = hpack.Encoder().encode([
+        (':method', method), (':scheme', 'http'), (':path', path),
+        (':authority', 'test')] + list(headers))
+    flags = http2.END_HEADERS | (0 if content else http2.END_STREAM)
+    data = http2.frame(http2.HEADERS, flags, stream_id, block)
+    if content:
+        data += http2.frame(http2.DATA, http2.END_STREAM, stream_id, content)
+    return data
+
+
+class Client(network.Handler):
+    ''' a minimal HTTP/2 client '''
+
+    def on_init(self):
+        self.frames = []
+        self.buffer = bytearray()
+        self.decoder = hpack.Decoder()
+
+    def on_data(self, data):
+        self.buffer += data
+        while True:
+            result = http2.parse_frame(self.buffer)
+            if result is None:
+                break
+            frame_type, flags, stream_id, payload, end = result
+            del self.buffer[:end]
+            if frame_type == http2.HEADERS:
+                payload = self.decoder.decode(payload)
+            self.frames.append((frame_type, flags, stream_id, payload))
+
+    def response(self, stream_id):
+        ''' (headers, content, is_complete) of a stream '''
+        headers, content, is_complete = None, b'', False
+        for frame_type, flags, sid, payload in self.frames:
+            if sid != stream_id:
+                continue
+            if frame_type == http2.HEADERS:
+                headers = dict(payload)
+            elif frame_type == http2.DATA:
+                content += payload
+            if frame_type in (http2.HEADERS, http2.DATA) and \
+                    flags & http2.END_STREAM:
+                is_complete = True
+        return headers, content, is_complete
+
+    def types(self, frame_type):
+        return [f for f in self.frames if f[0] == frame_type]
+
+
+@pytest.fixture
+def net():
+    mapper = RESTMapper()
+    mapper.add('/echo$', dict(get=RESTMethod('test.test_http2.echo'),
+                              post=RESTMethod('test.test_http2.echo')))
+    mapper.add('/slow$', dict(get=RESTMethod('test.test_http2.slow')))
+    mapper.add('/lines$', dict(get=RESTMethod('test.test_http2.lines')))
+    n = memory.MemoryNetwork()
+    n.context = Context(mapper)
+    n.add_server(PORT, Server, context=n.context)
+    yield n
+    n.close()
+
+
+def connect(net, data=b'', settings=SETTINGS):
+    c = net.add_connection('localhost', PORT, Client)
+    c.send(http2.PREFACE + settings + data)
+    service(net)
+    return c
+
+
+def service(net):
+    for _ in range(5):
+        net.service()
+
+
+def test_get(net):
+    c = connect(net, http2.frame(http2.PING, 0, 0, b'12345678') +
+                request(1, '/echo?a=1'))
+    settings = c.types(http2.SETTINGS)
+    assert [f[1] for f in settings] == [0, http2.ACK]
+    assert c.types(http2.PING) == [(http2.PING, http2.ACK, 0, b'12345678')]
+    headers, content, is_complete = c.response(1)
+    assert is_complete
+    assert headers[':status'] == '200'
+    assert headers['content-type'] == 'application/json; charset=utf-8'
+    assert 'connection' not in headers
+    assert json.loads(content.decode()) == dict(
+        method='GET', query='a=1', content=dict(a='1'), host='test')
+    assert c.is_open
+
+
+def test_multiplex(net):
+    c = connect(net)
+    c.send(request(1, '/slow') + request(3, '/echo', 'POST', b'{"a":1}') +
+           request(5, '/nope'))
+    service(net)
+    assert c.response(1) == (None, b'', False)
+    assert json.loads(c.response(3)[1].decode())['content'] == dict(a=1)
+    assert c.response(5)[0][':status'] == '404'
+
+    net.context.delayed.pop().respond('later')
+    service(net)
+    headers, content, is_complete = c.response(1)
+    assert (headers[':status'], content, is_complete) == ('200', b'later', True)
+    assert c.is_open
+
+
+def test_stream(net):
+    c = connect(net, request(1, '/lines'))
+    headers, content, is_complete = c.response(1)
+    assert is_complete
+    assert 'transfer-encoding' not in headers
+    assert content == b'line 0\nline 1\nline 2\n'
+    assert len(c.types(http2.DATA)) > 1
+
+
+def test_flow_control(net):
+    settings = http2.frame(http2.SETTINGS, 0, 0, struct.pack(
+        '>HL', http2.SETTINGS_INITIAL_WINDOW_SIZE, 10))
+    c = connect(net, request(1, '/echo'), settings)
+    headers, content, is_complete = c.response(1)
+    assert len(content) == 10 and not is_complete
+    c.send(http2.frame(http2.WINDOW_UPDATE, 0, 1, struct.pack('>L', 1000)))
+    service(net)
+    headers, content, is_complete = c.response(1)
+    assert is_complete
+    assert json.loads(content.decode())['method'] == 'GET'
+
+
+def test_too_long(net):
+    c = connect(net)
+    c.send(request(1, '/echo', 'POST', b'x' * 101) +
+           request(3, '/echo'))
+    service(net)
+    assert c.response(1)[0][':status'] == '413'
+    assert c.types(http2.RST_STREAM) == [
+        (http2.RST_STREAM, 0, 1, struct.pack('>L', http2.NO_ERROR))]
+    assert c.response(3)[0][':status'] == '200'
+    assert c.is_open
+
+
+def test_gzip(net):
+    gz = [('content-encoding', 'gzip')]
+    c = connect(net)
+    c.send(request(1, '/echo', 'POST', gzip.compress(b'{"a":1}'), gz) +
+           request(3, '/echo', 'POST', gzip.compress(b' ' * 10000), gz) +
+           request(5, '/echo', 'POST', b'not gzip', gz))
+    service(net)
+    assert json.loads(c.response(1)[1].decode())['content'] == dict(a=1)
+    assert c.response(3)[0][':status'] == '413'  # decompressed is too long
+    assert c.response(5) == (None, b'', False)
+    assert c.types(http2.RST_STREAM) == [
+        (http2.RST_STREAM, 0, 5, struct.pack('>L', http2.PROTOCOL_ERROR))]
+    assert c.is_open
+
+
+def test_refused(net):
+    c = connect(net, request(1, '/slow'))
+    net.context.delayed[0].handler._h2.max_streams = 1
+    c.send(request(3, '/echo'))
+    service(net)
+    assert c.types(http2.RST_STREAM) == [
+        (http2.RST_STREAM, 0, 3, struct.pack('>L', http2.REFUSED_STREAM))]
+
+
+@pytest.mark.parametrize('data', (
+    http2.frame(http2.HEADERS, http2.END_HEADERS, 2, b'\x82'),  # even id
+    http2.frame(http2.DATA, 0, 7, b'x'),  # idle stream
+    http2.frame(http2.PING, 0, 0, b'1234'),  # bad size
+    http2.frame(http2.CONTINUATION, http2.END_HEADERS, 1, b'\x82'),
+    http2.frame(http2.HEADERS, http2.END_HEADERS, 1, b'\x80'),  # bad hpack
+))
+def test_connection_error(net, data):
+    c = connect(net, data)
+    goaway = c.types(http2.GOAWAY)
+    assert len(goaway) == 1
+    service(net)
+    assert not c.is_open
+
+
+def test_goaway(net):
+    c = connect(net, request(1, '/slow'))
+    c.send(http2.frame(http2.GOAWAY, 0, 0, struct.pack('>LL', 0, 0)))
+    service(net)
+    assert c.is_open  # stream 1 is still open
+    net.context.delayed.pop().respond('done')
+    service(net)
+    assert c.response(1)[1] == b'done'
+    assert not c.is_open
+
+
+class Client1(http.HTTPHandler):
+
+    def on_ready(self):
+        self.http_send(resource='/echo')
+
+    def on_http_data(self):
+        self.result = json.loads(self.http_content)
+        self.close()
+
+
+def test_http1(net):
+    c = net.add_connection('localhost', PORT, Client1)
+    while c.is_open:
+        net.service()
+    assert c.result['method'] == 'GET'
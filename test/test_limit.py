@@ -0,0 +1,176 @@
+import time
+
+import pytest
+
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.limit as limit
+import spindrift.rest.mapper as rest_mapper
+from spindrift.timer import Timer
+
+
+PORT = 12357
+
+
+class Run(object):
+    ''' start and reject callbacks for Limiter.acquire '''
+
+    def __init__(self, name, result):
+        self.name = name
+        self.result = result
+        self.release = None
+
+    def start(self, release):
+        self.release = release
+        self.result.append(self.name)
+
+    def reject(self, limiter):
+        self.result.append('reject ' + self.name)
+
+
+def acquire(limiter, names, result):
+    runs = [Run(name, result) for name in names]
+    for run in runs:
+        limiter.acquire(run.start, run.reject)
+    return runs
+
+
+def test_limit():
+    result = []
+    limiter = limit.Limiter(limit=2)
+    a, b, c = acquire(limiter, 'abc', result)
+    assert result == ['a', 'b', 'reject c']
+    assert limiter.stats() == dict(
+        limit=2, inflight=2, queued=0, accepted=2, rejected=1, expired=0)
+    a.release()
+    a.release()  # idempotent
+    assert limiter.inflight == 1
+
+
+@pytest.mark.parametrize('is_lifo, expect', (
+    (False, ['a', 'reject d', 'b', 'c']),
+    (True, ['a', 'reject d', 'c', 'b']),
+))
+def test_queue(is_lifo, expect):
+    result = []
+    limiter = limit.Limiter(limit=1, max_limit=1, queue_size=2,
+                            is_lifo=is_lifo)
+    runs = dict(zip('abcd', acquire(limiter, 'abcd', result)))
+    assert result == ['a', 'reject d']
+    assert limiter.stats()['queued'] == 2
+    runs['a'].release()
+    runs[result[-1]].release()
+    assert result == expect
+
+
+def test_queue_timeout():
+    result = []
+    limiter = limit.Limiter(limit=1, queue_size=1, queue_timeout=0)
+    a, b = acquire(limiter, 'ab', result)
+    time.sleep(.001)
+    a.release()
+    assert result == ['a', 'reject b']
+    assert limiter.expired == 1
+    assert limiter.inflight == 0
+
+
+def test_queue_timer():
+    result = []
+    timer = Timer()
+    limiter = limit.Limiter(limit=1, queue_size=2, queue_timeout=.01,
+                            timer=timer)
+    a, b = acquire(limiter, 'ab', result)
+    timer.service()
+    assert result == ['a']
+    time.sleep(.02)
+    timer.service()  # no slot is released
+    assert result == ['a', 'reject b']
+    assert limiter.stats()['queued'] == 0
+    assert limiter.expired == 1
+    assert len(timer) == 0
+
+
+def test_adjust():
+    limiter = limit.Limiter(limit=4, latency=.01, backoff=.5, max_limit=5)
+    limiter.inflight = 3
+    limiter._adjust(.001)
+    assert limiter.limit == 4.25
+    limiter.inflight = 0
+    limiter._adjust(.001)  # limit not in use
+    assert limiter.limit == 4.25
+    limiter._adjust(1)
+    assert limiter.limit == 2.125
+    limiter._adjust(1)
+    limiter._adjust(1)
+    assert limiter.limit == limiter.min_limit
+
+
+def test_chain():
+    result = []
+    route = limit.Limiter('route', limit=2)
+    glob = limit.Limiter(limit=1)
+    runs = [Run(name, result) for name in 'ab']
+    for run in runs:
+        limit.acquire((route, glob), run.start, run.reject)
+    assert result == ['a', 'reject b']
+    assert route.inflight == 1  # b's slot was given back
+    runs[0].release()
+    assert route.inflight == glob.inflight == 0
+
+
+DELAYED = []
+
+
+def delayed(request):
+    DELAYED.append(request)
+    request.delay()
+
+
+class Context(rest_handler.RESTContext):
+
+    def __init__(self, limiter):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/test$', dict(get=rest_mapper.RESTMethod(delayed)))
+        super(Context, self).__init__(mapper, limiter=limiter)
+
+
+class Client(network.Handler):
+
+    def on_init(self):
+        self.received = b''
+
+    def on_ready(self):
+        self.send(b'GET /test HTTP/1.1\r\n\r\n')
+
+    def on_data(self, data):
+        self.received += data
+
+
+def test_handler():
+    DELAYED.clear()
+    limiter = limit.Limiter(limit=1, queue_size=1, retry_after=5)
+    n = memory.MemoryNetwork()
+    n.add_server(PORT, rest_handler.RESTHandler, context=Context(limiter))
+    clients = []
+    for _ in range(3):
+        clients.append(n.add_connection('localhost', PORT, Client))
+        for _ in range(3):
+            n.service()
+    a, b, c = clients
+    assert len(DELAYED) == 1
+    assert c.received.startswith(b'HTTP/1.1 503 Service Unavailable\r\n')
+    assert b'\r\nRetry-After: 5\r\n' in c.received
+    assert limiter.stats()['queued'] == 1
+
+    DELAYED[0].respond('first')
+    for _ in range(3):
+        n.service()
+    assert a.received.endswith(b'first')
+    assert len(DELAYED) == 2  # b's request came out of the queue
+    DELAYED[1].respond('second')
+    for _ in range(3):
+        n.service()
+    assert b.received.endswith(b'second')
+    assert limiter.inflight == 0
+    n.close()
@@ -0,0 +1,119 @@
+import pytest
+
+import spindrift.http as http
+import spindrift.memory as memory
+import spindrift.network as network
+
+
+PORT = 12345
+
+
+class EchoServer(network.Handler):
+
+    def on_data(self, data):
+        self.send(data)
+
+
+class EchoClient(network.Handler):
+
+    def on_init(self):
+        self.received = b''
+
+    def on_ready(self):
+        self.send(b'test_data')
+
+    def on_data(self, data):
+        self.received += data
+        if self.received == b'test_data':
+            self.close()
+
+
+def test_echo():
+    n = memory.MemoryNetwork()
+    n.add_server(PORT, EchoServer)
+    c = n.add_connection('localhost', PORT, EchoClient)
+    while c.is_open:
+        n.service()
+    assert c.received == b'test_data'
+    n.close()
+
+
+def test_chunk_and_latency():
+    n = memory.MemoryNetwork(chunk_size=2, latency=3)
+    n.add_server(PORT, EchoServer)
+    c = n.add_connection('localhost', PORT, EchoClient)
+    while c.is_open:
+        n.service()
+    assert c.received == b'test_data'
+    assert n.tick > 2 * 3
+
+
+def test_refused():
+    n = memory.MemoryNetwork()
+    c = n.add_connection('localhost', PORT, EchoClient)
+    assert c.is_closed
+
+
+class Server(http.HTTPHandler):
+
+    def on_http_data(self):
+        self.http_send_server(self.http_content)
+
+
+class Client(http.HTTPHandler):
+
+    def on_ready(self):
+        self.http_send(resource='/test', content='x' * 5000)
+
+    def on_http_data(self):
+        self.context.append(self.http_content)
+        self.close()
+
+
+@pytest.mark.parametrize('chunk_size', (None, 1, 7))
+def test_http(chunk_size):
+    n = memory.MemoryNetwork(chunk_size=chunk_size)
+    result = []
+    n.add_server(PORT, Server)
+    c = n.add_connection('localhost', PORT, Client, context=result)
+    while c.is_open:
+        n.service()
+    assert result == ["x" * 5000]
+
+
+def test_remote_close():
+
+    class Closer(network.Handler):
+        def on_ready(self):
+            self.close('bye')
+
+    class Watcher(network.Handler):
+        def on_close(self, reason):
+            self.context.append(reason)
+
+    n = memory.MemoryNetwork()
+    reasons = []
+    n.add_server(PORT, Closer)
+    c = n.add_connection('localhost', PORT, Watcher, context=reasons)
+    while c.is_open:
+        n.service()
+    assert reasons == ['remote close']
+
+
+def test_window():
+
+    class Sender(network.Handler):
+        def on_ready(self):
+            self.send(b'x' * 1000)
+
+        def on_send_complete(self):
+            self.context.append(self.tx_count)
+
+    n = memory.MemoryNetwork(window=100)
+    sent = []
+    n.add_server(PORT, Sender, context=sent)
+    c = n.add_connection('localhost', PORT, network.Handler)
+    while c.rx_count < 1000:
+        n.service()
+    assert sent == [1000]
+    assert n.tick >= 10  # 100 bytes at a time
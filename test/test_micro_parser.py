@@ -120,6 +120,15 @@ def test_method(par):
     assert len(t.methods) == 3
 
 
+@pytest.mark.parametrize('methods', (
+    ('get a.b.c', 'websocket d.e.f'),
+    ('websocket d.e.f', 'get a.b.c'),
+))
+def test_websocket_get(par, methods):
+    with pytest.raises(parser.ParserFileException):
+        par.parse(['server test 12345', 'route abc'] + list(methods))
+
+
 def test_database(par):
     p = par.parse([])
     assert p.database is None
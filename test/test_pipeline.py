@@ -0,0 +1,141 @@
+import pytest
+
+import spindrift.http as http
+import spindrift.memory as memory
+import spindrift.network as network_
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.mapper as rest_mapper
+
+
+PORT = 12348
+DELAYED = []
+CALLED = []
+
+
+def slow(request):
+    CALLED.append('slow')
+    request.delay()
+    DELAYED.append(request)
+
+
+def fast(request, value):
+    CALLED.append(value)
+    return value
+
+
+def post(request):
+    CALLED.append('post')
+    return request.http_content
+
+
+class Server(rest_handler.RESTHandler):
+
+    def on_init(self):
+        self.http_pipeline = True
+        self.http_max_pipeline = self.context.max_pipeline
+
+
+class ServerContext(rest_handler.RESTContext):
+
+    def __init__(self, max_pipeline):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/slow$', dict(get=rest_mapper.RESTMethod(slow)))
+        mapper.add('/fast/(\\w+)$', dict(get=rest_mapper.RESTMethod(
+            fast, args=(rest_mapper.RESTArg(str),))))
+        mapper.add('/post$', dict(post=rest_mapper.RESTMethod(post)))
+        super(ServerContext, self).__init__(mapper)
+        self.max_pipeline = max_pipeline
+
+
+class Client(http.HTTPHandler):
+
+    def on_init(self):
+        self.responses = []
+
+    def on_ready(self):
+        self.send(b''.join(
+            b'GET %s HTTP/1.1\r\nHost: test\r\n\r\n' % r
+            for r in self.context
+        ))
+
+    def on_http_data(self):
+        self.responses.append(self.http_content)
+        if len(self.responses) == len(self.context):
+            self.close()
+
+
+@pytest.fixture
+def network():
+    DELAYED.clear()
+    CALLED.clear()
+    n = memory.MemoryNetwork()
+    yield n
+    n.close()
+
+
+def service(n, count=10):
+    for _ in range(count):
+        n.service()
+
+
+def test_order(network):
+    network.add_server(PORT, Server, context=ServerContext(10))
+    c = network.add_connection('localhost', PORT, Client, context=(
+        b'/slow', b'/fast/a', b'/fast/b'))
+    service(network)
+    assert CALLED == ['slow', 'a', 'b']  # dispatched without waiting
+    assert c.responses == []  # held behind the slow response
+    DELAYED.pop().respond('slow')
+    while c.is_open:
+        network.service()
+    assert c.responses == ['slow', 'a', 'b']
+
+
+def test_max_pipeline(network):
+    network.add_server(PORT, Server, context=ServerContext(2))
+    c = network.add_connection('localhost', PORT, Client, context=(
+        b'/slow', b'/fast/a', b'/fast/b', b'/fast/c'))
+    service(network)
+    assert CALLED == ['slow', 'a']  # stopped reading at two outstanding
+    DELAYED.pop().respond('slow')
+    while c.is_open:
+        network.service()
+    assert CALLED == ['slow', 'a', 'b', 'c']
+    assert c.responses == ['slow', 'a', 'b', 'c']
+
+
+def test_not_found(network):
+    network.add_server(PORT, Server, context=ServerContext(10))
+    c = network.add_connection('localhost', PORT, Client, context=(
+        b'/slow', b'/nope', b'/fast/a'))
+    service(network)
+    assert CALLED == ['slow']  # nothing read past the 404
+    DELAYED.pop().respond('slow')
+    while c.is_open:
+        network.service()
+    assert c.responses == ['slow', '']  # 404, then close
+
+
+class RawClient(network_.Handler):
+
+    def on_init(self):
+        self.received = b''
+
+    def on_data(self, data):
+        self.received += data
+
+
+def test_body_after_response(network):
+    network.add_server(PORT, Server, context=ServerContext(10))
+    c = network.add_connection('localhost', PORT, RawClient)
+    c.send(b'GET /slow HTTP/1.1\r\n\r\n'
+           b'POST /post HTTP/1.1\r\nContent-Length: 5\r\n\r\nab')
+    service(network)
+    DELAYED.pop().respond('slow')  # while /post's body is arriving
+    service(network)
+    c.send(b'cde')
+    service(network)
+    assert CALLED == ['slow', 'post']
+    assert c.received.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert c.received.endswith(b'abcde')
+    assert c.received.count(b'HTTP/1.1 200 OK\r\n') == 2
@@ -0,0 +1,188 @@
+import time
+
+import pytest
+
+import spindrift.connect as connect
+import spindrift.http as http
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.pool as pool
+import spindrift.timer as timer
+
+
+PORT = 12352
+URL = 'http://localhost:%d/' % PORT
+
+
+class Server(http.HTTPHandler):
+
+    def on_init(self):
+        self.context.append(self)
+
+    def on_http_data(self):
+        if self.http_resource == '/eof':  # content ends at close
+            self.send(b'HTTP/1.0 200 OK\r\n\r\nok')
+            return self.close()
+        if self.http_resource.startswith('/http10'):
+            keep_alive = b'Connection: keep-alive\r\n' \
+                if self.http_resource == '/http10/keep-alive' else b''
+            return self.send(b'HTTP/1.0 200 OK\r\nContent-Length: 2\r\n'
+                             b'%s\r\nok' % keep_alive)
+        headers = None
+        if self.http_resource == '/close':
+            headers = {'Connection': 'close'}
+        self.http_send_server('ok', headers=headers)
+
+
+def call(n, resource='', **kwargs):
+    result = []
+    c = connect.connect(n, timer.Timer(), lambda rc, r: result.append(
+        (rc, r)), URL + resource, is_json=False, **kwargs)
+    while not c.is_done:
+        n.service()
+    n.service()
+    return result, c
+
+
+@pytest.fixture
+def net():
+    n = memory.MemoryNetwork()
+    n.servers = []
+    n.add_server(PORT, Server, context=n.servers)
+    yield n
+    n.close()
+
+
+def test_reuse(net):
+    result, c = call(net)
+    assert result == [(0, 'ok')]
+    assert c.is_open
+    result, c2 = call(net)
+    assert result == [(0, 'ok')]
+    assert c2 is c
+    assert len(net.servers) == 1
+    p = net.connect_pool
+    assert (p.hit, p.miss, p.hit_rate) == (1, 1, 0.5)
+    assert p.idle_count == 1
+
+
+def test_no_pool(net):
+    result, c = call(net, pool=None)
+    assert result == [(0, 'ok')]
+    assert not c.is_open
+    assert net.connect_pool is None
+
+
+def test_connection_close(net):
+    result, c = call(net, 'close')
+    assert result == [(0, 'ok')]
+    assert not c.is_open
+    assert net.connect_pool.idle_count == 0
+    assert net.connect_pool._count == {}
+
+
+def test_peer_close(net):
+    result, c = call(net)
+    net.servers[0].close()
+    for _ in range(3):
+        net.service()
+    assert not c.is_open
+    assert net.connect_pool.idle_count == 0
+    result, c2 = call(net)
+    assert result == [(0, 'ok')]
+    assert c2 is not c
+
+
+def test_read_until_close(net):
+    for _ in range(3):
+        result, c = call(net, 'eof')
+        assert result == [(0, b'ok')]
+        assert not c.is_open
+    assert net.connect_pool._count == {}
+    assert net.connect_pool.idle_count == 0
+
+
+@pytest.mark.parametrize('resource, is_pooled', (
+    ('http10', False),
+    ('http10/keep-alive', True),
+))
+def test_http10(net, resource, is_pooled):
+    result, c = call(net, resource)
+    assert result == [(0, b'ok')]
+    assert net.connect_pool.idle_count == (1 if is_pooled else 0)
+    assert c.is_open is is_pooled
+
+
+def test_expire(net):
+    p = net.connect_pool = pool.ConnectionPool(idle_timeout=0)
+    result, c = call(net)
+    result, c2 = call(net)
+    assert c2 is not c
+    assert not c.is_open
+    assert p.expired == 1
+
+
+def test_max_per_host(net):
+    p = net.connect_pool = pool.ConnectionPool(max_per_host=1)
+    results = []
+    handlers = [
+        connect.connect(net, timer.Timer(),
+                        lambda rc, r: results.append(r), URL, is_json=False)
+        for _ in range(2)
+    ]
+    while len(results) < 2:
+        net.service()
+    assert p.overflow == 1
+    assert handlers[0].is_open
+    assert not handlers[1].is_open
+
+
+def test_unhealthy():
+    n = network.Network()
+    servers = []
+    n.add_server(PORT, Server, context=servers)
+    result, c = call(n)
+    assert result == [(0, 'ok')]
+    servers[0].close()
+    result, c2 = call(n)  # peer close is seen by the check on reuse
+    assert result == [(0, 'ok')]
+    assert c2 is not c
+    assert n.connect_pool.unhealthy == 1
+    n.close()
+
+
+class Idle(object):
+    ''' an idle handler, for the pool on its own '''
+
+    def __init__(self, is_open=True):
+        self.is_open = is_open
+        self._sock = None
+
+    def close(self, reason):
+        self.is_open = False
+
+
+def test_unhealthy_next():
+    p = pool.ConnectionPool()
+    good, bad = Idle(), Idle(is_open=False)
+    p.checkin('key', good)
+    p.checkin('key', bad)
+    assert p.checkout('key', Idle) is good  # after the unhealthy one
+    assert p.unhealthy == 1
+    assert p.hit == 1
+    assert p.idle_count == 0
+
+
+def test_expire_timer():
+    t = timer.Timer()
+    p = pool.ConnectionPool(idle_timeout=.01, timer=t)
+    handler = Idle()
+    p.checkin('key', handler)
+    t.service()
+    assert handler.is_open
+    time.sleep(.02)
+    t.service()  # no checkout or checkin
+    assert not handler.is_open
+    assert p.expired == 1
+    assert p.idle_count == 0
+    assert len(t) == 0
@@ -1,6 +1,9 @@
+import re
+
 import pytest
 
 import spindrift.rest.mapper as mapper
+import spindrift.rest.router as router
 
 
 def handler1():
@@ -22,6 +25,23 @@ def test_simple():
     assert len(rest_match.groups) == 0
 
 
+def test_headers():
+    m = mapper.RESTMapper()
+    m.add(
+        '/foo/bar$',
+        dict(
+            get=mapper.RESTMethod(
+                'test.test_restmapper.handler1',
+                headers={'Cache-Control': 'max-age=60'},
+            ),
+            put=mapper.RESTMethod('test.test_restmapper.handler2'),
+        ),
+    )
+    assert m.match('/foo/bar', 'GET').headers == \
+        b'Cache-Control: max-age=60\r\n'
+    assert m.match('/foo/bar', 'PUT').headers == b''
+
+
 def test_no_match():
     m = mapper.RESTMapper()
     m.add(
@@ -89,3 +109,112 @@ def test_rest_method_error():
             [1],
             {}
         )
+
+
+def test_method_order():
+    ''' a later mapping wins if an earlier one lacks the method '''
+    m = mapper.RESTMapper()
+    m.add('/foo/(\\w+)$', dict(
+        put=mapper.RESTMethod('test.test_restmapper.handler1')))
+    m.add('/foo/bar$', dict(
+        get=mapper.RESTMethod('test.test_restmapper.handler2')))
+    assert m.match('/foo/bar', 'GET').handler == handler2
+    assert m.match('/foo/bar', 'PUT').handler == handler1
+    assert m.match('/foo/bar', 'POST') is None
+    m.add('/(foo)/bar', dict(
+        post=mapper.RESTMethod('test.test_restmapper.handler2')))
+    assert m.match('/foo/bar', 'POST').groups == ('foo',)
+
+
+@pytest.mark.parametrize('pattern, prefix, is_exact', (
+    ('/foo/bar$', '/foo/bar', True),
+    ('^/foo/bar\\Z', '/foo/bar', True),
+    ('/foo/bar', '/foo/bar', False),
+    ('/foo\\.json$', '/foo.json', True),
+    ('/foo/(\\d+)$', '/foo/', False),
+    ('/foo/bars?$', '/foo/bar', False),
+    ('/foo\\d+', '/foo', False),
+    ('/foo|/bar', '', False),
+    ('(?i)/foo', '', False),
+))
+def test_literal_prefix(pattern, prefix, is_exact):
+    assert router.literal_prefix(pattern) == (prefix, is_exact)
+
+
+ROUTES = (
+    '/item/(\\d+)$',
+    '/item/(\\d+)/name$',
+    '/item/new$',
+    '/item/(\\w+)$',
+    '/items?$',
+    '/(\\w+)/count$',
+    '/user/(?P<id>\\d+)/(\\w+)$',
+    '/user/(\\d+)/(\\1)$',
+    '/static/',
+    '/user/(\\w+)/(\\w+)$',
+    '(?i)/CASE$',
+    '/user/me$',
+    '/a|/b',
+    '.*',
+)
+
+
+@pytest.mark.parametrize('resource', (
+    '/item/123', '/item/123/name', '/item/new', '/item/abc', '/item',
+    '/items', '/item/count', '/user/count', '/user/12/bob', '/user/12/12',
+    '/static/a/b.css', '/user/me', '/user/bob/x', '/case', '/b/c',
+    '/nothing/here', '',
+))
+def test_router(resource):
+    ''' the router agrees with trying each pattern in order '''
+    table = router.Router([(p, n) for n, p in enumerate(ROUTES)])
+    expected = None
+    for n, pattern in enumerate(ROUTES):
+        match = re.match(pattern, resource)
+        if match:
+            expected = (n, match.groups())
+            break
+    assert table.match(resource) == expected
+    assert router.Router(
+        [(p, n) for n, p in enumerate(ROUTES[:-1])]).match(resource) == \
+        (expected if expected[0] != len(ROUTES) - 1 else None)
+
+
+def test_cache():
+    m = mapper.RESTMapper(cache_size=2)
+    m.add('/foo/(\\d+)$', dict(
+        get=mapper.RESTMethod('test.test_restmapper.handler1')))
+    for _ in range(3):
+        assert m.match('/foo/1', 'GET').groups == ('1',)
+    assert (m.hit, m.miss) == (1, 2)  # cached on the second miss
+    assert m.match('/foo/2', 'GET').groups == ('2',)
+    assert m.match('/foo/3', 'GET').groups == ('3',)
+    assert list(m._cache) == [('GET', '/foo/1')]  # seen once: not cached
+    m.match('/foo/2', 'GET')
+    m.match('/foo/3', 'GET')
+    assert list(m._cache) == [('GET', '/foo/2'), ('GET', '/foo/3')]
+    assert m.match('/foo/x', 'GET') is None
+    m.add('/foo/x$', dict(
+        get=mapper.RESTMethod('test.test_restmapper.handler2')))
+    assert m._cache == {}
+    assert m.match('/foo/x', 'GET').handler == handler2
+
+
+def test_rest_method_content():
+    method = mapper.RESTMethod(None, content=[
+        mapper.RESTArg(int, 'a'), mapper.RESTArg(None, 'b', False)])
+    method.add_content('c', int, is_required=False)
+    assert method.coerce(['x'], {'a': '1', 'c': '2'}) == (
+        ['x'], {'a': 1, 'c': 2})
+    assert method.coerce([], {'a': 1, 'b': 'y'}) == ([], {'a': 1, 'b': 'y'})
+    with pytest.raises(mapper.InvalidContent) as e:
+        method.coerce([], {'a': 1, 'c': 'z'})
+    assert str(e.value).startswith("invalid value for 'c': invalid literal")
+    assert 'value = c2(value)' in method.coercer().source
+
+
+def test_rest_method_regenerate():
+    method = mapper.RESTMethod(None)
+    assert method.coerce(('1',), {}) == (['1'], {})
+    method.add_arg(int)
+    assert method.coerce(('1',), {}) == ([1], {})
@@ -1,3 +1,4 @@
+import spindrift.deadline as deadline
 import spindrift.http as http
 import spindrift.rest.request as request
 
@@ -152,3 +153,47 @@ def test_call_cursor():
     r.cursor = 'cursor'
     r.call(_call_cursor, on_success=on_success)
     assert r._cursor == 'cursor'
+
+
+def test_document_copy():
+    r = new_request(http_content='test', http_message=b'', http_slot=1)
+    r.handler.http_content = 'next'
+    assert r.http_content == 'test'
+    r = new_request(http_content='test')
+    r.handler.http_content = 'next'
+    assert r.http_content == 'next'
+
+
+def test_cleanup():
+    called = []
+    r = new_request()
+    r.cleanup = lambda: called.append(1)
+    r.cleanup = lambda: called.append(2)
+    assert len(r.cleanup) == 2
+    r.respond(200)
+    assert called == [2, 1]
+
+
+def test_slots():
+    r = new_request()
+    assert r.id == 0
+    assert getattr(r, 'cursor', None) is None
+    assert not hasattr(r, 'foo')
+    r.foo = 1
+    assert r.foo == 1
+
+
+def _call_deadline(callback, deadline=None):
+    callback(1, 'timeout')
+
+
+def test_call_deadline():
+    r = new_request()
+    r.deadline = deadline.after(-1)
+    r.call(_call_simple)
+    assert r.handler._respond_code == 504
+
+    r = new_request()
+    r.deadline = deadline.after(.01)
+    r.call(_call_deadline)
+    assert r.handler._respond_code == 500
@@ -0,0 +1,50 @@
+import spindrift.network as network
+import spindrift.statsd as statsd
+import spindrift.timer as timer
+
+
+PORT = 12347
+
+
+class Collector(network.DatagramHandler):
+
+    def on_init(self):
+        self.received = []
+
+    def on_datagram(self, data, address):
+        self.received.append(data)
+
+
+def test_pack():
+    lines = [b'a:1|c', b'b:2|c', b'c:3|c']
+    assert list(statsd.pack(lines, 100)) == [b'a:1|c\nb:2|c\nc:3|c']
+    assert list(statsd.pack(lines, 11)) == [b'a:1|c\nb:2|c', b'c:3|c']
+    assert list(statsd.pack(lines, 3)) == lines
+
+
+def test_aggregate():
+    n = network.Network()
+    t = timer.Timer()
+    c = n.add_datagram('localhost', PORT, Collector, is_bind=True)
+    s = statsd.Statsd(n, t, 'localhost', PORT, prefix='test')
+    s.incr('hit')
+    s.incr('hit', 2)
+    s.decr('miss')
+    s.timing('time', 10)
+    s.timing('time', 20)
+    s.gauge('size', 5)
+    s.gauge('size', 6)
+    s.flush()
+    for _ in range(10):
+        n.service(timeout=.01)
+        if c.received:
+            break
+    assert c.received == [
+        b'test.hit:3|c\ntest.miss:-1|c\n'
+        b'test.time:10|ms\ntest.time:20|ms\ntest.size:6|g'
+    ]
+    s.flush()  # nothing to send
+    n.service(timeout=.01)
+    assert len(c.received) == 1
+    s.close()
+    n.close()
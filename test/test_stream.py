@@ -0,0 +1,362 @@
+import pytest
+
+import spindrift.http as http
+import spindrift.memory as memory
+import spindrift.rest.handler as rest_handler
+import spindrift.rest.mapper as rest_mapper
+
+
+PORT = 12349
+BODY = b'0123456789' * 100
+
+
+class Server(http.HTTPHandler):
+
+    def on_init(self):
+        self.events = self.context
+        self.http_max_content_length = 10
+
+    def on_http_headers(self):
+        self.http_stream = True
+
+    def on_http_body_start(self):
+        self.events.append('start')
+
+    def on_http_chunk(self, chunk):
+        self.events.append(bytes(chunk))
+
+    def on_http_body_end(self):
+        self.events.append('end')
+        self.http_send_server('ok')
+
+
+class Client(http.HTTPHandler):
+
+    def on_ready(self):
+        self.send(self.context)
+
+    def on_http_data(self):
+        self.result = self.http_content
+        self.close()
+
+
+def run(request, chunk_size=None, server=Server):
+    n = memory.MemoryNetwork(chunk_size=chunk_size)
+    events = []
+    n.add_server(PORT, server, context=events)
+    c = n.add_connection('localhost', PORT, Client, context=request)
+    while c.is_open:
+        n.service()
+    n.close()
+    return c.result, events
+
+
+def chunked(body, size):
+    return b''.join(
+        b'%x\r\n%s\r\n' % (len(body[i:i + size]), body[i:i + size])
+        for i in range(0, len(body), size)
+    ) + b'0\r\n\r\n'
+
+
+@pytest.mark.parametrize('chunk_size', (None, 1, 100))
+def test_content_length(chunk_size):
+    request = b'POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (
+        len(BODY), BODY)
+    result, events = run(request, chunk_size)
+    assert result == 'ok'
+    assert events[0] == 'start'
+    assert events[-1] == 'end'
+    assert b''.join(events[1:-1]) == BODY
+    if chunk_size:
+        assert max(len(e) for e in events[1:-1]) <= chunk_size
+
+
+@pytest.mark.parametrize('chunk_size', (None, 3, 100))
+def test_chunked(chunk_size):
+    request = b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n' + \
+        chunked(BODY, 64)
+    result, events = run(request, chunk_size)
+    assert result == 'ok'
+    assert b''.join(events[1:-1]) == BODY
+
+
+def test_empty():
+    result, events = run(b'GET / HTTP/1.1\r\n\r\n')
+    assert result == 'ok'
+    assert events == ['start', 'end']
+
+
+class PausingServer(Server):
+    ''' pause after each chunk; the test loop resumes '''
+
+    def on_http_chunk(self, chunk):
+        super(PausingServer, self).on_http_chunk(chunk)
+        self.http_pause()
+        self.events.append(self)
+
+
+def test_pause():
+    request = b'POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (
+        len(BODY), BODY)
+    n = memory.MemoryNetwork(chunk_size=100)
+    events = []
+    n.add_server(PORT, PausingServer, context=events)
+    c = n.add_connection('localhost', PORT, Client, context=request)
+    while c.is_open:
+        n.service()
+        if events and isinstance(events[-1], PausingServer):
+            server = events.pop()
+            count = len(events)
+            n.service()
+            assert len(events) == count  # nothing while paused
+            server.http_resume()
+    assert c.result == 'ok'
+    assert b''.join(events[1:-1]) == BODY
+    assert events[-1] == 'end'
+
+
+class MeasuringServer(Server):
+    ''' keep the largest size of the parse buffer '''
+
+    def on_http_body_start(self):
+        self.events.append(0)
+
+    def on_http_chunk(self, chunk):
+        self.events[0] = max(self.events[0], len(self._data))
+
+    def on_http_body_end(self):
+        self.http_send_server('ok')
+
+
+def test_buffer_bounded():
+    body = b'x' * (1024 * 1024)
+    request = b'POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (
+        len(body), body)
+    n = memory.MemoryNetwork(chunk_size=65536)
+    events = []
+    n.add_server(PORT, MeasuringServer, context=events)
+    c = n.add_connection('localhost', PORT, Client, context=request)
+    while c.is_open:
+        n.service()
+    n.close()
+    assert c.result == 'ok'
+    assert events[0] <= 2 * 65536
+
+
+UPLOADS = []
+
+
+def upload(request, name):
+    data = bytearray()
+    request.on_chunk = data.extend
+
+    def on_end():
+        UPLOADS.append((name, bytes(data)))
+        return {'size': len(data)}
+    request.on_end = on_end
+
+
+def reject(request):
+    request.on_chunk = UPLOADS.append
+    request.respond(403)
+
+
+def echo(request):
+    return request.http_content
+
+
+class RESTContext(rest_handler.RESTContext):
+
+    def __init__(self, events):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/upload/(\\w+)$', dict(post=rest_mapper.RESTMethod(
+            upload, is_stream=True)))
+        mapper.add('/reject$', dict(post=rest_mapper.RESTMethod(
+            reject, is_stream=True)))
+        mapper.add('/echo$', dict(post=rest_mapper.RESTMethod(echo)))
+        super(RESTContext, self).__init__(mapper)
+
+
+def run_rest(resource):
+    UPLOADS.clear()
+    request = b'POST %s HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (
+        resource, len(BODY), BODY)
+    n = memory.MemoryNetwork(chunk_size=128)
+    n.add_server(PORT, rest_handler.RESTHandler, context=RESTContext(None))
+    c = n.add_connection('localhost', PORT, Client, context=request)
+    while c.is_open:
+        n.service()
+    n.close()
+    return c
+
+
+def test_rest_stream():
+    c = run_rest(b'/upload/abc')
+    assert c.result == '{"size":1000}'
+    assert UPLOADS == [('abc', BODY)]
+
+
+def test_rest_stream_early_response():
+    c = run_rest(b'/reject')
+    assert c.http_status_code == 403
+    assert UPLOADS == []
+
+
+def test_rest_not_stream():
+    c = run_rest(b'/echo')
+    assert c.result == BODY.decode()
+
+
+TICKS = []
+
+
+def rows(request):
+
+    def generate():
+        for i in range(100):
+            TICKS.append(NETWORK[0].tick)
+            yield '%03d' % i + '.' * 96 + '\n'
+    request.stream(iterable=generate())
+
+
+def events(request):
+    writer = request.stream(content_type='text/event-stream')
+    writer.event('hello')
+    writer.event('a\nb', event='multi', id=2)
+    writer.end()
+
+
+def rows_events(request):
+    request.stream(content_type='text/event-stream', iterable=(
+        'one', dict(data='two', event='second'),
+    ))
+
+
+WRITERS = []
+
+
+def push(request):
+    request.cleanup = lambda: WRITERS.append('cleanup')
+    WRITERS.append(request.stream(content_type='text/plain'))
+
+
+NETWORK = []
+
+
+class StreamContext(rest_handler.RESTContext):
+
+    def __init__(self):
+        mapper = rest_mapper.RESTMapper()
+        mapper.add('/rows$', dict(get=rest_mapper.RESTMethod(rows)))
+        mapper.add('/events$', dict(get=rest_mapper.RESTMethod(events)))
+        mapper.add('/rows_events$', dict(get=rest_mapper.RESTMethod(
+            rows_events)))
+        mapper.add('/push$', dict(get=rest_mapper.RESTMethod(push)))
+        mapper.add('/echo$', dict(post=rest_mapper.RESTMethod(echo)))
+        super(StreamContext, self).__init__(mapper)
+
+
+class PipelineServer(rest_handler.RESTHandler):
+
+    def on_init(self):
+        self.http_pipeline = True
+
+
+class MultiClient(http.HTTPHandler):
+
+    def on_init(self):
+        self.results = []
+
+    def on_ready(self):
+        self.send(self.context)
+
+    def on_http_data(self):
+        self.results.append((self.http_headers, self.http_content))
+
+
+def stream(request, server=rest_handler.RESTHandler, window=None,
+           count=1):
+    NETWORK[:] = [memory.MemoryNetwork(window=window)]
+    n = NETWORK[0]
+    n.add_server(PORT, server, context=StreamContext())
+    c = n.add_connection('localhost', PORT, MultiClient, context=request)
+    while c.is_open and len(c.results) < count:
+        n.service()
+    return c
+
+
+def test_iterable():
+    TICKS.clear()
+    c = stream(b'GET /rows HTTP/1.1\r\n\r\n', window=1000)
+    headers, content = c.results[0]
+    assert headers['transfer-encoding'] == 'chunked'
+    assert 'content-length' not in headers
+    lines = content.splitlines()
+    assert len(lines) == 100
+    assert lines[-1].startswith('099')
+    assert TICKS[-1] - TICKS[0] > 5  # generator waited for the peer
+
+
+def test_event_stream():
+    c = stream(b'GET /events HTTP/1.1\r\n\r\n')
+    headers, content = c.results[0]
+    assert headers['content-type'].startswith('text/event-stream')
+    assert headers['cache-control'] == 'no-cache'
+    assert content == (
+        'data: hello\n\n'
+        'event: multi\nid: 2\ndata: a\ndata: b\n\n'
+    )
+
+
+def test_event_stream_iterable():
+    c = stream(b'GET /rows_events HTTP/1.1\r\n\r\n')
+    assert c.results[0][1] == 'data: one\n\nevent: second\ndata: two\n\n'
+
+
+def test_push():
+    WRITERS.clear()
+    NETWORK[:] = [memory.MemoryNetwork()]
+    n = NETWORK[0]
+    n.add_server(PORT, rest_handler.RESTHandler, context=StreamContext())
+    c = n.add_connection('localhost', PORT, MultiClient, context=(
+        b'GET /push HTTP/1.1\r\nContent-Length: 0\r\n\r\n'
+        b'POST /echo HTTP/1.1\r\nContent-Length: 4\r\n\r\nnext'))
+    for _ in range(5):
+        n.service()
+    writer = WRITERS[0]
+    writer.write('abc')
+    writer.write(b'def')
+    for _ in range(5):
+        n.service()
+    assert c.results == []  # response not complete, next not started
+    writer.end()
+    while len(c.results) < 2:
+        n.service()
+    assert WRITERS[1:] == ['cleanup']
+    assert c.results[0][1] == 'abcdef'
+    assert c.results[1][1] == 'next'
+
+
+def test_pipeline():
+    c = stream(
+        b'GET /rows HTTP/1.1\r\n\r\n'
+        b'POST /echo HTTP/1.1\r\nContent-Length: 4\r\n\r\nnext'
+        b'GET /events HTTP/1.1\r\n\r\n',
+        server=PipelineServer, window=500, count=3,
+    )
+    assert len(c.results[0][1].splitlines()) == 100
+    assert c.results[1][1] == 'next'
+    assert c.results[2][1].startswith('data: hello')
+
+
+def test_close():
+    WRITERS.clear()
+    c = stream(b'GET /push HTTP/1.1\r\n\r\n', count=0)
+    for _ in range(5):
+        NETWORK[0].service()
+    c.close()
+    for _ in range(5):
+        NETWORK[0].service()
+    WRITERS[0].write('abc')  # server is quiesced: finds out on send
+    assert WRITERS[1:] == ['cleanup']
+    assert WRITERS[0].is_done
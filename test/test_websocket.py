@@ -0,0 +1,214 @@
+import struct
+
+import pytest
+
+import spindrift.memory as memory
+import spindrift.network as network
+import spindrift.websocket as websocket
+from spindrift.rest.handler import RESTContext, RESTHandler
+from spindrift.rest.mapper import RESTMapper, RESTMethod
+
+
+PORT = 12354
+KEY = b'\x01\x02\x03\x04'
+UPGRADE = (
+    b'GET /chat HTTP/1.1\r\n'
+    b'Host: test\r\n'
+    b'Upgrade: websocket\r\n'
+    b'Connection: keep-alive, Upgrade\r\n'
+    b'Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n'
+    b'Sec-WebSocket-Version: 13\r\n'
+    b'\r\n'
+)
+
+
+def test_accept_key():
+    ''' RFC 6455 1.3 '''
+    assert websocket.accept_key('dGhlIHNhbXBsZSBub25jZQ==') == \
+        's3pPLMBiTxaQ9kYGzzhZRbK+xOo='
+
+
+@pytest.mark.parametrize('size', (0, 5, 125, 126, 65535, 65536))
+def test_frame(size):
+    payload = bytes(range(256)) * (size // 256) + bytes(size % 256)
+    frame = websocket.encode_frame(websocket.BINARY, payload, key=KEY)
+    header = {0: 2, 5: 2, 125: 2, 126: 4, 65535: 4, 65536: 10}[size]
+    assert len(frame) == header + 4 + size
+    assert websocket.mask(frame[header + 4:], KEY) == payload
+
+
+def client_frame(opcode, payload=b'', fin=True):
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    return websocket.encode_frame(opcode, payload, fin, KEY)
+
+
+def chat(request):
+    context = request.handler.context
+
+    def on_message(ws, message):
+        if message == 'close':
+            ws.close(websocket.GOING_AWAY, 'bye')
+        elif message == 'ping':
+            ws.ping(b'x')
+        else:
+            websocket.broadcast(context.room, message)
+
+    def on_close(ws, code, reason):
+        context.room.discard(ws)
+        context.closed.append((code, reason))
+
+    request.cleanup = lambda: context.closed.append('cleanup')
+    context.room.add(request.websocket(on_message, on_close))
+
+
+class Context(RESTContext):
+
+    def __init__(self, mapper):
+        super(Context, self).__init__(mapper)
+        self.room = set()
+        self.closed = []
+
+
+class Server(RESTHandler):
+
+    def on_init(self):
+        self.http_max_message_size = 1000
+
+
+class Client(network.Handler):
+    ''' sends the upgrade request, then collects server frames '''
+
+    def on_init(self):
+        self.response = None
+        self.frames = []
+        self.buffer = bytearray()
+
+    def on_ready(self):
+        self.send(self.context or UPGRADE)
+
+    def on_data(self, data):
+        self.buffer += data
+        if self.response is None:
+            end = self.buffer.find(b'\r\n\r\n')
+            if end == -1:
+                return
+            self.response = bytes(self.buffer[:end + 4])
+            del self.buffer[:end + 4]
+        while len(self.buffer) >= 2:
+            length = self.buffer[1] & 0x7f
+            start = 2
+            if length == 126:
+                length = struct.unpack_from('>H', self.buffer, 2)[0]
+                start = 4
+            if len(self.buffer) < start + length:
+                break
+            self.frames.append((self.buffer[0], bytes(
+                self.buffer[start:start + length])))
+            del self.buffer[:start + length]
+
+
+@pytest.fixture
+def net():
+    mapper = RESTMapper()
+    mapper.add('/chat$', dict(get=RESTMethod(
+        'test.test_websocket.chat', is_websocket=True)))
+    n = memory.MemoryNetwork()
+    n.context = Context(mapper)
+    n.add_server(PORT, Server, context=n.context)
+    yield n
+    n.close()
+
+
+def connect(net, data=b''):
+    c = net.add_connection('localhost', PORT, Client, UPGRADE + data)
+    service(net)
+    return c
+
+
+def service(net):
+    for _ in range(5):
+        net.service()
+
+
+def test_upgrade(net):
+    c = connect(net, client_frame(websocket.TEXT, 'hello'))  # right behind
+    assert c.response.startswith(b'HTTP/1.1 101 Switching Protocols\r\n')
+    assert b'Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=\r\n' in \
+        c.response
+    assert c.frames == [(0x81, b'hello')]
+
+
+def test_not_upgrade(net):
+    c = net.add_connection('localhost', PORT, Client,
+                           b'GET /chat HTTP/1.1\r\n\r\n')
+    service(net)
+    assert c.response.startswith(b'HTTP/1.1 426 Upgrade Required\r\n')
+    assert not c.is_open
+
+
+def test_broadcast(net):
+    clients = [connect(net) for _ in range(3)]
+    clients[0].send(client_frame(websocket.BINARY, b'\x00\xff'))
+    service(net)
+    assert all(c.frames == [(0x82, b'\x00\xff')] for c in clients)
+
+
+def test_fragments(net):
+    c = connect(net, client_frame(websocket.TEXT, 'hel', fin=False) +
+                client_frame(websocket.PING, b'p') +
+                client_frame(websocket.CONTINUATION, 'lo', fin=False) +
+                client_frame(websocket.CONTINUATION, ' there'))
+    assert c.frames == [(0x8a, b'p'), (0x81, b'hello there')]
+
+
+def test_ping(net):
+    c = connect(net, client_frame(websocket.TEXT, 'ping'))
+    assert c.frames == [(0x89, b'x')]
+
+
+def test_peer_close(net):
+    c = connect(net, client_frame(
+        websocket.CLOSE, struct.pack('>H', 1000) + b'done'))
+    assert c.frames == [(0x88, struct.pack('>H', 1000))]
+    assert not c.is_open
+    assert net.context.closed == [(1000, 'done'), 'cleanup']
+    assert net.context.room == set()
+
+
+def test_server_close(net):
+    c = connect(net, client_frame(websocket.TEXT, 'close'))
+    assert c.frames == [(0x88, struct.pack('>H', 1001) + b'bye')]
+    assert c.is_open  # waiting for the client's close frame
+    c.send(client_frame(websocket.CLOSE, struct.pack('>H', 1001)))
+    service(net)
+    assert not c.is_open
+    assert net.context.closed == [(1001, ''), 'cleanup']
+
+
+def test_abnormal_close(net):
+    c = connect(net)
+    c.close()
+    service(net)
+    assert net.context.closed == [(websocket.ABNORMAL, ''), 'cleanup']
+
+
+@pytest.mark.parametrize('data, code', (
+    (websocket.encode_frame(websocket.TEXT, b'x'), 1002),  # unmasked
+    (client_frame(websocket.TEXT, b'\xff'), 1007),  # invalid utf-8
+    (client_frame(websocket.CONTINUATION, 'x'), 1002),
+    (client_frame(websocket.TEXT, 'x', fin=False) +
+     client_frame(websocket.TEXT, 'y'), 1002),
+    (client_frame(websocket.PING, b'x', fin=False), 1002),
+    (client_frame(websocket.BINARY, b'x' * 1001), 1009),
+    (client_frame(websocket.TEXT, 'x' * 600, fin=False) +
+     client_frame(websocket.CONTINUATION, 'x' * 600), 1009),
+    (client_frame(websocket.CLOSE, struct.pack('>H', 1005)), 1002),
+    (client_frame(0x3), 1002),  # reserved opcode
+))
+def test_error(net, data, code):
+    c = connect(net, data)
+    assert c.frames[-1][0] == 0x88
+    assert struct.unpack_from('>H', c.frames[-1][1])[0] == code
+    assert not c.is_open
+    assert net.context.closed[0][0] == code